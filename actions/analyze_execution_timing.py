@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+from lib.base_action import BaseAction
+from lib.timestamps import format_timestamp
+from lib.timestamps import parse_timestamp
+
+# Tasks that start within this many seconds of the previous task ending are treated
+# as running back to back when walking the critical path
+CRITICAL_PATH_TOLERANCE = 1.0
+
+
+class AnalyzeExecutionTiming(BaseAction):
+
+    def __init__(self, config):
+        """Creates a new BaseAction given a StackStorm config object (kwargs works too)
+        :param config: StackStorm configuration object for the pack
+        :returns: a new BaseAction
+        """
+        super(AnalyzeExecutionTiming, self).__init__(config)
+
+    def build_timing_tree(self, execution, name, depth, now):
+        """ Walks the execution and its children recording the start and end
+        time of every task
+        """
+        start = parse_timestamp(getattr(execution, 'start_timestamp', None), default=now)
+        # Executions that are still running haven't ended yet
+        end = parse_timestamp(getattr(execution, 'end_timestamp', None), default=now)
+        node = {
+            'name': name,
+            'execution_id': execution.id,
+            'action_ref': (getattr(execution, 'action', None) or {}).get('ref'),
+            'status': execution.status,
+            'depth': depth,
+            'start': start,
+            'end': max(start, end),
+            'children': []
+        }
+
+        if hasattr(execution, 'children'):
+            st2_executions = self.st2_client.executions  # pylint: disable=no-member
+            for child_id in execution.children:
+                child = st2_executions.get_by_id(child_id)
+                node['children'].append(self.build_timing_tree(
+                    child, child.context['orquesta']['task_name'], depth + 1, now))
+
+        node['total_time'] = node['end'] - node['start']
+        node['self_time'] = node['total_time'] - self.covered_time(node['children'])
+        return node
+
+    def covered_time(self, nodes):
+        """ Returns the length of the union of the nodes' intervals so tasks running
+        in parallel aren't counted twice
+        """
+        covered = 0.0
+        current_start = current_end = None
+        for node in sorted(nodes, key=lambda n: n['start']):
+            if current_end is None or node['start'] > current_end:
+                if current_end is not None:
+                    covered += current_end - current_start
+                current_start, current_end = node['start'], node['end']
+            else:
+                current_end = max(current_end, node['end'])
+        if current_end is not None:
+            covered += current_end - current_start
+        return covered
+
+    def critical_path(self, node):
+        """ Returns the chain of tasks that determined when the node finished. Starting
+        from the child that ended last, each step goes back to the child that ended
+        latest before the current one started. Subworkflows on the path are expanded.
+        """
+        children = sorted(node['children'], key=lambda n: n['end'])
+        chain = []
+        while children:
+            current = children.pop()
+            chain.append(current)
+            children = [c for c in children
+                        if c['end'] <= current['start'] + CRITICAL_PATH_TOLERANCE]
+
+        path = []
+        for child in reversed(chain):
+            path.append(child)
+            path.extend(self.critical_path(child))
+        return path
+
+    def flatten(self, node):
+        nodes = [node]
+        for child in node['children']:
+            nodes.extend(self.flatten(child))
+        return nodes
+
+    def summarize(self, node):
+        return {
+            'name': node['name'],
+            'execution_id': node['execution_id'],
+            'action_ref': node['action_ref'],
+            'status': node['status'],
+            'depth': node['depth'],
+            'start_timestamp': format_timestamp(node['start']),
+            'end_timestamp': format_timestamp(node['end']),
+            'total_time': round(node['total_time'], 3),
+            'self_time': round(node['self_time'], 3)
+        }
+
+    def analyze(self, root, top_n):
+        nodes = self.flatten(root)
+        tasks = [n for n in nodes[1:] if not n['children']]
+        workflows = [n for n in nodes[1:] if n['children']]
+
+        return {
+            'total_time': round(root['total_time'], 3),
+            'critical_path': [self.summarize(n) for n in self.critical_path(root)],
+            'slowest_tasks': [self.summarize(n) for n in
+                              sorted(tasks, key=lambda n: n['self_time'], reverse=True)[:top_n]],
+            'slowest_workflows': [self.summarize(n) for n in
+                                  sorted(workflows, key=lambda n: n['total_time'],
+                                         reverse=True)[:top_n]],
+            'tasks': [self.summarize(n) for n in nodes]
+        }
+
+    def run(self, **kwargs):
+        return self.run_with_worker('analyze_execution_timing', **kwargs)
+
+    def run_local(self, st2_exe_id, top_n=10):
+        parent_execution = self.st2_client_initialize(st2_exe_id)
+        root = self.build_timing_tree(parent_execution, parent_execution.action['ref'], 0,
+                                      time.time())
+        return self.analyze(root, top_n)
@@ -46,7 +46,10 @@ class BuildExecutionTree(BaseAction):
 
         return self.task_list
 
-    def run(self, st2_exe_id):
+    def run(self, **kwargs):
+        return self.run_with_worker('build_execution_tree', **kwargs)
+
+    def run_local(self, st2_exe_id):
 
         parent_execution = self.st2_client_initialize(st2_exe_id)
         self.task_list = []
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+import time
+from lib.base_action import BaseAction
+from lib.cron_sla import CronSLA
+from lib.cron_sla import OUTCOME_FAILED
+from lib.cron_sla import OUTCOME_RUNNING
+from lib.cron_sla import OUTCOME_SUCCEEDED
+from lib.statuses import ERRORED_STATUSES
+from lib.statuses import LIVEACTION_STATUS_SUCCEEDED
+from lib.timestamps import format_timestamp
+from lib.timestamps import parse_timestamp
+
+CRON_TIMER_TRIGGER_TYPE = "core.st2.CronTimer"
+
+# Format of the time filters sent to the rule enforcements and executions APIs
+QUERY_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
+
+# Executions start shortly after their rule enforcement, the executions query starts
+# this many seconds before the period to allow for clock differences
+EXECUTION_START_SLACK = 60
+
+REPORT_COUNTS = ['expected', 'ran', 'missed', 'succeeded', 'failed']
+
+
+def format_query_time(epoch):
+    return datetime.datetime.utcfromtimestamp(epoch).strftime(QUERY_TIME_FORMAT)
+
+
+class CronSlaReport(BaseAction):
+
+    def __init__(self, config):
+        """Creates a new BaseAction given a StackStorm config object (kwargs works too)
+        :param config: StackStorm configuration object for the pack
+        :returns: a new BaseAction
+        """
+        super(CronSlaReport, self).__init__(config)
+
+    def get_cron_rules(self, rule_refs=None):
+        rules = [rule for rule in self.st2_client.rules.query(enabled=True)
+                 if rule.trigger['type'] == CRON_TIMER_TRIGGER_TYPE]
+        if rule_refs:
+            rules = [rule for rule in rules if rule.ref in rule_refs]
+        return rules
+
+    def query_pages(self, manager, page_size, **filters):
+        """ Yields every result of a paginated query """
+        offset = 0
+        while True:
+            page = manager.query(limit=page_size, offset=offset, **filters)
+            for item in page:
+                yield item
+            if len(page) < page_size:
+                break
+            offset += page_size
+
+    def get_enforcements(self, since, until, page_size):
+        """ Fetches the enforcements of the period with one paginated query and groups
+        them by rule ref
+        """
+        grouped = {}
+        for enforcement in self.query_pages(self.st2_client.ruleenforcements, page_size,
+                                            enforced_at_gt=format_query_time(since),
+                                            enforced_at_lt=format_query_time(until)):
+            grouped.setdefault(enforcement.rule['ref'], []).append(enforcement)
+        return grouped
+
+    def get_execution_statuses(self, execution_ids, since, until, page_size):
+        """ Fetches the status of the executions with paginated queries projected to the
+        id and status. The executions API can't filter by id so the query covers every
+        cron execution of the period and stops once all the executions are found.
+        """
+        statuses = {}
+        missing = set(execution_ids)
+        if not missing:
+            return statuses
+        for execution in self.query_pages(self.st2_client.liveactions, page_size,
+                                          timestamp_gt=format_query_time(
+                                              since - EXECUTION_START_SLACK),
+                                          timestamp_lt=format_query_time(until),
+                                          trigger_type=CRON_TIMER_TRIGGER_TYPE,
+                                          include_attributes='id,status'):
+            if execution.id in missing:
+                statuses[execution.id] = execution.status
+                missing.discard(execution.id)
+                if not missing:
+                    break
+        return statuses
+
+    def get_outcome(self, enforcement, statuses):
+        # Enforcements without an execution are rules that failed to run their action
+        execution_id = getattr(enforcement, 'execution_id', None)
+        if not execution_id:
+            return OUTCOME_FAILED
+        status = statuses.get(execution_id)
+        if status == LIVEACTION_STATUS_SUCCEEDED:
+            return OUTCOME_SUCCEEDED
+        if status in ERRORED_STATUSES:
+            return OUTCOME_FAILED
+        return OUTCOME_RUNNING
+
+    def report(self, rules, enforcements, statuses, since, until):
+        """ Counts the expected, ran, missed, succeeded and failed runs of every rule
+        between since and until epoch seconds
+        """
+        results = []
+        totals = dict((count, 0) for count in REPORT_COUNTS)
+        for rule in sorted(rules, key=lambda r: r.ref):
+            enforced_at = []
+            outcomes = []
+            for enforcement in enforcements.get(rule.ref, []):
+                epoch = parse_timestamp(enforcement.enforced_at)
+                if epoch is not None:
+                    enforced_at.append(epoch)
+                    outcomes.append(self.get_outcome(enforcement, statuses))
+
+            sla = CronSLA(rule.trigger.get('parameters', {}), since, until)
+            result = sla.summarize(enforced_at, outcomes)
+            for count in REPORT_COUNTS:
+                totals[count] += result[count]
+            result['rule_ref'] = rule.ref
+            results.append(result)
+
+        return {
+            'since': format_timestamp(since),
+            'until': format_timestamp(until),
+            'rules': results,
+            'totals': totals
+        }
+
+    def run(self, **kwargs):
+        return self.run_with_worker('cron_sla_report', **kwargs)
+
+    def run_local(self, hours=24, until=None, grace_period=60, rule_refs=None,
+                  page_size=100):
+        if until:
+            until_epoch = parse_timestamp(until)
+            if until_epoch is None:
+                raise ValueError("Invalid until timestamp: {0}".format(until))
+        else:
+            until_epoch = time.time()
+        # Runs in the grace period may not have been enforced yet
+        until_epoch -= grace_period
+        since_epoch = until_epoch - hours * 3600
+
+        self.st2_client_connect()
+        rules = self.get_cron_rules(rule_refs)
+        enforcements = self.get_enforcements(since_epoch, until_epoch + grace_period,
+                                             page_size)
+        execution_ids = [e.execution_id for rule in rules
+                         for e in enforcements.get(rule.ref, [])
+                         if getattr(e, 'execution_id', None)]
+        statuses = self.get_execution_statuses(execution_ids, since_epoch,
+                                               until_epoch + grace_period, page_size)
+        return self.report(rules, enforcements, statuses, since_epoch, until_epoch)
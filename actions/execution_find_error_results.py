@@ -14,47 +14,19 @@
 # limitations under the License.
 
 import six
-import st2client
-import st2client.commands.action
-import st2client.models
 from lib.base_action import BaseAction
-
-
-QUEUED_STATUSES = [
-    st2client.commands.action.LIVEACTION_STATUS_REQUESTED,
-    st2client.commands.action.LIVEACTION_STATUS_SCHEDULED,
-    st2client.commands.action.LIVEACTION_STATUS_DELAYED,
-]
-
-PROGRESS_STATUSES = [
-    st2client.commands.action.LIVEACTION_STATUS_PAUSING,
-    st2client.commands.action.LIVEACTION_STATUS_PAUSED,
-    st2client.commands.action.LIVEACTION_STATUS_RESUMING,
-    st2client.commands.action.LIVEACTION_STATUS_RUNNING
-]
-
-COMPLETED_STATUSES = [
-    st2client.commands.action.LIVEACTION_STATUS_SUCCEEDED
-]
-
-ERRORED_STATUSES = [
-    st2client.commands.action.LIVEACTION_STATUS_FAILED,
-    st2client.commands.action.LIVEACTION_STATUS_TIMED_OUT,
-    st2client.commands.action.LIVEACTION_STATUS_ABANDONED,
-    st2client.commands.action.LIVEACTION_STATUS_CANCELED
-]
+from lib.statuses import COMPLETED_STATUSES
+from lib.statuses import ERRORED_STATUSES
+from lib.statuses import QUEUED_STATUSES
+from lib.statuses import RUNNING_STATUSES
 
 STACKSTORM_STATUSES = {
     'queued': QUEUED_STATUSES,
-    'running': PROGRESS_STATUSES,
+    'running': RUNNING_STATUSES,
     'succeeded': COMPLETED_STATUSES,
     'failed': ERRORED_STATUSES
 }
 
-COMPLETED_STATUSES = [
-    st2client.commands.action.LIVEACTION_STATUS_SUCCEEDED
-]
-
 
 class ExecutionFindErrorResults(BaseAction):
 
@@ -77,13 +49,17 @@ class ExecutionFindErrorResults(BaseAction):
         execution_status = {
             'st2_execution_id': st2_exe_id,
             'st2_execution_status': st2_status,
-            'st2_execution_comments': ""
+            'st2_execution_comments': "",
+            'st2_execution_error_category': ""
         }
 
         self.find_error_execution(st2_execution, provision_skip_list)
 
         if st2_status == 'failed':
             execution_status['st2_execution_comments'] = self.format_error(html_tags=False)
+            execution_status['st2_execution_error_category'] = self.classify_error(
+                execution_status['st2_execution_comments'])
+            self.index_errors()
         elif st2_status == 'unknown':
             execution_status['st2_execution_comments'] = ("Could not find execution_id "
                                                           "in database")
@@ -91,6 +67,9 @@ class ExecutionFindErrorResults(BaseAction):
         return execution_status
 
     def run(self, **kwargs):
+        return self.run_with_worker('execution_find_error_results', **kwargs)
+
+    def run_local(self, **kwargs):
 
         provision_skip_list = kwargs['provision_skip_list']
         st2_exe_id = kwargs['st2_exe_id']
@@ -26,6 +26,9 @@ class GetFormattedError(BaseAction):
         super(GetFormattedError, self).__init__(config)
 
     def run(self, **kwargs):
+        return self.run_with_worker('get_formatted_error', **kwargs)
+
+    def run_local(self, **kwargs):
 
         st2_exe_id = kwargs['st2_exe_id']
         html_tags = kwargs['html_tags']
@@ -35,6 +38,7 @@ class GetFormattedError(BaseAction):
         parent_execution = self.st2_client_initialize(st2_exe_id)
 
         self.find_error_execution(parent_execution, ignored_error_tasks)
+        self.index_errors()
 
         if len(self.child_error) == 0:
             self.parent_errors.append(parent_execution)
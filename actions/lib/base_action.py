@@ -13,11 +13,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import socket
 import re
 from six import string_types
 from st2common.runners.base_action import Action
-from st2client.client import Client
+from lib.error_message import get_error_message
+from lib.worker import forward
+from lib.worker import get_worker_config
+from lib.worker import WorkerUnavailable
 
 
 class BaseAction(Action):
@@ -33,10 +35,21 @@ class BaseAction(Action):
         self.errors_as_string = ""
         self.parent_errors = []
 
+    def st2_client_connect(self):
+        # The long-lived worker hands us an already connected client
+        if getattr(self, 'st2_client', None) is None:
+            # Imported here so forwarding to the worker doesn't pay for the st2 client import
+            import socket
+            from st2client.client import Client
+
+            st2_fqdn = socket.getfqdn()
+            st2_url = "https://{}/".format(st2_fqdn)
+            self.st2_client = Client(base_url=st2_url)
+
+        return self.st2_client
+
     def st2_client_initialize(self, st2_exe_id):
-        st2_fqdn = socket.getfqdn()
-        st2_url = "https://{}/".format(st2_fqdn)
-        self.st2_client = Client(base_url=st2_url)
+        self.st2_client_connect()
 
         vm_execution = self.st2_client.executions.get_by_id(st2_exe_id)
 
@@ -156,41 +169,97 @@ class BaseAction(Action):
         return error_string
 
     def get_error_message(self, error_result):
-        # Custom Error Messages returned from workflow outputs
-        if 'output' in error_result and error_result['output']:
-            if 'error' in error_result['output'] and error_result['output']['error'] is not None:
-                return error_result['output']['error']
-
-        # Jinja syntax errors
-        if 'errors' in error_result:
-            error = error_result['errors'][0]['message']
-            return error.replace("{{", '\\{\\{').replace("}}", '\\}\\}')
-
-        # StackStorm errors (ex. timeouts)
-        if 'error' in error_result:
-            return error_result['error']
-
-        # Bolt plans (https://github.com/StackStorm-Exchange/stackstorm-bolt)
-        if ('result' in error_result and
-           error_result['result'] and
-           error_result['result'] != 'None'):
-            if 'details' in error_result['result']:
-                if 'result_set' in error_result['result']['details']:
-                    result_set = error_result['result']['details']['result_set'][0]
-                    return result_set['value']['_error']['msg']
-
-            if isinstance(error_result['result'], string_types):
-                return error_result['result']
-
-            if 'stderr' in error_result['result']:
-                return error_result['result']['stderr']
-
-        # python actions
-        # ex. (vsphere pack https://github.com/StackStorm-Exchange/stackstorm-vsphere)
-        if 'stderr' in error_result:
-            return error_result['stderr']
-
-        return "Could not retrieve error message"
+        return get_error_message(error_result)
+
+    def classify_error(self, message):
+        """ Returns the category (timeout, auth_failure, network, ...) of an error message
+        """
+        from lib.error_classifier import get_classifier
+
+        if not isinstance(message, string_types):
+            message = str(message)
+        return get_classifier(self.config).classify(message)
+
+    def collect_error_records(self):
+        """ Builds an error record for every error found by find_error_execution
+        """
+        from lib.error_index import fingerprint
+        from lib.error_index import parse_timestamp
+
+        if self.child_error:
+            errors = [(e, self.get_error_message(e.result)) for e in self.child_error]
+        elif getattr(self, 'parent_error', None) is not None:
+            message = self.errors_as_string or self.get_error_message(self.parent_error.result)
+            errors = [(self.parent_error, message)]
+        else:
+            errors = []
+
+        records = []
+        for execution, message in errors:
+            if not isinstance(message, string_types):
+                message = str(message)
+            context = getattr(execution, 'context', None) or {}
+            action = getattr(execution, 'action', None) or {}
+            timestamp = (getattr(execution, 'end_timestamp', None) or
+                         getattr(execution, 'start_timestamp', None))
+            records.append({
+                'fingerprint': fingerprint(message),
+                'task_name': context.get('orquesta', {}).get('task_name'),
+                'action_ref': action.get('ref'),
+                'execution_id': execution.id,
+                'timestamp': parse_timestamp(timestamp),
+                'message': message,
+                'category': self.classify_error(message)
+            })
+
+        return records
+
+    def index_errors(self):
+        """ Stores the errors found by find_error_execution in the error index when
+        it is enabled in the pack config. Indexing problems are logged and never fail
+        the action.
+        """
+        from lib.error_index import ErrorIndex
+        from lib.error_index import get_index_config
+
+        index_config = get_index_config(self.config)
+        if not index_config['enabled']:
+            return 0
+
+        try:
+            records = self.collect_error_records()
+            if not records:
+                return 0
+            error_index = ErrorIndex(index_config['path'], index_config['retention_days'])
+            try:
+                return error_index.add(records)
+            finally:
+                error_index.close()
+        except Exception as e:  # pylint: disable=broad-except
+            self.logger.warning("Could not index errors: {0}".format(e))
+            return 0
+
+    def run_with_worker(self, action_name, **kwargs):
+        """ Forwards the action to the long-lived error worker when it is enabled
+        in the pack config. If the worker can not be connected to the action is run
+        in-process instead. Once the request is sent, worker errors and timeouts are
+        raised, the worker may have run the action already.
+        """
+        worker_config = get_worker_config(self.config)
+        if worker_config['enabled']:
+            try:
+                return forward(worker_config['socket_path'],
+                               action_name,
+                               kwargs,
+                               timeout=worker_config['timeout'])
+            except WorkerUnavailable as e:
+                self.logger.warning("Error worker unavailable, running in-process: "
+                                    "{0}".format(e))
+
+        return self.run_local(**kwargs)
+
+    def run_local(self, **kwargs):
+        raise RuntimeError("run_local() not implemented")
 
     def run(self, **kwargs):
         raise RuntimeError("run() not implemented")
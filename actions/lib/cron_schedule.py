@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+import json
+from crontab import CronTab
+
+UTC = datetime.timezone.utc
+
+STACKSTORM_TO_CRONTAB_DAYS = {
+    # Stackstorm Cron days => Crontab days
+    0: 1,
+    1: 2,
+    2: 3,
+    3: 4,
+    4: 5,
+    5: 6,
+    6: 0,
+}
+
+
+def convert_to_crontab(st2_cron):
+    """ Converts Stackstorm cron information to standard crontab
+    If day of the week is an integer covert it to the correct
+    integer as stackstorm starts the week on monday where
+    cron tab starts on Sunday
+    https://docs.stackstorm.com/rules.html#core-st2-crontimer
+    """
+    day_of_week = st2_cron.get('day_of_week', '*')
+    if isinstance(day_of_week, int):
+        day_of_week = STACKSTORM_TO_CRONTAB_DAYS[day_of_week]
+
+    cron_tab = [
+        str(st2_cron.get('second', '*')),
+        str(st2_cron.get('minute', '*')),
+        str(st2_cron.get('hour', '*')),
+        str(st2_cron.get('day', '*')),
+        str(st2_cron.get('month', '*')),
+        str(day_of_week),
+        str(st2_cron.get('year', '*'))
+    ]
+
+    return " ".join(cron_tab)
+
+
+def schedule_key(st2_cron):
+    """ Returns a key that changes whenever the rule's trigger parameters change """
+    return json.dumps(st2_cron, sort_keys=True, default=str)
+
+
+class CronSchedule(object):
+    """ A compiled CronTab and the last window computed from it. previous and next are
+    epoch seconds with previous <= now < next. They match CronTab.previous()/next(),
+    except when now is exactly a run time: that run is the previous one, so it is
+    still checked.
+    """
+
+    def __init__(self, st2_cron):
+        self.key = schedule_key(st2_cron)
+        self.crontab = CronTab(convert_to_crontab(st2_cron))
+        self.previous = None
+        self.next = None
+        self.previous_dt = None
+        self.next_dt = None
+
+    def _occurrence_after(self, epoch):
+        return self.crontab.next(now=datetime.datetime.fromtimestamp(epoch, UTC), delta=False)
+
+    def window(self, now):
+        """ Returns the (previous, next) run times around now as UTC datetimes
+        :param now: timezone aware datetime
+        """
+        now_s = now.timestamp()
+        if self.previous is not None and self.previous <= now_s < self.next:
+            return self.previous_dt, self.next_dt
+
+        following = None
+        if self.next is not None and now_s >= self.next:
+            # Most polls only move past one run time, the old next run becomes the
+            # previous one and only the new next run has to be computed
+            following = self._occurrence_after(self.next)
+
+        if following is not None and now_s < following:
+            previous, next_run = self.next, following
+        else:
+            previous = self.crontab.previous(now=now, delta=False)
+            next_run = self.crontab.next(now=now, delta=False)
+            # previous() and next() both skip a run at exactly now
+            if now_s == int(now_s) and self._occurrence_after(now_s - 1) == now_s:
+                previous = now_s
+
+        self.previous, self.next = previous, next_run
+        self.previous_dt = datetime.datetime.fromtimestamp(previous, UTC)
+        self.next_dt = datetime.datetime.fromtimestamp(next_run, UTC)
+        return self.previous_dt, self.next_dt
+
+
+class ScheduleCache(object):
+    """ Compiled schedules keyed by rule ref, rebuilt when a rule's parameters change """
+
+    def __init__(self):
+        self.schedules = {}
+
+    def get(self, rule_ref, st2_cron):
+        schedule = self.schedules.get(rule_ref)
+        if schedule is None or schedule.key != schedule_key(st2_cron):
+            schedule = CronSchedule(st2_cron)
+            self.schedules[rule_ref] = schedule
+        return schedule
+
+    def get_key(self, rule_ref):
+        schedule = self.schedules.get(rule_ref)
+        return schedule.key if schedule is not None else None
+
+    def window(self, rule_ref, st2_cron, now):
+        return self.get(rule_ref, st2_cron).window(now)
+
+    def prune(self, rule_refs):
+        """ Drops the schedules of rules that aren't in rule_refs any more """
+        for rule_ref in set(self.schedules) - set(rule_refs):
+            del self.schedules[rule_ref]
+
+    def __len__(self):
+        return len(self.schedules)
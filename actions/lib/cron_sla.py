@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import bisect
+import datetime
+import math
+from crontab import CronTab
+from lib.cron_schedule import convert_to_crontab
+from lib.lru_cache import LRUCache
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover (numpy is optional)
+    numpy = None
+
+DAY_SECONDS = 86400
+
+# Outcome of the newest enforcement of an expected run
+OUTCOME_RUNNING = 0
+OUTCOME_SUCCEEDED = 1
+OUTCOME_FAILED = 2
+
+# The error worker runs the report repeatedly so the memoized fields are bounded
+_OFFSETS = LRUCache(1024)
+_DAYS = LRUCache(1024)
+
+
+def _field_values(matcher, size):
+    if matcher.any:
+        return list(range(size))
+    return sorted(value for value in matcher.allowed if 0 <= value < size)
+
+
+def get_time_offsets(second, minute, hour):
+    """ Returns the sorted seconds after midnight at which the second, minute and hour
+    crontab fields fire, cached per distinct set of fields
+    """
+    key = (second, minute, hour)
+    offsets = _OFFSETS.get(key)
+    if offsets is None:
+        matchers = CronTab(' '.join([second, minute, hour, '*', '*', '*', '*'])).matchers
+        hours = _field_values(matchers.hour, 24)
+        minutes = _field_values(matchers.minute, 60)
+        seconds = _field_values(matchers.second, 60)
+        offsets = sorted(h * 3600 + m * 60 + s
+                         for h in hours for m in minutes for s in seconds)
+        _OFFSETS.set(key, offsets)
+    return offsets
+
+
+def get_matching_days(day, month, weekday, year, first_day, last_day):
+    """ Returns the days since the epoch between first_day and last_day (included) on
+    which the date crontab fields fire. Each distinct set of fields is only tested
+    against each day once, most rules share a handful of them.
+    """
+    key = (day, month, weekday, year, first_day, last_day)
+    days = _DAYS.get(key)
+    if days is None:
+        crontab = CronTab(' '.join(['0', '0', '0', day, month, weekday, year]))
+        epoch = datetime.datetime(1970, 1, 1)
+        days = [d for d in range(first_day, last_day + 1)
+                if crontab.test(epoch + datetime.timedelta(days=d))]
+        _DAYS.set(key, days)
+    return days
+
+
+class CronSLA(object):
+    """ The expected runs of a cron rule between start and end epoch seconds. The
+    runs are numbered in time order as slots: slot p * len(offsets) + k is the k-th
+    time of day of the p-th matching day. Run times are never materialized so a rule
+    running every second costs the same as a daily one.
+    """
+
+    def __init__(self, st2_cron, start, end):
+        fields = convert_to_crontab(st2_cron).split()
+        self.start = start
+        self.end = end
+        self.offsets = get_time_offsets(*fields[0:3])
+        day, month, weekday, year = fields[3:7]
+        self.days = get_matching_days(day, month, weekday, year,
+                                      int(start // DAY_SECONDS), int(end // DAY_SECONDS))
+        self.first_slot = self.count_before(start)
+        self.last_slot = self.count_before(end)
+
+    @property
+    def expected(self):
+        return self.last_slot - self.first_slot
+
+    def slot_of(self, epoch):
+        """ Returns the slot of the newest run at or before epoch, -1 when none """
+        if not self.offsets:
+            return -1
+        seconds = math.floor(epoch)
+        day, time_of_day = divmod(seconds, DAY_SECONDS)
+        position = bisect.bisect_right(self.days, day) - 1
+        if position < 0:
+            return -1
+        index = len(self.offsets) - 1
+        if self.days[position] == day:
+            index = bisect.bisect_right(self.offsets, time_of_day) - 1
+            if index < 0:
+                # Before the first run of the day, the run belongs to the day before
+                position -= 1
+                index = len(self.offsets) - 1
+        if position < 0:
+            return -1
+        return position * len(self.offsets) + index
+
+    def slots_of(self, epochs):
+        """ slot_of for a numpy array of epoch seconds """
+        epochs = numpy.floor(numpy.asarray(epochs, dtype=numpy.float64)).astype(numpy.int64)
+        if not self.offsets or not self.days or not len(epochs):
+            return numpy.full(len(epochs), -1, dtype=numpy.int64)
+
+        days = numpy.asarray(self.days, dtype=numpy.int64)
+        offsets = numpy.asarray(self.offsets, dtype=numpy.int64)
+        count = len(offsets)
+        day, time_of_day = numpy.divmod(epochs, DAY_SECONDS)
+        position = numpy.searchsorted(days, day, side='right') - 1
+        same_day = (position >= 0) & (days[numpy.clip(position, 0, None)] == day)
+        index = numpy.where(same_day,
+                            numpy.searchsorted(offsets, time_of_day, side='right') - 1,
+                            count - 1)
+        position = numpy.where(index < 0, position - 1, position)
+        index = numpy.where(index < 0, count - 1, index)
+        return numpy.where(position >= 0, position * count + index, -1)
+
+    def count_before(self, epoch):
+        """ Returns the number of runs strictly before epoch """
+        # Runs are on whole seconds so runs before epoch are runs at or before the
+        # whole second preceding it
+        return self.slot_of(math.ceil(epoch) - 1) + 1
+
+    def summarize(self, enforced_at, outcomes):
+        """ Counts the expected runs that ran, succeeded and failed. When a run has
+        several enforcements the newest one decides its outcome.
+        :param enforced_at: epoch seconds of the rule's enforcements
+        :param outcomes: OUTCOME_* of each enforcement
+        """
+        if numpy is not None and len(enforced_at):
+            newest = self._newest_per_slot_numpy(enforced_at, outcomes)
+        else:
+            newest = self._newest_per_slot(enforced_at, outcomes)
+
+        return {
+            'expected': self.expected,
+            'ran': len(newest),
+            'missed': self.expected - len(newest),
+            'succeeded': sum(1 for outcome in newest if outcome == OUTCOME_SUCCEEDED),
+            'failed': sum(1 for outcome in newest if outcome == OUTCOME_FAILED),
+        }
+
+    def _newest_per_slot(self, enforced_at, outcomes):
+        newest = {}
+        for epoch, outcome in zip(enforced_at, outcomes):
+            slot = self.slot_of(epoch)
+            if self.first_slot <= slot < self.last_slot:
+                if slot not in newest or epoch >= newest[slot][0]:
+                    newest[slot] = (epoch, outcome)
+        return [outcome for _, outcome in newest.values()]
+
+    def _newest_per_slot_numpy(self, enforced_at, outcomes):
+        enforced_at = numpy.asarray(enforced_at, dtype=numpy.float64)
+        outcomes = numpy.asarray(outcomes)
+        order = numpy.argsort(enforced_at, kind='stable')
+        slots = self.slots_of(enforced_at[order])
+        outcomes = outcomes[order]
+        in_period = (slots >= self.first_slot) & (slots < self.last_slot)
+        slots, outcomes = slots[in_period], outcomes[in_period]
+        # The first of each slot in the reversed arrays is the newest enforcement
+        _, first = numpy.unique(slots[::-1], return_index=True)
+        return outcomes[::-1][first].tolist()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import bisect
+import math
+from lib.timestamps import parse_timestamp
+
+
+class EnforcementIndex(object):
+    """ The enforcements of a rule sorted by enforced_at. Each timestamp is parsed
+    once and window lookups are a binary search, so the result doesn't depend on the
+    order the API returned the enforcements in.
+    """
+
+    def __init__(self, enforcements):
+        entries = []
+        for position, enforcement in enumerate(enforcements):
+            enforced_at = parse_timestamp(enforcement.enforced_at)
+            if enforced_at is not None:
+                # Ties keep the API order: the first returned is considered the newest
+                entries.append((enforced_at, -position, enforcement))
+        entries.sort(key=lambda entry: entry[:2])
+
+        # Windows are compared to the enforced_at time without its fraction of a second
+        self.seconds = [math.floor(entry[0]) for entry in entries]
+        self.enforcements = [entry[2] for entry in entries]
+
+    def __len__(self):
+        return len(self.enforcements)
+
+    def latest(self):
+        """ Returns the newest enforcement, or None """
+        return self.enforcements[-1] if self.enforcements else None
+
+    def latest_between(self, low, high):
+        """ Returns the newest enforcement enforced between the low and high epoch
+        seconds, both included, or None
+        """
+        index = bisect.bisect_right(self.seconds, high) - 1
+        if index >= 0 and self.seconds[index] >= low:
+            return self.enforcements[index]
+        return None
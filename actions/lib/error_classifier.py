@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import re
+
+UNKNOWN_CATEGORY = 'unknown'
+
+# Patterns without any of these characters match themselves literally
+REGEX_METACHARACTERS = set('.^$*+?{}[]\\|()')
+
+# Patterns are case insensitive regular expressions. Categories are tried in this
+# order when two categories match at the same position in a message.
+DEFAULT_CATEGORIES = [
+    ('timeout', [
+        r'timed? ?out',
+        r'timeout',
+        r'deadline exceeded',
+    ]),
+    ('auth_failure', [
+        r'unauthori[sz]ed',
+        r'authentication (?:failed|failure|error)',
+        r'permission denied',
+        r'access denied',
+        r'invalid (?:credentials|token|api key)',
+        r'\b401\b',
+        r'\b403\b',
+    ]),
+    ('host_unreachable', [
+        r'host (?:is )?unreachable',
+        r'no route to host',
+        r'unreachable',
+    ]),
+    ('network', [
+        r'connection (?:refused|reset|aborted)',
+        r'name or service not known',
+        r'temporary failure in name resolution',
+        r'network is unreachable',
+        r'ssl(?:error)?\b',
+        r'max retries exceeded',
+    ]),
+    ('jinja_yaql', [
+        r'jinja',
+        r'yaql',
+        r'undefinederror',
+        r'templatesyntaxerror',
+        r'unable to (?:render|evaluate) expression',
+    ]),
+    ('quota', [
+        r'quota',
+        r'rate limit',
+        r'too many requests',
+        r'\b429\b',
+        r'insufficient (?:capacity|resources|space)',
+        r'no space left on device',
+    ]),
+]
+
+
+def get_classifier_config(config):
+    """ Returns the error_classification section of the pack config. Categories in
+    the config replace the default category with the same name, new categories are
+    appended after the defaults.
+    """
+    classifier_config = (config or {}).get('error_classification') or {}
+    categories = list(DEFAULT_CATEGORIES)
+    if classifier_config.get('replace_defaults', False):
+        categories = []
+
+    names = [name for name, _ in categories]
+    for name, patterns in (classifier_config.get('categories') or {}).items():
+        if name in names:
+            categories[names.index(name)] = (name, patterns)
+        else:
+            categories.append((name, patterns))
+            names.append(name)
+
+    return categories
+
+
+_CLASSIFIERS = {}
+
+
+def get_classifier(config):
+    """ Returns a compiled ErrorClassifier for the pack config. Classifiers are cached
+    per category set so long-lived processes only compile the patterns once.
+    """
+    categories = get_classifier_config(config)
+    key = repr(categories)
+    if key not in _CLASSIFIERS:
+        _CLASSIFIERS[key] = ErrorClassifier(categories)
+    return _CLASSIFIERS[key]
+
+
+def _trie_pattern(literals):
+    """ Builds a regex matching any of the literals where literals sharing a prefix
+    share a branch, e.g. ['timed out', 'timeout'] => 'time(?:d\\ out|out)'. The regex
+    engine can then reject a position after one character instead of trying every
+    literal in turn.
+    """
+    trie = {}
+    for literal in literals:
+        node = trie
+        for char in literal:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def emit(node):
+        alternatives = [re.escape(char) + emit(child)
+                        for char, child in sorted(node.items()) if char]
+        if not alternatives:
+            return ''
+        is_end = '' in node
+        if len(alternatives) == 1 and not is_end:
+            return alternatives[0]
+        pattern = '(?:{0})'.format('|'.join(alternatives))
+        return pattern + '?' if is_end else pattern
+
+    return emit(trie)
+
+
+class ErrorClassifier(object):
+    """ Classifies error messages into categories with a single combined matcher so a
+    message is scanned once no matter how many patterns there are. Every category is
+    one named group, in config order, holding a prefix trie of its literal patterns
+    matched against the lower cased message followed by its regex patterns.
+    """
+
+    def __init__(self, categories=None):
+        """
+        :param categories: list of (category name, list of regex patterns)
+        :raises ValueError: a pattern is not a valid regular expression
+        """
+        self.categories = categories if categories is not None else DEFAULT_CATEGORIES
+        self.literals = {}
+        self.group_names = {}
+
+        category_patterns = []
+        for name, patterns in self.categories:
+            literals = []
+            regexes = []
+            for pattern in patterns or []:
+                # Compile each pattern on its own so a bad one is reported clearly
+                try:
+                    re.compile(pattern)
+                except re.error as e:
+                    raise ValueError("Invalid pattern {0!r} of error category {1}: "
+                                     "{2}".format(pattern, name, e))
+                if not REGEX_METACHARACTERS.intersection(pattern):
+                    # The first category wins when a literal is in several categories
+                    if pattern.lower() not in self.literals:
+                        self.literals[pattern.lower()] = name
+                        literals.append(pattern.lower())
+                else:
+                    regexes.append('(?i:{0})'.format(pattern))
+            if literals:
+                regexes.insert(0, _trie_pattern(literals))
+            category_patterns.append((name, regexes))
+
+        alternatives = []
+        for index, (name, regexes) in enumerate(category_patterns):
+            if regexes:
+                group = 'c{0}'.format(index)
+                self.group_names[group] = name
+                # The category group closes after any group inside the patterns so
+                # match.lastgroup is always the category. When categories match at
+                # the same position the first one wins.
+                alternatives.append('(?P<{0}>{1})'.format(group, '|'.join(regexes)))
+
+        self.matcher = re.compile('|'.join(alternatives)) if alternatives else None
+
+    def classify(self, message):
+        """ Returns the category of the leftmost pattern that matches the message, or
+        'unknown' when nothing matches
+        """
+        if not message or self.matcher is None:
+            return UNKNOWN_CATEGORY
+
+        match = self.matcher.search(message.lower())
+        if match is None:
+            return UNKNOWN_CATEGORY
+        return self.group_names[match.lastgroup]
+
+    def classify_all(self, messages):
+        return [self.classify(message) for message in messages]
@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import re
+import sqlite3
+import time
+from lib.timestamps import format_timestamp
+from lib.timestamps import parse_timestamp as _parse_timestamp
+
+DEFAULT_INDEX_PATH = "/var/lib/st2/errors_index.sqlite"
+DEFAULT_RETENTION_DAYS = 7
+DEFAULT_LIMIT = 100
+
+# Parts of an error message that change between runs of the same failure. They are
+# replaced before hashing so the same error in different executions shares a fingerprint.
+FINGERPRINT_SUBSTITUTIONS = [
+    (re.compile(r'\x1B\[[0-?]*[ -/]*[@-~]'), ''),
+    (re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}'), '<uuid>'),
+    (re.compile(r'\b[0-9a-f]{8,}\b'), '<hex>'),
+    (re.compile(r'\d+'), '<n>'),
+    (re.compile(r'\s+'), ' '),
+]
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS errors (
+        id INTEGER PRIMARY KEY,
+        fingerprint TEXT NOT NULL,
+        task_name TEXT,
+        action_ref TEXT,
+        execution_id TEXT NOT NULL,
+        timestamp REAL NOT NULL,
+        message TEXT,
+        category TEXT,
+        UNIQUE (execution_id, fingerprint)
+    )""",
+    "CREATE INDEX IF NOT EXISTS errors_fingerprint ON errors (fingerprint, timestamp)",
+    "CREATE INDEX IF NOT EXISTS errors_task_name ON errors (task_name, timestamp)",
+    "CREATE INDEX IF NOT EXISTS errors_timestamp ON errors (timestamp)",
+    "CREATE INDEX IF NOT EXISTS errors_category ON errors (category, timestamp)",
+]
+
+FTS_SCHEMA = "CREATE VIRTUAL TABLE IF NOT EXISTS errors_fts USING fts5(message)"
+
+COLUMNS = ['fingerprint', 'task_name', 'action_ref', 'execution_id', 'timestamp', 'message',
+           'category']
+
+
+def get_index_config(config):
+    """ Returns the error_index section of the pack config with defaults filled in
+    """
+    index_config = (config or {}).get('error_index') or {}
+    return {
+        'enabled': index_config.get('enabled', False),
+        'path': index_config.get('path', DEFAULT_INDEX_PATH),
+        'retention_days': index_config.get('retention_days', DEFAULT_RETENTION_DAYS),
+    }
+
+
+def fingerprint(message):
+    """ Returns a stable hash of an error message with the run specific parts
+    (ids, numbers, whitespace, ansi escapes) normalized away
+    """
+    normalized = message.lower()
+    for pattern, replacement in FINGERPRINT_SUBSTITUTIONS:
+        normalized = pattern.sub(replacement, normalized)
+    return hashlib.sha1(normalized.strip().encode('utf-8')).hexdigest()
+
+
+def parse_timestamp(timestamp):
+    """ Converts a StackStorm timestamp to epoch seconds, returns the current time if
+    the timestamp is missing or malformed
+    """
+    return _parse_timestamp(timestamp, default=time.time())
+
+
+class ErrorIndex(object):
+    """ Embedded SQLite store of the errors extracted from executions. Messages are
+    indexed with FTS5 when the sqlite build supports it, otherwise text search falls
+    back to LIKE.
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH, retention_days=DEFAULT_RETENTION_DAYS):
+        self.path = path
+        self.retention_days = retention_days
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.row_factory = sqlite3.Row
+        with self.connection:
+            for statement in SCHEMA:
+                self.connection.execute(statement)
+            try:
+                self.connection.execute(FTS_SCHEMA)
+                self.fts = True
+            except sqlite3.OperationalError:
+                self.fts = False
+
+    def close(self):
+        self.connection.close()
+
+    def add(self, records):
+        """ Stores error records, each a dict with fingerprint, task_name, action_ref,
+        execution_id, timestamp, message and category. Records already stored for the same
+        execution and fingerprint are ignored.
+        :returns: the number of new records
+        """
+        added = 0
+        with self.connection:
+            for record in records:
+                cursor = self.connection.execute(
+                    "INSERT OR IGNORE INTO errors ({0}) VALUES ({1})".format(
+                        ', '.join(COLUMNS), ', '.join('?' * len(COLUMNS))),
+                    [record.get(column) for column in COLUMNS])
+                if cursor.rowcount == 1:
+                    added += 1
+                    if self.fts:
+                        self.connection.execute(
+                            "INSERT INTO errors_fts (rowid, message) VALUES (?, ?)",
+                            (cursor.lastrowid, record.get('message') or ''))
+        self.evict()
+        return added
+
+    def evict(self, now=None):
+        """ Drops the records older than the retention period
+        :returns: the number of records removed
+        """
+        cutoff = (now or time.time()) - self.retention_days * 86400
+        with self.connection:
+            if self.fts:
+                self.connection.execute(
+                    "DELETE FROM errors_fts WHERE rowid IN "
+                    "(SELECT id FROM errors WHERE timestamp < ?)", (cutoff,))
+            cursor = self.connection.execute("DELETE FROM errors WHERE timestamp < ?",
+                                             (cutoff,))
+        return cursor.rowcount
+
+    def _query(self, where, parameters, since=None, limit=DEFAULT_LIMIT):
+        if since is not None:
+            where += " AND errors.timestamp >= ?"
+            parameters = list(parameters) + [since]
+        sql = ("SELECT {0} FROM errors WHERE {1} "
+               "ORDER BY errors.timestamp DESC LIMIT ?").format(
+                   ', '.join('errors.' + c for c in COLUMNS), where)
+        rows = self.connection.execute(sql, list(parameters) + [limit]).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    def _row_to_dict(self, row):
+        record = dict(zip(COLUMNS, row))
+        record['timestamp'] = format_timestamp(record['timestamp'])
+        return record
+
+    def find_by_fingerprint(self, error_fingerprint, since=None, limit=DEFAULT_LIMIT):
+        return self._query("errors.fingerprint = ?", [error_fingerprint], since, limit)
+
+    def find_by_task(self, task_name, since=None, limit=DEFAULT_LIMIT):
+        return self._query("errors.task_name = ?", [task_name], since, limit)
+
+    def find_by_execution(self, execution_id, since=None, limit=DEFAULT_LIMIT):
+        return self._query("errors.execution_id = ?", [execution_id], since, limit)
+
+    def find_by_category(self, category, since=None, limit=DEFAULT_LIMIT):
+        return self._query("errors.category = ?", [category], since, limit)
+
+    def search(self, text, since=None, limit=DEFAULT_LIMIT):
+        """ Full text search of the error messages """
+        if self.fts:
+            # Quote the text so FTS operators in error messages are matched literally
+            match = '"{0}"'.format(text.replace('"', '""'))
+            return self._query("errors.id IN (SELECT rowid FROM errors_fts "
+                               "WHERE errors_fts MATCH ?)", [match], since, limit)
+
+        like = '%{0}%'.format(text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_'))
+        return self._query("errors.message LIKE ? ESCAPE '\\'", [like], since, limit)
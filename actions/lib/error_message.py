@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from six import string_types
+
+# Returned by get_error_message when an execution result holds no error
+DEFAULT_ERROR_MESSAGE = "Could not retrieve error message"
+
+
+def get_error_message(error_result, default=DEFAULT_ERROR_MESSAGE):
+    """ Returns the error message of an execution result, shared by the actions and the
+    cron sensors
+    :param error_result: the result of a failed execution
+    :param default: returned when the result holds no error message
+    """
+    if not isinstance(error_result, dict):
+        return default
+
+    # Custom Error Messages returned from workflow outputs
+    output = error_result.get('output')
+    if isinstance(output, dict) and output.get('error') is not None:
+        return output['error']
+
+    # Jinja syntax errors
+    if 'errors' in error_result:
+        errors = error_result['errors'] or [{}]
+        error = errors[0].get('message', '') if isinstance(errors[0], dict) else errors[0]
+        return str(error).replace("{{", '\\{\\{').replace("}}", '\\}\\}')
+
+    # StackStorm errors (ex. timeouts)
+    if 'error' in error_result:
+        return error_result['error']
+
+    # Bolt plans (https://github.com/StackStorm-Exchange/stackstorm-bolt)
+    result = error_result.get('result')
+    if result and result != 'None':
+        if isinstance(result, string_types):
+            return result
+
+        if isinstance(result, dict):
+            details = result.get('details')
+            if isinstance(details, dict) and 'result_set' in details:
+                result_set = details['result_set'][0]
+                return result_set['value']['_error']['msg']
+
+            if 'stderr' in result:
+                return result['stderr']
+
+    # python actions
+    # ex. (vsphere pack https://github.com/StackStorm-Exchange/stackstorm-vsphere)
+    if 'stderr' in error_result:
+        return error_result['stderr']
+
+    return default
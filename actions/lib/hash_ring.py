@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import bisect
+import hashlib
+
+DEFAULT_REPLICAS = 100
+
+
+def _hash(value):
+    return int(hashlib.md5(value.encode('utf-8')).hexdigest()[:16], 16)
+
+
+class HashRing(object):
+    """ Consistent hash ring mapping keys to nodes. Every node is placed on the ring
+    replicas times so keys spread evenly, and adding or removing a node only moves the
+    keys of that node.
+    """
+
+    def __init__(self, nodes, replicas=DEFAULT_REPLICAS):
+        self.nodes = sorted(set(nodes))
+        self.replicas = replicas
+        points = sorted((_hash("{0}#{1}".format(node, replica)), node)
+                        for node in self.nodes for replica in range(replicas))
+        self.hashes = [point for point, _ in points]
+        self.owners = [node for _, node in points]
+
+    def get_node(self, key):
+        """ Returns the node owning the key, None when the ring is empty """
+        if not self.hashes:
+            return None
+        index = bisect.bisect(self.hashes, _hash(key)) % len(self.hashes)
+        return self.owners[index]
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import socket
+import threading
+
+DEFAULT_STATSD_PORT = 8125
+
+
+def get_metrics_config(config):
+    """ Returns the metrics section of the pack config with defaults filled in
+    """
+    metrics_config = (config or {}).get('metrics') or {}
+    return {
+        'statsd_host': metrics_config.get('statsd_host'),
+        'statsd_port': metrics_config.get('statsd_port', DEFAULT_STATSD_PORT),
+    }
+
+
+def get_st2_metrics_driver():
+    """ Returns the metrics driver configured in st2.conf ([metrics] driver = statsd or
+    noop), or None outside of a StackStorm process
+    """
+    try:
+        from st2common.metrics.base import get_driver
+        return get_driver()
+    except Exception:  # pylint: disable=broad-except
+        return None
+
+
+def get_metrics_driver(config):
+    """ Returns a StatsdDriver when the pack config names a statsd host, otherwise the
+    st2 metrics driver
+    """
+    metrics_config = get_metrics_config(config)
+    if metrics_config['statsd_host']:
+        return StatsdDriver(metrics_config['statsd_host'], metrics_config['statsd_port'])
+    return get_st2_metrics_driver()
+
+
+class StatsdDriver(object):
+    """ Sends metrics straight to a statsd compatible server over UDP, for deployments
+    where st2 itself has no metrics driver configured. Send errors are ignored so
+    metrics can never break the sensor.
+    """
+
+    def __init__(self, host, port=DEFAULT_STATSD_PORT):
+        self.address = (host, port)
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def _send(self, line):
+        try:
+            self.socket.sendto(line.encode('utf-8'), self.address)
+        except (OSError, socket.error):
+            pass
+
+    def inc_counter(self, key, amount=1):
+        self._send("{0}:{1}|c".format(key, amount))
+
+    def set_gauge(self, key, value):
+        self._send("{0}:{1}|g".format(key, value))
+
+    def time(self, key, seconds):
+        self._send("{0}:{1:.3f}|ms".format(key, seconds * 1000))
+
+
+class Metrics(object):
+    """ Counters, gauges and timings sent to a metrics driver under a common prefix.
+    The totals of the counters, the last value of the gauges and the count, total and
+    max of the timings are also kept so they can be logged or inspected.
+    """
+
+    def __init__(self, prefix, driver=None, config=None):
+        """
+        :param prefix: prepended to every metric name with a dot
+        :param driver: object with the inc_counter(key, amount), set_gauge(key, value)
+                       and time(key, seconds) methods of the st2 metrics drivers
+        :param config: pack config the driver is picked from when none is given
+        """
+        self.prefix = prefix
+        self.config = config
+        self._driver = driver
+        self._driver_loaded = driver is not None
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.timings = {}
+
+    @property
+    def driver(self):
+        if not self._driver_loaded:
+            self._driver = get_metrics_driver(self.config)
+            self._driver_loaded = True
+        return self._driver
+
+    def key(self, name):
+        return "{0}.{1}".format(self.prefix, name)
+
+    def inc_counter(self, name, amount=1):
+        # Rule checks can run on several threads
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+        if self.driver is not None:
+            self.driver.inc_counter(self.key(name), amount)
+
+    def set_gauge(self, name, value):
+        self.gauges[name] = value
+        if self.driver is not None:
+            self.driver.set_gauge(self.key(name), value)
+
+    def time(self, name, seconds):
+        with self._lock:
+            timing = self.timings.setdefault(name, {'count': 0, 'total': 0.0, 'max': 0.0})
+            timing['count'] += 1
+            timing['total'] += seconds
+            timing['max'] = max(timing['max'], seconds)
+        if self.driver is not None:
+            self.driver.time(self.key(name), seconds)
+
+    def total(self, prefix):
+        """ Returns the sum of the counters whose name starts with prefix """
+        return sum(value for name, value in self.counters.items() if name.startswith(prefix))
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import heapq
+import itertools
+
+
+class RuleScheduler(object):
+    """ Min-heap of rule refs keyed by the epoch time the rule next needs checking.
+    Rescheduling a rule leaves its old heap entry in place, stale entries are skipped
+    when they reach the top of the heap.
+    """
+
+    def __init__(self):
+        self.heap = []
+        self.due_times = {}
+        self.counter = itertools.count()
+
+    def schedule(self, rule_ref, due):
+        """ Sets the time the rule is next checked, replacing any earlier schedule """
+        self.due_times[rule_ref] = due
+        heapq.heappush(self.heap, (due, next(self.counter), rule_ref))
+
+    def remove(self, rule_ref):
+        self.due_times.pop(rule_ref, None)
+
+    def prune(self, rule_refs):
+        """ Unschedules the rules that aren't in rule_refs any more """
+        for rule_ref in set(self.due_times) - set(rule_refs):
+            del self.due_times[rule_ref]
+
+        # Rebuild the heap once stale entries outnumber the scheduled rules
+        if len(self.heap) > 2 * len(self.due_times):
+            self.heap = [entry for entry in self.heap
+                         if self.due_times.get(entry[2]) == entry[0]]
+            heapq.heapify(self.heap)
+
+    def _discard_stale(self):
+        while self.heap:
+            due, _, rule_ref = self.heap[0]
+            if self.due_times.get(rule_ref) == due:
+                return
+            heapq.heappop(self.heap)
+
+    def pop_due(self, now):
+        """ Removes and returns the refs of every rule due at or before now, earliest
+        first. Popped rules are unscheduled until they are scheduled again.
+        """
+        due_rules = []
+        while True:
+            self._discard_stale()
+            if not self.heap or self.heap[0][0] > now:
+                return due_rules
+            _, _, rule_ref = heapq.heappop(self.heap)
+            del self.due_times[rule_ref]
+            due_rules.append(rule_ref)
+
+    def next_due(self):
+        """ Returns the earliest due time or None when no rule is scheduled """
+        self._discard_stale()
+        return self.heap[0][0] if self.heap else None
+
+    def __contains__(self, rule_ref):
+        return rule_ref in self.due_times
+
+    def __len__(self):
+        return len(self.due_times)
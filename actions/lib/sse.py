@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import ssl
+
+try:
+    from urllib.request import Request, urlopen
+except ImportError:  # pragma: no cover (python 2)
+    from urllib2 import Request, urlopen  # pylint: disable=import-error
+
+DEFAULT_TIMEOUT = 90
+
+
+class SSEEvent(object):
+    """ A server-sent event, data is decoded from JSON when it is valid JSON """
+
+    def __init__(self, event, data, event_id=None):
+        self.event = event
+        self.data = data
+        self.id = event_id
+
+    def json(self):
+        return json.loads(self.data)
+
+
+def iter_sse_events(lines):
+    """ Parses server-sent events from an iterable of text lines
+    https://html.spec.whatwg.org/multipage/server-sent-events.html#event-stream-interpretation
+    """
+    event = None
+    event_id = None
+    data = []
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if not line:
+            if data:
+                yield SSEEvent(event or 'message', '\n'.join(data), event_id)
+            event = None
+            data = []
+            continue
+        if line.startswith(':'):
+            # Comment, st2 sends these as keep alives
+            continue
+
+        field, _, value = line.partition(':')
+        if value.startswith(' '):
+            value = value[1:]
+        if field == 'event':
+            event = value
+        elif field == 'data':
+            data.append(value)
+        elif field == 'id':
+            event_id = value
+
+    if data:
+        yield SSEEvent(event or 'message', '\n'.join(data), event_id)
+
+
+def open_stream(url, headers=None, timeout=DEFAULT_TIMEOUT, verify_ssl=True):
+    """ Connects to an event stream and returns an iterator over its events. The
+    timeout applies to each read so it has to be longer than the keep alive interval.
+    """
+    request = Request(url, headers=dict(headers or {}, Accept='text/event-stream'))
+    context = None
+    if url.startswith('https') and not verify_ssl:
+        context = ssl._create_unverified_context()  # pylint: disable=protected-access
+    response = urlopen(request, timeout=timeout, context=context)
+    lines = (line.decode('utf-8') for line in response)
+    return iter_sse_events(lines)
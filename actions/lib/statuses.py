@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+""" Execution statuses shared by the actions and the sensors. Local copies of
+st2client.commands.action.LIVEACTION_STATUS_* so we don't import the st2client command
+modules just to read these constants.
+"""
+
+LIVEACTION_STATUS_REQUESTED = 'requested'
+LIVEACTION_STATUS_SCHEDULED = 'scheduled'
+LIVEACTION_STATUS_DELAYED = 'delayed'
+LIVEACTION_STATUS_RUNNING = 'running'
+LIVEACTION_STATUS_SUCCEEDED = 'succeeded'
+LIVEACTION_STATUS_FAILED = 'failed'
+LIVEACTION_STATUS_TIMED_OUT = 'timeout'
+LIVEACTION_STATUS_ABANDONED = 'abandoned'
+LIVEACTION_STATUS_CANCELED = 'canceled'
+LIVEACTION_STATUS_PAUSING = 'pausing'
+LIVEACTION_STATUS_PAUSED = 'paused'
+LIVEACTION_STATUS_RESUMING = 'resuming'
+
+QUEUED_STATUSES = [
+    LIVEACTION_STATUS_REQUESTED,
+    LIVEACTION_STATUS_SCHEDULED,
+    LIVEACTION_STATUS_DELAYED,
+]
+
+RUNNING_STATUSES = [
+    LIVEACTION_STATUS_PAUSING,
+    LIVEACTION_STATUS_PAUSED,
+    LIVEACTION_STATUS_RESUMING,
+    LIVEACTION_STATUS_RUNNING
+]
+
+# Statuses of executions that haven't finished yet
+UNFINISHED_STATUSES = QUEUED_STATUSES + RUNNING_STATUSES
+
+COMPLETED_STATUSES = [
+    LIVEACTION_STATUS_SUCCEEDED
+]
+
+ERRORED_STATUSES = [
+    LIVEACTION_STATUS_FAILED,
+    LIVEACTION_STATUS_TIMED_OUT,
+    LIVEACTION_STATUS_ABANDONED,
+    LIVEACTION_STATUS_CANCELED
+]
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+
+
+# Day number of 1970-01-01, subtracted from date ordinals to get days since the epoch
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+
+def parse_timestamp(timestamp, default=None):
+    """ Converts a StackStorm timestamp (2018-10-26T01:00:00.012345Z) to epoch seconds.
+    The fields are sliced at fixed positions instead of going through strptime or
+    dateutil, timestamps with a +HH:MM or -HH:MM offset are converted to UTC.
+    :param default: returned when the timestamp is missing or malformed
+    """
+    try:
+        if (timestamp[4] != '-' or timestamp[7] != '-' or timestamp[10] not in 'T ' or
+                timestamp[13] != ':' or timestamp[16] != ':'):
+            return default
+        date = datetime.date(int(timestamp[0:4]), int(timestamp[5:7]), int(timestamp[8:10]))
+        hour = int(timestamp[11:13])
+        minute = int(timestamp[14:16])
+        second = int(timestamp[17:19])
+    except (TypeError, ValueError, IndexError):
+        return default
+    if hour > 23 or minute > 59 or second > 61:
+        return default
+
+    epoch = float((date.toordinal() - EPOCH_ORDINAL) * 86400 +
+                  hour * 3600 + minute * 60 + second)
+
+    rest = timestamp[19:]
+    if rest.startswith('.'):
+        end = 1
+        while end < len(rest) and rest[end].isdigit():
+            end += 1
+        if end > 1:
+            epoch += float(rest[:end])
+        rest = rest[end:]
+
+    if (len(rest) == 6 and rest[0] in '+-' and rest[3] == ':' and
+            rest[1:3].isdigit() and rest[4:6].isdigit()):
+        offset = int(rest[1:3]) * 3600 + int(rest[4:6]) * 60
+        epoch += -offset if rest[0] == '+' else offset
+    return epoch
+
+
+def format_timestamp(epoch):
+    """ Converts epoch seconds to a UTC timestamp (2018-10-26T01:00:00Z) """
+    return datetime.datetime.utcfromtimestamp(epoch).strftime('%Y-%m-%dT%H:%M:%SZ')
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import socket
+import threading
+
+try:
+    import socketserver
+except ImportError:  # pragma: no cover (python 2)
+    import SocketServer as socketserver  # pylint: disable=import-error
+
+DEFAULT_SOCKET_PATH = "/var/run/st2/errors_worker.sock"
+DEFAULT_TIMEOUT = 300
+
+
+class WorkerUnavailable(Exception):
+    """Raised when the long-lived worker can not be connected to, callers should
+    fall back to running the action in-process
+    """
+    pass
+
+
+class WorkerError(RuntimeError):
+    """Raised when the request was sent to the worker and the action failed or the
+    worker didn't answer. The worker may have run the action, so it isn't run again.
+    """
+    pass
+
+
+def get_worker_config(config):
+    """ Returns the worker section of the pack config with defaults filled in
+    """
+    worker_config = (config or {}).get('worker') or {}
+    return {
+        'enabled': worker_config.get('enabled', False),
+        'socket_path': worker_config.get('socket_path', DEFAULT_SOCKET_PATH),
+        'timeout': worker_config.get('timeout', DEFAULT_TIMEOUT),
+    }
+
+
+def _read_line(sock_file):
+    line = sock_file.readline()
+    if not line:
+        return None
+    return json.loads(line.decode('utf-8'))
+
+
+def _write_line(sock_file, data):
+    sock_file.write((json.dumps(data) + "\n").encode('utf-8'))
+    sock_file.flush()
+
+
+def forward(socket_path, action_name, parameters, timeout=DEFAULT_TIMEOUT):
+    """ Sends an action request to the worker listening on socket_path and
+    returns the result of the action
+    :raises WorkerUnavailable: the worker could not be connected to
+    :raises WorkerError: the action raised an error, or the worker did not answer
+                         within timeout seconds after the request was sent
+    """
+    if not os.path.exists(socket_path):
+        raise WorkerUnavailable("No worker socket at {0}".format(socket_path))
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        try:
+            sock.connect(socket_path)
+        except (OSError, socket.error) as e:
+            raise WorkerUnavailable("Could not connect to worker: {0}".format(e))
+
+        sock_file = sock.makefile('rwb')
+        try:
+            _write_line(sock_file, {'action': action_name, 'parameters': parameters})
+            response = _read_line(sock_file)
+        except (OSError, socket.error, socket.timeout) as e:
+            # The worker may still be running the action, running it again here could
+            # run it twice
+            raise WorkerError("No response from worker: {0}".format(e))
+        finally:
+            sock_file.close()
+    finally:
+        sock.close()
+
+    if response is None:
+        raise WorkerError("Worker closed the connection without a response")
+
+    if response.get('status') != 'ok':
+        raise WorkerError(response.get('error', "Unknown worker error"))
+
+    return response.get('result')
+
+
+class ErrorWorkerHandler(socketserver.StreamRequestHandler):
+    """ Handles a single json line request: {"action": name, "parameters": {...}}
+    and replies with {"status": "ok", "result": ...} or {"status": "error", "error": ...}
+    """
+
+    def handle(self):
+        try:
+            request = _read_line(self.rfile)
+        except ValueError as e:
+            _write_line(self.wfile, {'status': 'error', 'error': "Invalid request: {0}".format(e)})
+            return
+
+        if request is None:
+            return
+
+        try:
+            result = self.server.run_action(request['action'], request.get('parameters') or {})
+            response = {'status': 'ok', 'result': result}
+        except Exception as e:  # pylint: disable=broad-except
+            response = {'status': 'error', 'error': "{0}: {1}".format(type(e).__name__, e)}
+
+        _write_line(self.wfile, response)
+
+
+class ErrorWorkerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """ Long-lived server that runs the pack's actions in-process so the
+    python imports and the st2 client stay warm between invocations
+    """
+    daemon_threads = True
+
+    def __init__(self, socket_path, action_classes, config, st2_client_factory=None):
+        """
+        :param socket_path: path of the unix socket to listen on
+        :param action_classes: dict of action name => BaseAction subclass
+        :param config: StackStorm configuration object for the pack
+        :param st2_client_factory: callable returning an st2 client that is
+                                   shared by all the actions run by the worker
+        """
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+        self.socket_path = socket_path
+        self.action_classes = action_classes
+        self.config = config
+        self.st2_client_factory = st2_client_factory
+        self._st2_client = None
+        self._client_lock = threading.Lock()
+        socketserver.UnixStreamServer.__init__(self, socket_path, ErrorWorkerHandler)
+
+    def get_st2_client(self):
+        if self._st2_client is None and self.st2_client_factory:
+            with self._client_lock:
+                if self._st2_client is None:
+                    self._st2_client = self.st2_client_factory()
+        return self._st2_client
+
+    def run_action(self, action_name, parameters):
+        if action_name not in self.action_classes:
+            raise ValueError("Unknown action: {0}".format(action_name))
+
+        action = self.action_classes[action_name](self.config)
+        action.st2_client = self.get_st2_client()
+        return action.run_local(**parameters)
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
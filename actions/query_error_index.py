@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+from lib.base_action import BaseAction
+from lib.error_index import ErrorIndex
+from lib.error_index import get_index_config
+
+
+class QueryErrorIndex(BaseAction):
+
+    def __init__(self, config):
+        """Creates a new BaseAction given a StackStorm config object (kwargs works too)
+        :param config: StackStorm configuration object for the pack
+        :returns: a new BaseAction
+        """
+        super(QueryErrorIndex, self).__init__(config)
+
+    def query(self, error_index, fingerprint=None, task_name=None, text=None,
+              st2_exe_id=None, category=None, since=None, limit=100):
+        if st2_exe_id:
+            # Find the other executions that failed with the same errors as this one
+            results = []
+            for record in error_index.find_by_execution(st2_exe_id):
+                for match in error_index.find_by_fingerprint(record['fingerprint'],
+                                                             since=since, limit=limit):
+                    if match['execution_id'] != st2_exe_id and match not in results:
+                        results.append(match)
+            return results[:limit]
+        if fingerprint:
+            return error_index.find_by_fingerprint(fingerprint, since=since, limit=limit)
+        if task_name:
+            return error_index.find_by_task(task_name, since=since, limit=limit)
+        if text:
+            return error_index.search(text, since=since, limit=limit)
+        if category:
+            return error_index.find_by_category(category, since=since, limit=limit)
+
+        raise ValueError("One of st2_exe_id, fingerprint, task_name, text or category "
+                         "is required")
+
+    def run(self, **kwargs):
+        # The worker indexes the errors of the actions it runs, so it answers the query
+        return self.run_with_worker('query_error_index', **kwargs)
+
+    def run_local(self, **kwargs):
+        index_config = get_index_config(self.config)
+        since_days = kwargs.pop('since_days', None)
+        if since_days:
+            kwargs['since'] = time.time() - since_days * 86400
+
+        error_index = ErrorIndex(index_config['path'], index_config['retention_days'])
+        try:
+            return self.query(error_index, **kwargs)
+        finally:
+            error_index.close()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+""" Compares the CPU time CronSensor spends on cron windows per poll when every
+rule's CronTab is parsed on each poll against the compiled ScheduleCache.
+
+    python benchmarks/cron_schedule.py --rules 10000 --polls 10
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'actions')))
+
+from crontab import CronTab  # noqa: E402
+from lib.cron_schedule import ScheduleCache  # noqa: E402
+from lib.cron_schedule import UTC  # noqa: E402
+from lib.cron_schedule import convert_to_crontab  # noqa: E402
+
+
+def build_rules(rng, rule_count):
+    rules = []
+    for i in range(rule_count):
+        choice = rng.randint(0, 2)
+        if choice == 0:
+            parameters = {'minute': rng.randint(0, 59), 'second': 0}
+        elif choice == 1:
+            parameters = {'hour': rng.randint(0, 23), 'minute': rng.randint(0, 59), 'second': 0}
+        else:
+            parameters = {'day_of_week': rng.randint(0, 6), 'hour': rng.randint(0, 23),
+                          'minute': 0, 'second': 0}
+        rules.append(('bench.rule_{0}'.format(i), parameters))
+    return rules
+
+
+def naive_poll(rules, now):
+    for _, parameters in rules:
+        crontab = CronTab(convert_to_crontab(parameters))
+        datetime.datetime.fromtimestamp(crontab.previous(now=now, delta=False), UTC)
+        datetime.datetime.fromtimestamp(crontab.next(now=now, delta=False), UTC)
+
+
+def cached_poll(cache, rules, now):
+    for rule_ref, parameters in rules:
+        cache.window(rule_ref, parameters, now)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rules', type=int, default=10000)
+    parser.add_argument('--polls', type=int, default=10)
+    parser.add_argument('--interval', type=int, default=60,
+                        help="Seconds between two polls")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rules = build_rules(random.Random(args.seed), args.rules)
+    start_time = datetime.datetime(2019, 1, 1, 0, 0, 30, tzinfo=UTC)
+    polls = [start_time + datetime.timedelta(seconds=args.interval * i)
+             for i in range(args.polls)]
+
+    start = time.process_time()
+    for now in polls:
+        naive_poll(rules, now)
+    naive_s = (time.process_time() - start) / args.polls
+
+    cache = ScheduleCache()
+    start = time.process_time()
+    cached_poll(cache, rules, polls[0])
+    first_s = time.process_time() - start
+
+    start = time.process_time()
+    for now in polls[1:]:
+        cached_poll(cache, rules, now)
+    cached_s = (time.process_time() - start) / max(args.polls - 1, 1)
+
+    print("rules: {0}  polls: {1}  interval: {2} s".format(
+        args.rules, args.polls, args.interval))
+    print("parse every poll:   {0:8.3f} s/poll".format(naive_s))
+    print("cache, first poll:  {0:8.3f} s".format(first_s))
+    print("cache, later polls: {0:8.3f} s/poll".format(cached_s))
+    print("speedup:            {0:8.1f} x".format(naive_s / cached_s if cached_s else 0))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+""" Measures the CPU time of the cron_sla_report counts for many rules over a long
+period, with numpy and with the pure python fallback, against iterating every run
+with CronTab.next() the way CronSensor walks its windows.
+
+    python benchmarks/cron_sla.py --rules 10000 --days 30
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'actions')))
+
+from crontab import CronTab  # noqa: E402
+from lib import cron_sla  # noqa: E402
+from lib.cron_schedule import UTC  # noqa: E402
+from lib.cron_schedule import convert_to_crontab  # noqa: E402
+from lib.cron_sla import CronSLA  # noqa: E402
+
+
+def build_rules(rng, rule_count):
+    rules = []
+    for _ in range(rule_count):
+        choice = rng.randint(0, 2)
+        if choice == 0:
+            rules.append({'minute': rng.randint(0, 59), 'second': 0})
+        elif choice == 1:
+            rules.append({'hour': rng.randint(0, 23), 'minute': rng.randint(0, 59),
+                          'second': 0})
+        else:
+            rules.append({'day_of_week': rng.randint(0, 6), 'hour': rng.randint(0, 23),
+                          'minute': 0, 'second': 0})
+    return rules
+
+
+def build_enforcements(rng, st2_cron, start, end, skip_rate):
+    """ One enforcement a few seconds after every run that wasn't skipped """
+    sla = CronSLA(st2_cron, start, end)
+    enforced_at = []
+    for day in sla.days:
+        for offset in sla.offsets:
+            run = day * 86400 + offset
+            if start <= run < end and rng.random() >= skip_rate:
+                enforced_at.append(run + rng.random() * 5)
+    outcomes = [cron_sla.OUTCOME_SUCCEEDED] * len(enforced_at)
+    return enforced_at, outcomes
+
+
+def iterate_runs(st2_cron, start, end):
+    crontab = CronTab(convert_to_crontab(st2_cron))
+    count = 0
+    now = datetime.datetime.fromtimestamp(start, UTC)
+    while True:
+        run = crontab.next(now=now, delta=False)
+        if run >= end:
+            return count
+        count += 1
+        now = datetime.datetime.fromtimestamp(run, UTC)
+
+
+def time_report(rules, enforcements, start, end):
+    started = time.process_time()
+    for st2_cron, (enforced_at, outcomes) in zip(rules, enforcements):
+        CronSLA(st2_cron, start, end).summarize(enforced_at, outcomes)
+    return time.process_time() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rules', type=int, default=10000)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--skip-rate', type=float, default=0.05,
+                        help="Share of runs without an enforcement")
+    parser.add_argument('--sample', type=int, default=50,
+                        help="Rules iterated with CronTab.next() to extrapolate from")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    end = datetime.datetime(2019, 2, 1, tzinfo=UTC).timestamp()
+    start = end - args.days * 86400
+    rules = build_rules(rng, args.rules)
+    enforcements = [build_enforcements(rng, r, start, end, args.skip_rate) for r in rules]
+    enforcement_count = sum(len(e[0]) for e in enforcements)
+
+    numpy_s = None
+    if cron_sla.numpy is not None:
+        numpy_s = time_report(rules, enforcements, start, end)
+    numpy_module, cron_sla.numpy = cron_sla.numpy, None
+    python_s = time_report(rules, enforcements, start, end)
+    cron_sla.numpy = numpy_module
+
+    started = time.process_time()
+    for st2_cron in rules[:args.sample]:
+        iterate_runs(st2_cron, start, end)
+    iterate_s = (time.process_time() - started) * args.rules / max(args.sample, 1)
+
+    print("rules: {0}  days: {1}  enforcements: {2}".format(
+        args.rules, args.days, enforcement_count))
+    print("CronTab.next() per run:  {0:8.2f} s (extrapolated, counts only)".format(iterate_s))
+    print("slots, pure python:      {0:8.2f} s".format(python_s))
+    if numpy_s is None:
+        print("slots, numpy:            not installed")
+    else:
+        print("slots, numpy:            {0:8.2f} s".format(numpy_s))
+
+
+if __name__ == '__main__':
+    main()
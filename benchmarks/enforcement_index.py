@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+""" Compares the CPU time CronSensor spends finding the in-window enforcement of a rule
+when every enforced_at is parsed with dateutil and scanned in list order against the
+sorted EnforcementIndex.
+
+    python benchmarks/enforcement_index.py --rules 1000 --history 200
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'actions')))
+
+from dateutil.parser import parse  # noqa: E402
+from lib.enforcement_index import EnforcementIndex  # noqa: E402
+from lib.timestamps import parse_timestamp  # noqa: E402
+
+UTC = datetime.timezone.utc
+
+
+class Enforcement(object):
+    def __init__(self, enforced_at):
+        self.enforced_at = enforced_at
+
+
+def build_history(rng, history, now):
+    """ Hourly enforcements in no particular order, as after merging bulk pages and
+    watermarks
+    """
+    enforcements = []
+    for hour in range(history):
+        enforced_at = now - datetime.timedelta(hours=hour, seconds=rng.random())
+        enforcements.append(Enforcement(enforced_at.strftime('%Y-%m-%dT%H:%M:%S.%fZ')))
+    rng.shuffle(enforcements)
+    return enforcements
+
+
+def linear_scan(enforcements, previous_cron, next_cron):
+    cron_low_buffer = previous_cron - (next_cron - previous_cron)
+    for enforcement in enforcements:
+        enforced_at = parse(enforcement.enforced_at).replace(microsecond=0)
+        if cron_low_buffer <= enforced_at <= next_cron:
+            return enforcement
+    return None
+
+
+def indexed(enforcements, previous_cron, next_cron):
+    cron_low_buffer = previous_cron - (next_cron - previous_cron)
+    return EnforcementIndex(enforcements).latest_between(cron_low_buffer.timestamp(),
+                                                         next_cron.timestamp())
+
+
+def time_lookups(func, rules, previous_cron, next_cron):
+    start = time.process_time()
+    for enforcements in rules:
+        func(enforcements, previous_cron, next_cron)
+    return time.process_time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rules', type=int, default=1000)
+    parser.add_argument('--history', type=int, default=200,
+                        help="Enforcements returned per rule")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    now = datetime.datetime(2019, 1, 1, 12, 0, 0, tzinfo=UTC)
+    previous_cron = now
+    next_cron = now + datetime.timedelta(minutes=30)
+    rules = [build_history(rng, args.history, now) for _ in range(args.rules)]
+
+    timestamps = [e.enforced_at for e in rules[0]]
+    start = time.process_time()
+    for timestamp in timestamps:
+        parse(timestamp)
+    dateutil_us = (time.process_time() - start) / len(timestamps) * 1e6
+    start = time.process_time()
+    for timestamp in timestamps:
+        parse_timestamp(timestamp)
+    fast_us = (time.process_time() - start) / len(timestamps) * 1e6
+
+    linear_s = time_lookups(linear_scan, rules, previous_cron, next_cron)
+    indexed_s = time_lookups(indexed, rules, previous_cron, next_cron)
+
+    print("rules: {0}  enforcements per rule: {1}".format(args.rules, args.history))
+    print("dateutil parse:      {0:8.2f} us/timestamp".format(dateutil_us))
+    print("fixed format parse:  {0:8.2f} us/timestamp".format(fast_us))
+    print("dateutil scan:       {0:8.3f} s/poll".format(linear_s))
+    print("enforcement index:   {0:8.3f} s/poll".format(indexed_s))
+    print("speedup:             {0:8.1f} x".format(linear_s / indexed_s if indexed_s else 0))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+""" Compares the compiled ErrorClassifier against searching every pattern one at a
+time over a synthetic corpus of error messages.
+
+    python benchmarks/error_classifier.py --patterns 500 --messages 10000
+"""
+import argparse
+import os
+import random
+import re
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'actions')))
+
+from lib.error_classifier import DEFAULT_CATEGORIES  # noqa: E402
+from lib.error_classifier import ErrorClassifier  # noqa: E402
+from lib.error_classifier import UNKNOWN_CATEGORY  # noqa: E402
+
+
+def random_word(rng, length=8):
+    return ''.join(rng.choice(string.ascii_lowercase) for _ in range(length))
+
+
+def build_categories(rng, pattern_count):
+    """ Pads the default categories with random literal patterns up to pattern_count """
+    categories = [(name, list(patterns)) for name, patterns in DEFAULT_CATEGORIES]
+    total = sum(len(patterns) for _, patterns in categories)
+    index = 0
+    while total < pattern_count:
+        categories[index % len(categories)][1].append(
+            '{0} {1}'.format(random_word(rng), random_word(rng)))
+        index += 1
+        total += 1
+    return categories
+
+
+def build_messages(rng, categories, message_count):
+    literals = [p for _, patterns in categories for p in patterns if re.escape(p) == p]
+    messages = []
+    for i in range(message_count):
+        words = [random_word(rng, rng.randint(3, 10)) for _ in range(rng.randint(10, 40))]
+        # Roughly half the messages contain a known error
+        if i % 2 == 0 and literals:
+            words.insert(rng.randint(0, len(words)), rng.choice(literals))
+        messages.append(' '.join(words))
+    return messages
+
+
+def naive_classify(compiled, message):
+    for name, patterns in compiled:
+        for pattern in patterns:
+            if pattern.search(message):
+                return name
+    return UNKNOWN_CATEGORY
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--patterns', type=int, default=500)
+    parser.add_argument('--messages', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    categories = build_categories(rng, args.patterns)
+    messages = build_messages(rng, categories, args.messages)
+
+    start = time.time()
+    classifier = ErrorClassifier(categories)
+    compile_s = time.time() - start
+
+    start = time.time()
+    combined = classifier.classify_all(messages)
+    combined_s = time.time() - start
+
+    compiled = [(name, [re.compile(p, re.IGNORECASE) for p in patterns])
+                for name, patterns in categories]
+    start = time.time()
+    naive = [naive_classify(compiled, message) for message in messages]
+    naive_s = time.time() - start
+
+    matched = sum(1 for category in combined if category != UNKNOWN_CATEGORY)
+    print("patterns: {0}  messages: {1}  classified: {2}".format(
+        sum(len(p) for _, p in categories), len(messages), matched))
+    print("compile:           {0:8.3f} s".format(compile_s))
+    print("combined matcher:  {0:8.3f} s".format(combined_s))
+    print("per-pattern loop:  {0:8.3f} s".format(naive_s))
+    print("speedup:           {0:8.1f} x".format(naive_s / combined_s if combined_s else 0))
+    # Both approaches only differ when several categories match one message
+    print("disagreements:     {0:8d}".format(sum(1 for a, b in zip(combined, naive) if a != b)))
+
+
+if __name__ == '__main__':
+    main()
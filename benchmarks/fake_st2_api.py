@@ -0,0 +1,414 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+""" Fake st2 API on localhost serving a synthetic orquesta execution tree, cron rules
+and rule enforcements, so the pack can be run through st2client against realistic data
+sizes without a StackStorm deployment. Only the GET requests made by the actions and
+CronSensor are answered. Every request can be delayed by an injected latency and is
+counted by endpoint.
+
+    python benchmarks/fake_st2_api.py --depth 4 --fan-out 5 --rules 1000 --latency 0.01
+
+prints {"url": ..., "root_execution_id": ...} on the first line of stdout and serves
+until killed. The request counts are read from /_fake/stats and reset by /_fake/reset.
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import parse_qsl, urlparse
+except ImportError:  # pragma: no cover (python 2)
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer  # pylint: disable=import-error
+    from SocketServer import ThreadingMixIn  # pylint: disable=import-error
+    from urlparse import parse_qsl, urlparse  # pylint: disable=import-error
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'actions')))
+
+from lib.timestamps import parse_timestamp  # noqa: E402
+
+__all__ = [
+    'FakeSt2Api',
+    'FakeSt2Data'
+]
+
+API_PREFIX = '/api/v1'
+
+# All the timestamps served have this format so they can be compared as strings
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
+
+UTC = datetime.timezone.utc
+
+# Errors of the failed leaf tasks, picked at random
+TASK_ERRORS = [
+    "Connection refused while connecting to host-{0}.example.com:443",
+    "Timed out after 600 seconds waiting for job {0}",
+    "Permission denied (publickey) for user svc_{0}",
+    "No space left on device while writing /var/tmp/job_{0}.log",
+]
+
+
+def format_api_timestamp(epoch):
+    return datetime.datetime.fromtimestamp(epoch, UTC).strftime(TIMESTAMP_FORMAT)
+
+
+class FakeSt2Data(object):
+    """ Synthetic executions, rules and enforcements served by FakeSt2Api. Generation
+    is seeded so runs with the same options serve the same data.
+    """
+
+    def __init__(self, seed=0, now=None):
+        self.rng = random.Random(seed)
+        self.now = now or time.time()
+        self.executions = {}
+        self.rules = []
+        self.enforcements = []
+        self._ids = 0
+        self._sorted = False
+
+    def new_id(self):
+        self._ids += 1
+        return '{0:024x}'.format(self._ids)
+
+    def add_execution(self, action_ref, status, started, context=None, result=None,
+                      children=None, trigger_type=None):
+        execution = {
+            'id': self.new_id(),
+            'action': {'ref': action_ref},
+            'status': status,
+            'start_timestamp': format_api_timestamp(started),
+            'end_timestamp': format_api_timestamp(started + 1),
+            'context': context or {'user': 'stanley'},
+            'result': result or {},
+        }
+        # st2 leaves children out of the executions without any
+        if children:
+            execution['children'] = children
+        if trigger_type:
+            execution['trigger_type'] = {'ref': trigger_type}
+        self.executions[execution['id']] = execution
+        self._sorted = False
+        return execution
+
+    def add_execution_tree(self, depth, fan_out, failed=True):
+        """ Adds an orquesta workflow with depth levels of subworkflows, each running
+        fan_out tasks. When failed, the last task of every level fails so the error is
+        found at the bottom of the tree.
+        :returns: the id of the root execution
+        """
+        started = self.now - 3600
+
+        def add_level(level, task_name, failing):
+            if level == depth:
+                if failing:
+                    error = self.rng.choice(TASK_ERRORS).format(self.rng.randint(1, 999))
+                    result = {'failed': True, 'return_code': 1, 'stdout': '',
+                              'stderr': "Traceback (most recent call last):\n{0}".format(error)}
+                else:
+                    result = {'failed': False, 'return_code': 0, 'stdout': 'ok', 'stderr': ''}
+                return self.add_execution(
+                    'core.local', 'failed' if failing else 'succeeded', started,
+                    context={'orquesta': {'task_name': task_name}}, result=result)['id']
+
+            children = [add_level(level + 1, 'task_{0}_{1}'.format(level, index),
+                                  failing and index == fan_out - 1)
+                        for index in range(fan_out)]
+            if failing:
+                result = {'errors': [{'message': "Execution failed. See result for details.",
+                                      'task_id': 'task_{0}_{1}'.format(level, fan_out - 1)}],
+                          'output': None}
+            else:
+                result = {'output': {}}
+            context = {'orquesta': {'task_name': task_name}} if level else None
+            return self.add_execution(
+                'bench.workflow_{0}'.format(level), 'failed' if failing else 'succeeded',
+                started, context=context, result=result, children=children)['id']
+
+        return add_level(0, None, failed)
+
+    def add_cron_rules(self, count, runs=24, failure_rate=0.1, missing_rate=0.05):
+        """ Adds count hourly cron rules, each enforced at its last runs cron runs apart
+        from the missing_rate share of runs. The executions of failure_rate of the
+        enforcements failed.
+        """
+        last_hour = int(self.now // 3600) * 3600
+        for index in range(count):
+            minute = index % 60
+            rule = {
+                'id': self.new_id(),
+                'ref': 'bench.cron_{0}'.format(index),
+                'name': 'cron_{0}'.format(index),
+                'pack': 'bench',
+                'enabled': True,
+                'trigger': {'type': 'core.st2.CronTimer',
+                            'ref': 'core.{0}'.format(self.new_id()),
+                            'parameters': {'minute': minute, 'second': 0}},
+                'action': {'ref': 'core.local'},
+            }
+            self.rules.append(rule)
+
+            for run in range(runs):
+                run_at = last_hour + minute * 60 - run * 3600
+                if run_at > self.now or self.rng.random() < missing_rate:
+                    continue
+                enforced_at = run_at + self.rng.random()
+                failed = self.rng.random() < failure_rate
+                execution = self.add_execution(
+                    'core.local', 'failed' if failed else 'succeeded', enforced_at + 0.1,
+                    result={'failed': failed, 'return_code': int(failed)},
+                    trigger_type='core.st2.CronTimer')
+                self.enforcements.append({
+                    'id': self.new_id(),
+                    'rule': {'ref': rule['ref'], 'id': rule['id']},
+                    'enforced_at': format_api_timestamp(enforced_at),
+                    'execution_id': execution['id'],
+                    'trigger_instance_id': self.new_id(),
+                    'status': 'succeeded',
+                })
+        self._sorted = False
+
+    def sort(self):
+        """ Orders the executions and enforcements newest first like the st2 API and
+        indexes the enforcements by id, rule and execution
+        """
+        if self._sorted:
+            return
+        self.sorted_executions = sorted(self.executions.values(),
+                                        key=lambda e: e['start_timestamp'], reverse=True)
+        self.enforcements.sort(key=lambda e: e['enforced_at'], reverse=True)
+        self.enforcements_by_id = {}
+        self.enforcements_by_rule = {}
+        self.enforcements_by_execution = {}
+        for enforcement in self.enforcements:
+            self.enforcements_by_id[enforcement['id']] = enforcement
+            self.enforcements_by_rule.setdefault(enforcement['rule']['ref'],
+                                                 []).append(enforcement)
+            self.enforcements_by_execution.setdefault(enforcement['execution_id'],
+                                                      []).append(enforcement)
+        self._sorted = True
+
+
+def _bound(params, name):
+    """ Returns a timestamp filter in the format of the served timestamps """
+    if params.get(name) is None:
+        return None
+    return format_api_timestamp(parse_timestamp(params[name]))
+
+
+def _page(items, params):
+    offset = int(params.get('offset', 0))
+    limit = params.get('limit')
+    if limit is None:
+        return items[offset:]
+    return items[offset:offset + int(limit)]
+
+
+class _ApiHandler(BaseHTTPRequestHandler):
+    # Keep alive so the requests session of st2client reuses its connections
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = dict(parse_qsl(url.query))
+        path = url.path.rstrip('/')
+        api = self.server.api
+
+        if path == '/_fake/stats':
+            return self.reply(200, api.stats())
+        if path == '/_fake/reset':
+            api.reset()
+            return self.reply(200, api.stats())
+        if not path.startswith(API_PREFIX + '/'):
+            return self.reply(404, {'faultstring': "Unknown path {0}".format(path)})
+
+        parts = path[len(API_PREFIX) + 1:].split('/')
+        resource = parts[0]
+        endpoint = "{0}.{1}".format(resource, 'get_by_id' if len(parts) > 1 else 'query')
+        api.count(endpoint)
+        if api.latency:
+            time.sleep(api.latency)
+
+        handler = getattr(self, 'get_' + endpoint.replace('.', '_'), None)
+        if handler is None:
+            return self.reply(404, {'faultstring': "Unknown endpoint {0}".format(endpoint)})
+        with api.lock:
+            api.data.sort()
+            status, body, total = handler(parts[1:], params)
+        headers = {'X-Total-Count': str(total)} if total is not None else {}
+        self.reply(status, body, headers)
+
+    def get_executions_get_by_id(self, parts, params):
+        execution = self.server.api.data.executions.get(parts[0])
+        if execution is None:
+            return 404, {'faultstring': "Execution {0} not found".format(parts[0])}, None
+        return 200, execution, None
+
+    def get_executions_query(self, parts, params):
+        executions = self.server.api.data.sorted_executions
+        since = _bound(params, 'timestamp_gt')
+        if since is not None:
+            executions = [e for e in executions if e['start_timestamp'] > since]
+        if 'trigger_type' in params:
+            executions = [e for e in executions
+                          if e.get('trigger_type', {}).get('ref') == params['trigger_type']]
+        attributes = params.get('include_attributes')
+        if attributes:
+            attributes = attributes.split(',')
+            executions = [dict((a, e[a]) for a in attributes if a in e) for e in executions]
+        return 200, _page(executions, params), len(executions)
+
+    def get_rules_query(self, parts, params):
+        rules = self.server.api.data.rules
+        if 'enabled' in params:
+            enabled = params['enabled'].lower() == 'true'
+            rules = [rule for rule in rules if rule['enabled'] == enabled]
+        return 200, _page(rules, params), len(rules)
+
+    def get_ruleenforcements_get_by_id(self, parts, params):
+        enforcement = self.server.api.data.enforcements_by_id.get(parts[0])
+        if enforcement is not None:
+            return 200, enforcement, None
+        return 404, {'faultstring': "Enforcement {0} not found".format(parts[0])}, None
+
+    def get_ruleenforcements_query(self, parts, params):
+        data = self.server.api.data
+        if 'rule_ref' in params:
+            enforcements = data.enforcements_by_rule.get(params['rule_ref'], [])
+        elif 'execution' in params:
+            enforcements = data.enforcements_by_execution.get(params['execution'], [])
+        else:
+            enforcements = data.enforcements
+
+        since = _bound(params, 'enforced_at_gt')
+        until = _bound(params, 'enforced_at_lt')
+        enforcements = [e for e in enforcements
+                        if (since is None or e['enforced_at'] > since) and
+                        (until is None or e['enforced_at'] < until)]
+        return 200, _page(enforcements, params), len(enforcements)
+
+    def reply(self, status, body, headers=None):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class FakeSt2Api(object):
+    """ Serves FakeSt2Data on localhost from a background thread
+
+        with FakeSt2Api(data, latency=0.01) as api:
+            client = Client(base_url=api.url, api_url=api.api_url)
+    """
+
+    def __init__(self, data, latency=0.0, port=0):
+        self.data = data
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.requests = {}
+        self.server = _ThreadingHTTPServer(('127.0.0.1', port), _ApiHandler)
+        self.server.api = self
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:{0}".format(self.server.server_address[1])
+
+    @property
+    def api_url(self):
+        return self.url + API_PREFIX
+
+    def count(self, endpoint):
+        with self.lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+
+    def stats(self):
+        with self.lock:
+            return {'requests': dict(self.requests), 'total': sum(self.requests.values())}
+
+    def reset(self):
+        with self.lock:
+            self.requests = {}
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def build_data(args):
+    data = FakeSt2Data(seed=args.seed)
+    root_execution_id = data.add_execution_tree(args.depth, args.fan_out)
+    data.add_cron_rules(args.rules, runs=args.runs, failure_rate=args.failure_rate,
+                        missing_rate=args.missing_rate)
+    return data, root_execution_id
+
+
+def add_arguments(parser):
+    parser.add_argument('--depth', type=int, default=3,
+                        help="levels of subworkflows in the execution tree")
+    parser.add_argument('--fan-out', type=int, default=5,
+                        help="tasks run by every workflow of the execution tree")
+    parser.add_argument('--rules', type=int, default=500, help="hourly cron rules")
+    parser.add_argument('--runs', type=int, default=24,
+                        help="past cron runs with an enforcement per rule")
+    parser.add_argument('--failure-rate', type=float, default=0.1,
+                        help="share of the cron executions that failed")
+    parser.add_argument('--missing-rate', type=float, default=0.05,
+                        help="share of the cron runs without an enforcement")
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help="seconds added to every API request")
+    parser.add_argument('--seed', type=int, default=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    add_arguments(parser)
+    parser.add_argument('--port', type=int, default=0)
+    args = parser.parse_args()
+
+    data, root_execution_id = build_data(args)
+    with FakeSt2Api(data, latency=args.latency, port=args.port) as api:
+        print(json.dumps({'url': api.url, 'api_url': api.api_url,
+                          'root_execution_id': root_execution_id}))
+        sys.stdout.flush()
+        try:
+            api.thread.join()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+""" Measures the import (startup) time of every action and sensor entry point
+using `python -X importtime`.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --check --max-ms 500
+
+With --check the script exits non-zero when an entry point imports one of the
+modules that should only be loaded lazily or when it takes longer than --max-ms.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+ENTRY_POINTS = [
+    ('actions', 'analyze_execution_timing'),
+    ('actions', 'build_execution_tree'),
+    ('actions', 'cron_sla_report'),
+    ('actions', 'execution_find_error_results'),
+    ('actions', 'get_formatted_error'),
+    ('actions', 'query_error_index'),
+    ('sensors', 'cron_sensor'),
+    ('sensors', 'cron_stream_sensor'),
+    ('sensors', 'error_worker_sensor'),
+]
+
+# Modules that must not be imported while loading an entry point
+LAZY_MODULES = [
+    'st2client',
+]
+
+
+def measure(directory, module, repeat=3):
+    """ Imports module in a fresh interpreter with -X importtime
+    :returns: (cumulative import time in ms, list of imported module names)
+    """
+    env = os.environ.copy()
+    paths = [os.path.join(ROOT_DIR, directory)] + sys.path
+    env['PYTHONPATH'] = os.pathsep.join(p for p in paths if p)
+
+    best_us = None
+    modules = []
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, '-X', 'importtime', '-c',
+                               'import {0}'.format(module)],
+                              env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                              universal_newlines=True)
+        if proc.returncode != 0:
+            raise RuntimeError("Failed to import {0}:\n{1}".format(module, proc.stderr))
+
+        modules = []
+        cumulative_us = None
+        for line in proc.stderr.splitlines():
+            if not line.startswith('import time:') or '|' not in line:
+                continue
+            parts = line[len('import time:'):].split('|')
+            try:
+                cumulative = int(parts[1].strip())
+            except ValueError:
+                # header line
+                continue
+            name = parts[2].strip()
+            modules.append(name)
+            if name == module:
+                cumulative_us = cumulative
+
+        if cumulative_us is not None and (best_us is None or cumulative_us < best_us):
+            best_us = cumulative_us
+
+    return (best_us or 0) / 1000.0, modules
+
+
+def lazy_violations(modules):
+    return sorted(m for m in modules
+                  if any(m == lazy or m.startswith(lazy + '.') for lazy in LAZY_MODULES))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--check', action='store_true',
+                        help="Exit non-zero on lazy import violations or slow imports")
+    parser.add_argument('--max-ms', type=float, default=None,
+                        help="Maximum cumulative import time per entry point")
+    args = parser.parse_args()
+
+    failed = False
+    print("{0:<45} {1:>12} {2:>8}".format("entry point", "import (ms)", "modules"))
+    for directory, module in ENTRY_POINTS:
+        import_ms, modules = measure(directory, module, repeat=args.repeat)
+        print("{0:<45} {1:>12.1f} {2:>8}".format(directory + '/' + module, import_ms,
+                                                 len(modules)))
+
+        violations = lazy_violations(modules)
+        if violations:
+            print("    eagerly imports: {0}".format(", ".join(violations)))
+            failed = True
+        if args.max_ms is not None and import_ms > args.max_ms:
+            print("    exceeds {0} ms".format(args.max_ms))
+            failed = True
+
+    if args.check and failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
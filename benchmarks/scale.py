@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+""" Runs get_formatted_error, build_execution_tree, execution_find_error_results and
+CronSensor.poll through st2client against the fake st2 API of fake_st2_api.py and
+reports the wall time, the API requests and the peak python memory of each.
+
+    python benchmarks/scale.py --depth 4 --fan-out 5 --rules 2000 --latency 0.005
+    python benchmarks/scale.py --rules 2000 --sensor-option bulk_enforcements=true \\
+        --sensor-option check_concurrency=8
+
+The fake API runs in a child process so serving the requests doesn't count towards the
+measured time and memory. Memory is measured with tracemalloc on a second run so its
+overhead doesn't skew the wall time. Run it with the python of the st2 virtualenv, the
+actions and the sensor import st2common and st2reactor.
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+try:
+    from urllib.request import urlopen
+except ImportError:  # pragma: no cover (python 2)
+    from urllib2 import urlopen  # pylint: disable=import-error
+
+BENCHMARKS_DIR = os.path.abspath(os.path.dirname(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARKS_DIR)
+for path in [os.path.join(ROOT_DIR, 'actions'), os.path.join(ROOT_DIR, 'sensors'),
+             BENCHMARKS_DIR]:
+    sys.path.insert(0, path)
+
+from fake_st2_api import add_arguments  # noqa: E402
+
+
+class KeyValuePair(object):
+    def __init__(self, name, value):
+        self.name = name
+        self.value = value
+
+
+class BenchmarkSensorService(object):
+    """ In-memory stand in for the st2 sensor service with a datastore and a count of
+    the dispatched triggers
+    """
+
+    def __init__(self):
+        self.kv = {}
+        self.dispatched = 0
+
+    def get_logger(self, name):
+        return logging.getLogger(name)
+
+    def get_value(self, name, **kwargs):
+        return self.kv.get(name)
+
+    def set_value(self, name, value, **kwargs):
+        self.kv[name] = value
+
+    def delete_value(self, name, **kwargs):
+        self.kv.pop(name, None)
+
+    def list_values(self, prefix=None, **kwargs):
+        return [KeyValuePair(name, value) for name, value in sorted(self.kv.items())
+                if prefix is None or name.startswith(prefix)]
+
+    def dispatch(self, trigger, payload=None, trace_tag=None):
+        self.dispatched += 1
+
+
+def start_fake_api(args):
+    """ Starts fake_st2_api.py with the data options of the benchmark
+    :returns: (process, the JSON line it printed with its urls)
+    """
+    command = [sys.executable, os.path.join(BENCHMARKS_DIR, 'fake_st2_api.py'),
+               '--depth', str(args.depth), '--fan-out', str(args.fan_out),
+               '--rules', str(args.rules), '--runs', str(args.runs),
+               '--failure-rate', str(args.failure_rate),
+               '--missing-rate', str(args.missing_rate),
+               '--latency', str(args.latency), '--seed', str(args.seed)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE)
+    line = process.stdout.readline()
+    if not line:
+        process.wait()
+        raise RuntimeError("The fake st2 API exited with {0}".format(process.returncode))
+    return process, json.loads(line.decode('utf-8'))
+
+
+def get_stats(url, reset=False):
+    response = urlopen("{0}/_fake/{1}".format(url, 'reset' if reset else 'stats'))
+    try:
+        return json.loads(response.read().decode('utf-8'))
+    finally:
+        response.close()
+
+
+def parse_options(options):
+    """ Parses key=value sensor options, values are read as JSON when they can be """
+    parsed = {}
+    for option in options:
+        name, _, value = option.partition('=')
+        try:
+            parsed[name] = json.loads(value)
+        except ValueError:
+            parsed[name] = value
+    return parsed
+
+
+def action_scenario(action_cls, client, **parameters):
+    """ Runs an action with the shared client, the way the error worker does """
+    def prepare():
+        action = action_cls({})
+        action.st2_client = client
+        return lambda: action.run_local(**parameters)
+    return prepare
+
+
+def sensor_scenario(client, options, warm):
+    """ Polls a new CronSensor, after a first untimed poll when warm """
+    from cron_sensor import CronSensor
+
+    def prepare():
+        sensor = CronSensor(BenchmarkSensorService(), config={'error_cron_event': options},
+                            poll_interval=60)
+        sensor.st2_fqdn = 'st2-bench'
+        sensor.st2_client = client
+        sensor.kv_sensor_name = options['datastore_key']
+        if warm:
+            sensor.poll()
+        return sensor.poll
+    return prepare
+
+
+def measure(url, prepare, repeat):
+    """ Returns the best wall time of repeat runs, the API requests of the last timed
+    run and the peak traced memory of one more run
+    """
+    wall = None
+    for _ in range(repeat):
+        run = prepare()
+        get_stats(url, reset=True)
+        started = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - started
+        wall = elapsed if wall is None else min(wall, elapsed)
+    requests = get_stats(url)
+
+    run = prepare()
+    tracemalloc.start()
+    try:
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {'wall_s': wall, 'api_calls': requests['total'],
+            'requests': requests['requests'], 'peak_mib': peak / 1024.0 / 1024.0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    parser.add_argument('--sensor-option', action='append', default=[],
+                        help="error_cron_event option of the sensor as key=value")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="timed runs of every scenario, the best is reported")
+    parser.add_argument('--json', action='store_true', help="print the results as JSON")
+    args = parser.parse_args()
+
+    from build_execution_tree import BuildExecutionTree
+    from execution_find_error_results import ExecutionFindErrorResults
+    from get_formatted_error import GetFormattedError
+    from st2client.client import Client
+
+    sensor_options = dict({'datastore_key': 'cron_errors'},
+                          **parse_options(args.sensor_option))
+
+    process, fake_api = start_fake_api(args)
+    try:
+        client = Client(base_url=fake_api['url'], api_url=fake_api['api_url'])
+        root = fake_api['root_execution_id']
+        scenarios = [
+            ('get_formatted_error', action_scenario(
+                GetFormattedError, client, st2_exe_id=root, html_tags=False,
+                ignored_error_tasks=[])),
+            ('build_execution_tree', action_scenario(
+                BuildExecutionTree, client, st2_exe_id=root)),
+            ('execution_find_error_results', action_scenario(
+                ExecutionFindErrorResults, client, st2_exe_id=root,
+                provision_skip_list=[])),
+            ('CronSensor.poll (first)', sensor_scenario(client, sensor_options, False)),
+            ('CronSensor.poll (next)', sensor_scenario(client, sensor_options, True)),
+        ]
+        results = [(name, measure(fake_api['url'], prepare, args.repeat))
+                   for name, prepare in scenarios]
+    finally:
+        process.terminate()
+        process.wait()
+
+    if args.json:
+        print(json.dumps(dict(results), indent=2, sort_keys=True))
+        return
+
+    print("executions: {0}  rules: {1}  runs per rule: {2}  latency: {3}s".format(
+        sum(args.fan_out ** level for level in range(args.depth + 1)), args.rules,
+        args.runs, args.latency))
+    print("{0:<30} {1:>9} {2:>10} {3:>9}  {4}".format(
+        'scenario', 'wall s', 'api calls', 'peak MiB', 'requests'))
+    for name, result in results:
+        print("{0:<30} {1:>9.3f} {2:>10} {3:>9.2f}  {4}".format(
+            name, result['wall_s'], result['api_calls'], result['peak_mib'],
+            ' '.join('{0}={1}'.format(endpoint, count)
+                     for endpoint, count in sorted(result['requests'].items()))))
+
+
+if __name__ == '__main__':
+    main()
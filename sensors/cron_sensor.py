@@ -13,55 +13,173 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 from st2reactor.sensor.base import PollingSensor
-import st2client
-import st2client.commands.action
-import st2client.models
-from st2client.client import Client
-import socket
+import bisect
 import datetime
-from crontab import CronTab
-import ast
+import json
+import os
+import re
+import sys
+import time
+import zlib
 
-# Note: These modules are manipulated during the runtime so we can't detect all the
-# properties during static analysis
-from dateutil.parser import parse  # pylint: disable=import-error
-import pytz  # pylint: disable=import-error
+# The cron schedule and error classifier helpers are shared with the actions
+ACTIONS_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'actions'))
+if ACTIONS_PATH not in sys.path:
+    sys.path.append(ACTIONS_PATH)
+
+from lib.cron_schedule import convert_to_crontab  # noqa: E402
+from lib.cron_schedule import ScheduleCache  # noqa: E402
+from lib.cron_schedule import STACKSTORM_TO_CRONTAB_DAYS  # noqa: E402,F401
+from lib.enforcement_index import EnforcementIndex  # noqa: E402
+from lib.error_classifier import get_classifier  # noqa: E402
+from lib.error_message import get_error_message  # noqa: E402
+from lib.hash_ring import HashRing  # noqa: E402
+from lib.lru_cache import LRUCache  # noqa: E402
+from lib.metrics import Metrics  # noqa: E402
+from lib.rule_scheduler import RuleScheduler  # noqa: E402
+from lib.statuses import ERRORED_STATUSES  # noqa: E402
+from lib.statuses import LIVEACTION_STATUS_TIMED_OUT  # noqa: E402
+from lib.statuses import UNFINISHED_STATUSES  # noqa: E402
+from lib.timestamps import parse_timestamp  # noqa: E402
 
 __all__ = [
     'CronSensor'
 ]
 
-ERRORED_STATUSES = [
-    st2client.commands.action.LIVEACTION_STATUS_FAILED,
-    st2client.commands.action.LIVEACTION_STATUS_TIMED_OUT,
-    st2client.commands.action.LIVEACTION_STATUS_ABANDONED,
-    st2client.commands.action.LIVEACTION_STATUS_CANCELED
-]
+UTC = datetime.timezone.utc
 
-PROGRESS_STATUSES = [
-    st2client.commands.action.LIVEACTION_STATUS_REQUESTED,
-    st2client.commands.action.LIVEACTION_STATUS_SCHEDULED,
-    st2client.commands.action.LIVEACTION_STATUS_DELAYED,
-    st2client.commands.action.LIVEACTION_STATUS_PAUSING,
-    st2client.commands.action.LIVEACTION_STATUS_PAUSED,
-    st2client.commands.action.LIVEACTION_STATUS_RESUMING,
-    st2client.commands.action.LIVEACTION_STATUS_RUNNING
-]
+CRON_TIMER_TRIGGER_TYPE = "core.st2.CronTimer"
 
-COMPLETED_STATUSES = [
-    st2client.commands.action.LIVEACTION_STATUS_SUCCEEDED
-]
+# Version of the JSON state stored under the datastore_key
+STATE_VERSION = 2
+
+# Separates the datastore_key from the shard number in the names of the state shards
+SHARD_SEPARATOR = "_shard_"
+
+# trigger_mode values: one error_cron_event and error_cron_event_enhanced trigger per
+# rule event, or one error_cron_event_digest trigger per poll listing all the events
+TRIGGER_MODE_PER_RULE = "per_rule"
+TRIGGER_MODE_DIGEST = "digest"
+
+# Most events sent in one digest trigger, larger digests are split
+DEFAULT_DIGEST_MAX_EVENTS = 500
+
+# state_shards value storing the state of every rule under its own key
+PER_RULE_SHARDS = "per_rule"
+
+# Separates the datastore_key from the node name in the partition membership keys
+MEMBER_SEPARATOR = "_member_"
+
+# Seconds a node stays in the partition membership after its last heartbeat
+DEFAULT_PARTITION_MEMBER_TTL = 900
+
+# Most rules kept in the state, the rules updated least recently are dropped above it
+DEFAULT_STATE_MAX_RULES = 10000
+
+# Prefix of the metrics sent to the st2 metrics driver or the statsd server
+METRICS_PREFIX = "errors.cron_sensor"
+
+# Number of the slowest rule checks listed in the poll summary debug log
+SLOWEST_RULES_LOGGED = 5
+
+# Characters of a cluster name replaced by an underscore in its datastore keys, logger
+# and metric names
+CLUSTER_KEY_INVALID = re.compile(r'[^A-Za-z0-9_-]')
+
+# Options of a clusters entry passed to the st2 client of the cluster
+CLUSTER_CLIENT_OPTIONS = ['api_url', 'auth_url', 'cacert']
+
+# Options of a clusters entry sent with every request to the cluster
+CLUSTER_CREDENTIALS = ['api_key', 'token']
+
+# Methods of the st2client HTTP client that send a request
+HTTP_METHODS = ['get', 'post', 'post_raw', 'put', 'patch', 'delete']
+
+# Error category of the events of timed out executions
+TIMEOUT_CATEGORY = 'timeout'
+
+# Enforcement id stored for rules in error without an enforcement
+ERROR_WITHOUT_ENFORCEMENT_ID = "error without enforcement id"
+
+# Page size used when fetching rule enforcements in bulk
+DEFAULT_ENFORCEMENT_PAGE_SIZE = 100
+
+# Seconds after a cron run before the rule is checked when schedule_checks is enabled
+DEFAULT_CHECK_GRACE_PERIOD = 60
+
+# Seconds between downloads of the cron rules, rule changes take up to this long to be
+# picked up. Well above the default poll_interval so most polls use the cached rules.
+DEFAULT_RULE_REFRESH_INTERVAL = 3600
+
+# Lower bound of the adaptive poll interval when schedule_checks is enabled
+DEFAULT_MIN_POLL_INTERVAL = 30
+
+# Number of finished execution statuses remembered between polls
+DEFAULT_EXECUTION_STATUS_CACHE_SIZE = 10000
+
+# Most pages of cron executions read per page worth of executions being looked up when
+# bulk_execution_statuses is enabled, the statuses of executions not found in them are
+# fetched one by one
+DEFAULT_EXECUTION_STATUS_MAX_PAGES = 10
+
+# Executions start shortly after their rule enforcement, the bulk status query starts
+# this many seconds before the oldest enforcement to allow for clock differences
+EXECUTION_START_SLACK = 60
 
-STACKSTORM_TO_CRONTAB_DAYS = {
-    # Stackstorm Cron days => Crontab days
-    0: 1,
-    1: 2,
-    2: 3,
-    3: 4,
-    4: 5,
-    5: 6,
-    6: 0,
-}
+# The bulk enforcements query starts this many seconds before the last poll so
+# enforcements stored late or under a skewed clock aren't missed
+BULK_ENFORCEMENT_OVERLAP = 60
+
+# Format of the enforced_at filters sent to the rule enforcements API
+ENFORCED_AT_FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
+
+
+class CachedEnforcement(object):
+    """ Minimal stand in for an st2client RuleEnforcement restored from a rule's
+    watermark. Only has an execution_id attribute if the enforcement had one so
+    check_enforcements treats it like the original.
+    """
+
+    def __init__(self, data):
+        self.id = data['id']
+        self.enforced_at = data['enforced_at']
+        self.rule = {'ref': data['rule_ref']}
+        if data.get('execution_id'):
+            self.execution_id = data['execution_id']
+
+    @staticmethod
+    def serialize(enforcement):
+        data = {
+            'id': str(enforcement.id),
+            'enforced_at': str(enforcement.enforced_at),
+            'rule_ref': str(enforcement.rule['ref'])
+        }
+        if hasattr(enforcement, 'execution_id'):
+            data['execution_id'] = str(enforcement.execution_id)
+        return data
+
+
+class ClusterHTTPClient(object):
+    """ Wraps the HTTP client of a st2client resource manager so every request sends
+    the credentials of one cluster. st2client otherwise takes the token and api key
+    from the environment, the same for every cluster.
+    """
+
+    def __init__(self, client, token=None, api_key=None):
+        self.client = client
+        self.token = token
+        self.api_key = api_key
+
+    def __getattr__(self, name):
+        attribute = getattr(self.client, name)
+        if name not in HTTP_METHODS:
+            return attribute
+
+        def request(*args, **kwargs):
+            kwargs['token'] = self.token
+            kwargs['api_key'] = self.api_key
+            return attribute(*args, **kwargs)
+        return request
 
 
 class CronSensor(PollingSensor):
@@ -72,58 +190,485 @@ class CronSensor(PollingSensor):
         self._logger = self._sensor_service.get_logger(__name__)
         self.trigger_ref = "errors.error_cron_event"
         self.enhanced_trigger_ref = "errors.error_cron_event_enhanced"
+        self.digest_trigger_ref = "errors.error_cron_event_digest"
+        self.digest_events = []
+
+        self.kv_enforcements = {}
+        self.state_dirty = False
+        self.dirty_shards = set()
+        self.loaded_shards = set()
+        self.legacy_state_checked = False
+        self.legacy_state_found = False
+        self.state_compaction = self._get_option('state_compaction', True)
+        self.state_max_rules = self._get_option('state_max_rules', DEFAULT_STATE_MAX_RULES)
+        # Order in which the rules' states were last changed by this process
+        self.state_updates = 0
+        self.state_updated = {}
+        # Size of every datastore value holding state, by key name
+        self.state_bytes = {}
+        self.metrics = Metrics(METRICS_PREFIX, config=self._config)
+        # Built here so bad error_classification patterns fail the sensor's start
+        self.classifier = get_classifier(self._config)
+        self.rule_durations = {}
+        self.watermarks = {}
+        self._saved_watermarks = None
+        self._saved_watermark_shards = {}
+        self.legacy_watermarks_checked = False
+        self.legacy_watermarks_found = False
+        self.schedules = ScheduleCache()
+        self.scheduler = RuleScheduler()
+        self.scheduled_keys = {}
+        self.in_progress_rules = set()
+        self.cron_rules = None
+        self.cron_rules_loaded_at = None
+
+        self.bulk_enforcements = self._get_option('bulk_enforcements', False)
+        self.enforcement_page_size = self._get_option('enforcement_page_size',
+                                                      DEFAULT_ENFORCEMENT_PAGE_SIZE)
+        self.schedule_checks = self._get_option('schedule_checks', False)
+        self.check_grace_period = self._get_option('check_grace_period',
+                                                   DEFAULT_CHECK_GRACE_PERIOD)
+        self.min_poll_interval = self._get_option('min_poll_interval',
+                                                  DEFAULT_MIN_POLL_INTERVAL)
+        self.max_poll_interval = self._get_option('max_poll_interval', poll_interval)
+        self.rule_refresh_interval = self._get_option('rule_refresh_interval',
+                                                      DEFAULT_RULE_REFRESH_INTERVAL)
+        self.check_concurrency = self._get_option('check_concurrency', 1)
+        self.state_shards = self._get_option('state_shards', 0)
+        self.trigger_mode = self._get_option('trigger_mode', TRIGGER_MODE_PER_RULE)
+        self.poll_time_budget = self._get_option('poll_time_budget', 0)
+        self.poll_cursor = None
+        self.poll_cursor_loaded = False
+        self.deferred_rules = 0
+        self.digest_max_events = self._get_option('digest_max_events',
+                                                  DEFAULT_DIGEST_MAX_EVENTS)
+        self.partitioning = self._get_option('partitioning', False)
+        self.partition_members = self._get_option('partition_members') or []
+        self.partition_member_ttl = self._get_option('partition_member_ttl',
+                                                     DEFAULT_PARTITION_MEMBER_TTL)
+        self.hash_ring = None
+        if self.partitioning:
+            # Nodes only ever write the state of the rules they own
+            self.state_shards = PER_RULE_SHARDS
+        self.bulk_execution_statuses = self._get_option('bulk_execution_statuses', False)
+        self.execution_status_max_pages = self._get_option('execution_status_max_pages',
+                                                           DEFAULT_EXECUTION_STATUS_MAX_PAGES)
+        self.grouped_enforcements = {}
+        # Time of the last bulk enforcements query, and of the last one that covered
+        # each rule
+        self.enforcements_polled_at = None
+        self.enforcements_covered = {}
+        self.execution_statuses = {}
+        self.execution_errors = {}
+        # Statuses of finished executions can't change so they are kept across polls
+        self.terminal_statuses = LRUCache(self._get_option('execution_status_cache_size',
+                                                           DEFAULT_EXECUTION_STATUS_CACHE_SIZE))
+        self.enforcement_details = {}
+        self.enforcement_indexes = {}
+        self.cluster_configs = self._get_option('clusters') or []
+        self.cluster_poll_timeout = self._get_option('cluster_poll_timeout', poll_interval)
+        self.clusters = []
+        self.cluster_polls = {}
+        self.cluster_executor = None
+
+    def _get_option(self, name, default=None):
+        """ Returns an option from the error_cron_event section of the pack config """
+        event_config = (self._config or {}).get('error_cron_event') or {}
+        return event_config.get(name, default)
 
     def setup(self):
+        import socket
+        from st2client.client import Client
+
         self.st2_fqdn = socket.getfqdn()
+        self.kv_sensor_name = self._config['error_cron_event']['datastore_key']
+        if self.cluster_configs:
+            # Every cluster is checked by its own sensor, this one only schedules them
+            self.st2_client = None
+            self.clusters = [self.create_cluster_sensor(cluster)
+                             for cluster in self.cluster_configs]
+            return
+
         st2_url = "https://{}/".format(self.st2_fqdn)
         self.st2_client = Client(base_url=st2_url)
 
-        self.kv_sensor_name = self._config['error_cron_event']['datastore_key']
+    def create_cluster_sensor(self, cluster):
+        """ Returns a CronSensor checking the cron rules of one entry of the clusters
+        option with its own st2 client, state keys, metrics and logger. Its triggers
+        carry the cluster name as st2_server.
+        """
+        from st2client.client import Client
+
+        name = cluster['name']
+        key = CLUSTER_KEY_INVALID.sub('_', name)
+        event_config = dict(self._config['error_cron_event'])
+        del event_config['clusters']
+        # Partitioned nodes share the clusters, each node polls its part of every cluster
+        event_config['partition_node'] = self.node_id
+        config = dict(self._config, error_cron_event=event_config)
+
+        sensor = CronSensor(sensor_service=self._sensor_service, config=config,
+                            poll_interval=self._poll_interval)
+        sensor._logger = self._sensor_service.get_logger("{0}.{1}".format(__name__, key))
+        sensor.metrics = Metrics("{0}.cluster.{1}".format(METRICS_PREFIX, key),
+                                 config=self._config)
+        sensor.st2_fqdn = name
+        sensor.kv_sensor_name = "{0}_{1}".format(self.kv_sensor_name, key)
+
+        client_options = dict((option, cluster[option]) for option in CLUSTER_CLIENT_OPTIONS
+                              if cluster.get(option))
+        sensor.st2_client = Client(base_url=cluster.get('url') or "https://{}/".format(name),
+                                   **client_options)
+        # Client(api_key=, token=) writes them to os.environ, shared by every cluster and
+        # read back by the managers on every call, so each manager sends them instead
+        credentials = dict((option, cluster.get(option)) for option in CLUSTER_CREDENTIALS)
+        for manager in sensor.st2_client.managers.values():
+            manager.client = ClusterHTTPClient(manager.client, **credentials)
+        return sensor
+
+    @property
+    def node_id(self):
+        return self._get_option('partition_node') or self.st2_fqdn
+
+    @property
+    def kv_watermark_name(self):
+        if self.partitioning:
+            return "{0}_watermarks_{1}".format(self.kv_sensor_name, self.node_id)
+        return "{0}_watermarks".format(self.kv_sensor_name)
+
+    @property
+    def kv_cursor_name(self):
+        if self.partitioning:
+            return "{0}_cursor_{1}".format(self.kv_sensor_name, self.node_id)
+        return "{0}_cursor".format(self.kv_sensor_name)
+
+    @property
+    def kv_member_prefix(self):
+        return "{0}{1}".format(self.kv_sensor_name, MEMBER_SEPARATOR)
+
+    def get_partition_members(self, now):
+        """ Returns the sensor nodes sharing the cron rules. Without partition_members
+        in the config every node writes a heartbeat key to the datastore and the members
+        are the nodes with a heartbeat in the last partition_member_ttl seconds.
+        """
+        if self.partition_members:
+            return sorted(self.partition_members)
+
+        self._sensor_service.set_value(name=self.kv_member_prefix + self.node_id,
+                                       value=str(now),
+                                       ttl=self.partition_member_ttl)
+        members = set([self.node_id])
+        for kv_pair in self._sensor_service.list_values(prefix=self.kv_member_prefix):
+            try:
+                heartbeat = float(kv_pair.value)
+            except (TypeError, ValueError):
+                continue
+            if heartbeat >= now - self.partition_member_ttl:
+                members.add(kv_pair.name.split(self.kv_member_prefix, 1)[-1])
+        return sorted(members)
+
+    def get_owned_rules(self, rules, now):
+        """ Returns the rules this node checks. The ring is rebuilt when a node joins or
+        leaves and only the rules of that node move.
+        """
+        members = self.get_partition_members(now)
+        if self.hash_ring is None or self.hash_ring.nodes != members:
+            self._logger.info("Cron rules partitioned across: {0}".format(members))
+            self.hash_ring = HashRing(members)
+        return [rule for rule in rules if self._owns_rule(rule.ref)]
+
+    def _owns_rule(self, rule_ref):
+        if not self.partitioning:
+            return True
+        return self.hash_ring is not None and self.hash_ring.get_node(rule_ref) == self.node_id
+
+    @property
+    def kv_watermark_shard_prefix(self):
+        return "{0}_watermarks{1}".format(self.kv_sensor_name, SHARD_SEPARATOR)
+
+    def load_watermarks(self):
+        """ Loads the newest processed enforcement of every rule from the datastore.
+        With state_shards the watermarks are sharded like the state and the first poll
+        moves the ones stored under the single watermarks key into the shards.
+        """
+        if self.state_shards:
+            return self.load_sharded_watermarks()
+
+        watermarks = self._sensor_service.get_value(name=self.kv_watermark_name)
+        self._saved_watermarks = watermarks
+        return self._decode_watermarks(watermarks)
+
+    def _decode_watermarks(self, watermarks):
+        if not watermarks:
+            return {}
+        try:
+            return json.loads(watermarks)
+        except ValueError:
+            self._logger.warning("Ignoring malformed cron watermarks: {0}".format(watermarks))
+            return {}
+
+    def load_sharded_watermarks(self):
+        """ Reads every watermark shard with one prefixed list_values call """
+        watermarks = {}
+        self._saved_watermark_shards = {}
+        prefix = self.kv_watermark_shard_prefix
+        for kv_pair in self._sensor_service.list_values(prefix=prefix):
+            shard = kv_pair.name.split(prefix, 1)[-1]
+            self._saved_watermark_shards[shard] = kv_pair.value
+            watermarks.update(self._decode_watermarks(kv_pair.value))
+
+        if not self.legacy_watermarks_checked:
+            legacy_watermarks = self._decode_watermarks(
+                self._sensor_service.get_value(name=self.kv_watermark_name))
+            for rule_ref, watermark in legacy_watermarks.items():
+                watermarks.setdefault(rule_ref, watermark)
+            self.legacy_watermarks_found = bool(legacy_watermarks)
+            self.legacy_watermarks_checked = True
+
+        return watermarks
+
+    def save_watermarks(self):
+        """ Writes the watermarks to the datastore when they moved during the poll.
+        When sharded only the shards whose watermarks changed are written.
+        """
+        if self.state_shards:
+            return self.save_sharded_watermarks()
+
+        watermarks = json.dumps(self.watermarks, sort_keys=True)
+        if watermarks == self._saved_watermarks or (not self.watermarks and
+                                                    not self._saved_watermarks):
+            return
+        self._sensor_service.set_value(name=self.kv_watermark_name, value=watermarks)
+        self._saved_watermarks = watermarks
+
+    def save_sharded_watermarks(self):
+        shards = {}
+        for rule_ref, watermark in self.watermarks.items():
+            shards.setdefault(self.get_shard(rule_ref), {})[rule_ref] = watermark
+
+        for shard in sorted(set(shards) | set(self._saved_watermark_shards)):
+            # With partitioning the shards are per rule and a node only writes its own
+            if not self._owns_rule(shard):
+                continue
+            name = "{0}{1}".format(self.kv_watermark_shard_prefix, shard)
+            saved = self._saved_watermark_shards.get(shard)
+            if shard in shards:
+                watermarks = json.dumps(shards[shard], sort_keys=True)
+                if watermarks != saved:
+                    self._sensor_service.set_value(name=name, value=watermarks)
+                    self._saved_watermark_shards[shard] = watermarks
+            elif saved is not None:
+                self._sensor_service.delete_value(name=name)
+                del self._saved_watermark_shards[shard]
+
+        if self.legacy_watermarks_found:
+            self._sensor_service.delete_value(name=self.kv_watermark_name)
+            self.legacy_watermarks_found = False
+
+    def load_state(self):
+        """ Loads the state of the rules in error from the datastore. State written by
+        older versions of the pack (a python repr of {rule: enforcement id}) is migrated
+        to the current format and written back on the next save.
+        """
+        self.state_dirty = False
+        self.dirty_shards = set()
+        if self.state_shards:
+            return self.load_sharded_state()
+
+        state = self._sensor_service.get_value(name=self.kv_sensor_name)
+        self.state_bytes = {self.kv_sensor_name: self._value_size(state)}
+        rules, migrated = self._decode_state(state)
+        self.state_dirty = migrated
+        return rules
+
+    def _value_size(self, value):
+        return len(value) if isinstance(value, str) else 0
+
+    def _decode_state(self, state):
+        """ Returns the rules of a stored state and whether they had to be migrated """
+        if not state:
+            return {}, False
+
+        if not isinstance(state, dict):
+            try:
+                state = json.loads(state)
+            except ValueError:
+                import ast
+
+                state = ast.literal_eval(state)
+
+        if state.get('version') == STATE_VERSION and isinstance(state.get('rules'), dict):
+            return state['rules'], False
+
+        return self._migrate_kv_format(state), True
+
+    @property
+    def kv_shard_prefix(self):
+        return "{0}{1}".format(self.kv_sensor_name, SHARD_SEPARATOR)
+
+    def get_shard(self, rule_ref):
+        """ Returns the shard a rule's state is stored in, stable across restarts """
+        if self.state_shards == PER_RULE_SHARDS:
+            return rule_ref
+        return str(zlib.crc32(rule_ref.encode('utf-8')) % self.state_shards)
+
+    def load_sharded_state(self):
+        """ Reads every shard with one prefixed list_values call. The first poll also
+        moves the state stored under the single datastore_key into the shards.
+        """
+        rules = {}
+        self.loaded_shards = set()
+        self.state_bytes = {}
+        for kv_pair in self._sensor_service.list_values(prefix=self.kv_shard_prefix):
+            shard = kv_pair.name.split(self.kv_shard_prefix, 1)[-1]
+            self.loaded_shards.add(shard)
+            self.state_bytes[shard] = self._value_size(kv_pair.value)
+
+            shard_rules, migrated = self._decode_state(kv_pair.value)
+            for rule_ref, rule_state in shard_rules.items():
+                rules[rule_ref] = rule_state
+                if migrated or self.get_shard(rule_ref) != shard:
+                    # Also rewrites rules left in the wrong shard by a change of state_shards
+                    self._mark_dirty(rule_ref)
+                    self.dirty_shards.add(shard)
+
+        if not self.legacy_state_checked:
+            legacy_rules, _ = self._decode_state(
+                self._sensor_service.get_value(name=self.kv_sensor_name))
+            for rule_ref, rule_state in legacy_rules.items():
+                rules.setdefault(rule_ref, rule_state)
+                self._mark_dirty(rule_ref)
+            self.legacy_state_found = bool(legacy_rules)
+            self.legacy_state_checked = True
+
+        return rules
+
+    def save_state(self):
+        """ Writes the state of the rules in error to the datastore if any rule changed.
+        When sharded only the shards of the changed rules are written.
+        """
+        if not self.state_dirty:
+            return
+
+        if not self.state_shards:
+            state = json.dumps({'version': STATE_VERSION, 'rules': self.kv_enforcements},
+                               sort_keys=True)
+            self._sensor_service.set_value(name=self.kv_sensor_name, value=state)
+            self.state_bytes = {self.kv_sensor_name: len(state)}
+            self.state_dirty = False
+            return
+
+        shards = dict((shard, {}) for shard in self.dirty_shards)
+        for rule_ref, rule_state in self.kv_enforcements.items():
+            shard = self.get_shard(rule_ref)
+            if shard in shards:
+                shards[shard][rule_ref] = rule_state
+
+        for shard, shard_rules in sorted(shards.items()):
+            name = "{0}{1}".format(self.kv_shard_prefix, shard)
+            if shard_rules:
+                state = json.dumps({'version': STATE_VERSION, 'rules': shard_rules},
+                                   sort_keys=True)
+                self._sensor_service.set_value(name=name, value=state)
+                self.state_bytes[shard] = len(state)
+                self.loaded_shards.add(shard)
+            elif shard in self.loaded_shards:
+                self._sensor_service.delete_value(name=name)
+                self.state_bytes.pop(shard, None)
+                self.loaded_shards.discard(shard)
+
+        if self.legacy_state_found:
+            self._sensor_service.delete_value(name=self.kv_sensor_name)
+            self.legacy_state_found = False
+
+        self.state_dirty = False
+        self.dirty_shards = set()
+
+    def _mark_dirty(self, rule_name):
+        self.state_dirty = True
+        if self.state_shards:
+            self.dirty_shards.add(self.get_shard(rule_name))
 
     def poll(self):
+        if self.clusters:
+            return self.poll_clusters()
+
+        poll_started = time.monotonic()
+        api_calls = self.metrics.total('api.')
+        dispatched = self.metrics.counters.get('rules.dispatched', 0)
+        triggers = self.metrics.counters.get('triggers.emitted', 0)
+        self.rule_durations = {}
         # Get the current datetime with a timezone
-        utc_date_time = datetime.datetime.utcnow().replace(tzinfo=pytz.UTC)
+        utc_date_time = datetime.datetime.now(UTC)
 
-        rules = self.get_cron_rules()
+        rules = self.load_cron_rules(utc_date_time.timestamp())
+        if self.partitioning:
+            rules = self.get_owned_rules(rules, utc_date_time.timestamp())
 
-        # Get information from key value store if it doesn't exist
-        # then initialize as empty dictionary
-        self.kv_enforcements = self._sensor_service.get_value(name=self.kv_sensor_name)
-        if not self.kv_enforcements:
-            self.kv_enforcements = {}
+        self.kv_enforcements = self.load_state()
 
-        # If the key does exist in the key value store then it will be returned
-        # as a string value so we need to convert it.
-        if not isinstance(self.kv_enforcements, dict):
-            self.kv_enforcements = ast.literal_eval(self.kv_enforcements)
+        self._logger.debug("Loaded cron state: rules={0} bytes={1}".format(
+            len(self.kv_enforcements), sum(self.state_bytes.values())))
 
-        # Convert to new format temporarily for migration but keep using original format
-        self._migrated_kv = self._migrate_kv_format(self.kv_enforcements)
+        self.watermarks = self.load_watermarks()
 
-        self._logger.info("Current problem rules: {0}".format(self.kv_enforcements))
+        now = utc_date_time.timestamp()
+        self.in_progress_rules = set()
+        if self.schedule_checks:
+            self.scheduler.pop_due(now)
 
+        windows = []
         for rule in rules:
-            cron_time = CronTab(self.convert_to_crontab(rule.trigger['parameters']))
+            schedule = self.schedules.get(rule.ref, rule.trigger['parameters'])
+            if self.schedule_checks and not self.is_check_due(rule.ref, schedule.key):
+                continue
+            # Previous and next run times from the compiled schedule of the rule
+            previous_cron_dt, next_cron_dt = schedule.window(utc_date_time)
+            windows.append((rule, previous_cron_dt, next_cron_dt))
+
+        rule_refs = [rule.ref for rule in rules]
+        self.schedules.prune(rule_refs)
+        self.scheduler.prune(rule_refs)
+        for rule_ref in set(self.scheduled_keys) - set(rule_refs):
+            del self.scheduled_keys[rule_ref]
+        for rule_ref in set(self.enforcements_covered) - set(rule_refs):
+            del self.enforcements_covered[rule_ref]
+
+        if self.schedule_checks:
+            self._logger.debug("Checking {0} of {1} cron rules".format(
+                len(windows), len(rules)))
 
-            # Gets the previous run time in seconds
-            previous_cron_s = cron_time.previous(now=utc_date_time, delta=False)
-            next_cron_s = cron_time.next(now=utc_date_time, delta=False)
+        self.grouped_enforcements = {}
+        if self.poll_time_budget:
+            windows = self.order_windows(windows)
 
-            # converts from seconds to a useable datetime format
-            previous_cron_stamp = datetime.datetime.utcfromtimestamp(previous_cron_s)
-            next_cron_stamp = datetime.datetime.utcfromtimestamp(next_cron_s)
+        if self.bulk_enforcements and windows:
+            self.grouped_enforcements = self.get_bulk_enforcements(windows, now)
 
-            # Adds the timezone information to the time stamp
-            previous_cron_dt = previous_cron_stamp.replace(tzinfo=pytz.UTC)
-            next_cron_dt = next_cron_stamp.replace(tzinfo=pytz.UTC)
+        # The API calls of every rule are made first, concurrently when check_concurrency
+        # is above 1. Triggers are then dispatched rule by rule in the catalogue order.
+        self.execution_statuses = {}
+        self.execution_errors = {}
+        self.enforcement_details = {}
+        self.enforcement_indexes = {}
+        checks = self.fetch_rule_checks(windows, poll_started)
+        if self.bulk_execution_statuses:
+            self.fetch_execution_statuses(checks)
 
-            enforcements = self.st2_client.ruleenforcements.query(rule_ref=rule.ref)
+        for rule, previous_cron_dt, next_cron_dt, enforcements, ran_before in checks:
             if len(enforcements) > 0:
                 self._logger.info("Checking enforcements for rule: {0}".format(rule.ref))
                 result = self.check_enforcements(enforcements, previous_cron_dt, next_cron_dt)
 
                 if result:
                     self.delete_from_kv(rule.ref)
+            elif ran_before:
+                # The queries only cover the current window so we only know the rule didn't
+                # run when it should have
+                self.dispatch_trigger(st2_rule_name=rule.ref,
+                                      st2_server=self.st2_fqdn,
+                                      st2_comments="Cron job did not run",
+                                      st2_state="open")
             else:
                 st2_comments = "Cron job is not running and no enforcements can be found"
                 self.dispatch_trigger(st2_rule_name=rule.ref,
@@ -131,61 +676,509 @@ class CronSensor(PollingSensor):
                                       st2_comments=st2_comments,
                                       st2_state="open")
 
-        self._sensor_service.set_value(name=self.kv_sensor_name, value=self.kv_enforcements)
+            if self.schedule_checks:
+                self.schedule_next_check(rule.ref, next_cron_dt, now)
+
+        if self.schedule_checks:
+            self.adapt_poll_interval(now)
+
+        if self.partitioning:
+            # Rules moved to another node leave their watermark behind
+            owned = set(rule_refs)
+            self.watermarks = dict((rule_ref, watermark)
+                                   for rule_ref, watermark in self.watermarks.items()
+                                   if rule_ref in owned)
+
+        if self.trigger_mode == TRIGGER_MODE_DIGEST:
+            self.dispatch_digest()
+
+        self.compact_state()
+        self.save_watermarks()
+        self.save_state()
+        self.metrics.set_gauge('state.rules', len(self.kv_enforcements))
+        self.metrics.set_gauge('state.bytes', sum(self.state_bytes.values()))
+
+        duration = time.monotonic() - poll_started
+        self.metrics.time('poll.duration', duration)
+        self.metrics.inc_counter('polls')
+        self.metrics.inc_counter('rules.checked', len(checks))
+        if self.deferred_rules:
+            self.metrics.inc_counter('rules.deferred', self.deferred_rules)
+        slowest = sorted(self.rule_durations.items(), key=lambda item: -item[1])
+        self._logger.debug(
+            "Cron poll finished: duration={0:.3f}s rules={1} checked={2} deferred={3} "
+            "dispatched={4} triggers={5} api_calls={6} state_rules={7} slowest={8}".format(
+                duration, len(rules), len(checks), self.deferred_rules,
+                self.metrics.counters.get('rules.dispatched', 0) - dispatched,
+                self.metrics.counters.get('triggers.emitted', 0) - triggers,
+                self.metrics.total('api.') - api_calls, len(self.kv_enforcements),
+                ','.join('{0}:{1:.3f}s'.format(rule_ref, seconds)
+                         for rule_ref, seconds in slowest[:SLOWEST_RULES_LOGGED])))
+
+    def poll_clusters(self):
+        """ Polls every cluster on its own thread. The poll returns once all the clusters
+        are done or cluster_poll_timeout seconds have passed, and a cluster still busy
+        with an earlier poll is skipped, so a slow or unreachable cluster only delays
+        its own checks.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        from concurrent.futures import wait
+
+        if self.cluster_executor is None:
+            self.cluster_executor = ThreadPoolExecutor(max_workers=len(self.clusters))
+
+        polls = []
+        for cluster in self.clusters:
+            running = self.cluster_polls.get(cluster.st2_fqdn)
+            if running is not None and not running.done():
+                self._logger.warning("Skipping cluster {0}, its last poll is still "
+                                     "running".format(cluster.st2_fqdn))
+                self.metrics.inc_counter('clusters.skipped')
+                continue
+            running = self.cluster_executor.submit(self.poll_cluster, cluster)
+            self.cluster_polls[cluster.st2_fqdn] = running
+            polls.append(running)
+
+        wait(polls, timeout=self.cluster_poll_timeout)
+        if self.schedule_checks:
+            # The clusters adapt their own poll interval, only this sensor is polled
+            self.set_poll_interval(min(cluster.get_poll_interval()
+                                       for cluster in self.clusters))
+
+    def poll_cluster(self, cluster):
+        try:
+            cluster.poll()
+        except Exception as e:  # pylint: disable=broad-except
+            self._logger.error("Polling cluster {0} failed: {1}".format(cluster.st2_fqdn, e))
+            self.metrics.inc_counter('clusters.failed')
+
+    def count_api_call(self, endpoint):
+        """ Counts a request to the st2 API by endpoint, e.g. ruleenforcements.query """
+        self.metrics.inc_counter('api.' + endpoint)
+
+    def compact_state(self):
+        """ Drops the state and watermarks of the rules that are no longer enabled cron
+        rules. While the state holds more than state_max_rules rules, the rules whose
+        state this process changed least recently are dropped too. When partitioning,
+        only the rules this node owns are dropped and counted towards state_max_rules.
+        :returns: (number of rules removed, number of rules evicted)
+        """
+        owned = [r for r in self.kv_enforcements if self._owns_rule(r)]
+        removed = 0
+        if self.state_compaction and self.cron_rules is not None:
+            for rule_ref in [r for r in owned if r not in self.cron_rules]:
+                self.delete_from_kv(rule_ref)
+                removed += 1
+            for rule_ref in [r for r in self.watermarks if r not in self.cron_rules]:
+                del self.watermarks[rule_ref]
+            owned = [r for r in owned if r in self.kv_enforcements]
+
+        evicted = 0
+        if self.state_max_rules and len(owned) > self.state_max_rules:
+            excess = len(owned) - self.state_max_rules
+            oldest = sorted(owned, key=lambda r: (self.state_updated.get(r, 0), r))[:excess]
+            for rule_ref in oldest:
+                self.delete_from_kv(rule_ref)
+            evicted = len(oldest)
+            self._logger.warning("Cron state holds more than {0} rules, dropped the state "
+                                 "of {1} rules".format(self.state_max_rules, evicted))
+
+        if removed:
+            self._logger.info("Dropped the state of {0} removed cron rules".format(removed))
+            self.metrics.inc_counter('state.compacted', removed)
+        if evicted:
+            self.metrics.inc_counter('state.evicted', evicted)
+        return removed, evicted
+
+    def map_rules(self, func, windows):
+        """ Calls func(rule, previous_cron, next_cron) for every window and returns the
+        results in the same order. Up to check_concurrency calls run at once on green
+        threads, or on native threads when eventlet isn't available.
+        """
+        if self.check_concurrency <= 1 or len(windows) <= 1:
+            return [func(*window) for window in windows]
+
+        try:
+            import eventlet
+        except ImportError:
+            from concurrent.futures import ThreadPoolExecutor
+
+            with ThreadPoolExecutor(max_workers=self.check_concurrency) as executor:
+                return list(executor.map(lambda window: func(*window), windows))
+
+        pool = eventlet.GreenPool(self.check_concurrency)
+        return list(pool.imap(func, *zip(*windows)))
+
+    def order_windows(self, windows):
+        """ Orders the rules by ref starting after the cursor left by the last poll that
+        ran out of time, so every rule gets checked in turn
+        """
+        if self.poll_cursor is None and not self.poll_cursor_loaded:
+            self.poll_cursor = self._sensor_service.get_value(name=self.kv_cursor_name)
+            self.poll_cursor_loaded = True
+
+        windows = sorted(windows, key=lambda window: window[0].ref)
+        if self.poll_cursor:
+            start = bisect.bisect_right([window[0].ref for window in windows],
+                                        self.poll_cursor)
+            windows = windows[start:] + windows[:start]
+        return windows
+
+    def fetch_rule_checks(self, windows, poll_started):
+        """ Fetches the checks of the rules until poll_time_budget seconds have passed
+        since the poll started. At least one batch of check_concurrency rules is fetched
+        every poll, the rest are deferred to the next poll.
+        """
+        if not self.poll_time_budget:
+            return self.map_rules(self.fetch_rule_check, windows)
+
+        checks = []
+        batch_size = max(self.check_concurrency, 1)
+        for start in range(0, len(windows), batch_size):
+            if checks and time.monotonic() - poll_started >= self.poll_time_budget:
+                break
+            checks.extend(self.map_rules(self.fetch_rule_check,
+                                         windows[start:start + batch_size]))
+
+        self.deferred_rules = len(windows) - len(checks)
+        cursor = checks[-1][0].ref if self.deferred_rules else None
+        if self.deferred_rules:
+            self._logger.warning("Poll time budget of {0}s exhausted after {1} rules, "
+                                 "deferring {2} rules to the next poll".format(
+                                     self.poll_time_budget, len(checks), self.deferred_rules))
+        if cursor != self.poll_cursor:
+            self.poll_cursor = cursor
+            if cursor is None:
+                self._sensor_service.delete_value(name=self.kv_cursor_name)
+            else:
+                self._sensor_service.set_value(name=self.kv_cursor_name, value=cursor)
+        return checks
+
+    def fetch_rule_check(self, rule, previous_cron, next_cron):
+        """ Makes the API calls needed to check a rule without dispatching anything
+        :returns: (rule, previous_cron, next_cron, enforcements, ran_before)
+        """
+        started = time.monotonic()
+        check = self._fetch_rule_check(rule, previous_cron, next_cron)
+        duration = time.monotonic() - started
+        self.rule_durations[rule.ref] = duration
+        self.metrics.time('rule.check_duration', duration)
+        return check
+
+    def _fetch_rule_check(self, rule, previous_cron, next_cron):
+        if self.bulk_enforcements and rule.ref in self.grouped_enforcements:
+            new_enforcements = self.grouped_enforcements[rule.ref]
+        else:
+            new_enforcements = self.get_rule_enforcements(rule.ref, previous_cron, next_cron)
+        if self.bulk_enforcements:
+            self.enforcements_covered[rule.ref] = self.enforcements_polled_at
+        enforcements = self.merge_watermark(rule.ref, new_enforcements, previous_cron,
+                                            next_cron)
+
+        # The queries only cover the current window so a rule without enforcements in it
+        # either didn't run when it should have or never ran at all
+        ran_before = True
+        if enforcements:
+            enforcement = self.find_enforcement(enforcements, previous_cron, next_cron)
+            if enforcement is not None and hasattr(enforcement, 'execution_id'):
+                # In bulk mode the statuses are fetched for all the rules afterwards
+                if not self.bulk_execution_statuses:
+                    self.get_execution_status(enforcement.execution_id)
+            elif enforcement is not None:
+                self.get_enforcement_detail(enforcement.id)
+        elif not self.bulk_enforcements:
+            ran_before = self.has_enforcement_history(rule.ref)
+
+        return rule, previous_cron, next_cron, enforcements, ran_before
+
+    def get_execution_status(self, execution_id):
+        """ Returns the status of an execution, fetched at most once per poll and only
+        once ever when the execution has finished
+        """
+        if execution_id not in self.execution_statuses:
+            status = self.terminal_statuses.get(execution_id)
+            if status is None:
+                self.count_api_call('liveactions.get_by_id')
+                execution = self.st2_client.liveactions.get_by_id(execution_id)
+                status = execution.status
+                if status in ERRORED_STATUSES:
+                    # Saves fetching the execution again to classify its error
+                    self.execution_errors[execution_id] = self._get_result_error(
+                        getattr(execution, 'result', None))
+            self.set_execution_status(execution_id, status)
+        return self.execution_statuses[execution_id]
+
+    def get_execution_error(self, execution_id):
+        """ Returns the error message in the result of a failed execution, fetched at
+        most once per poll
+        """
+        if execution_id not in self.execution_errors:
+            self.count_api_call('liveactions.get_by_id')
+            execution = self.st2_client.liveactions.get_by_id(execution_id)
+            self.execution_errors[execution_id] = self._get_result_error(
+                getattr(execution, 'result', None))
+        return self.execution_errors[execution_id]
+
+    def _get_result_error(self, result):
+        """ Returns the error message of an execution result, or "" when it has none """
+        message = get_error_message(result, default="")
+        return "" if message is None else str(message)
+
+    def set_execution_status(self, execution_id, status):
+        self.execution_statuses[execution_id] = status
+        if status not in UNFINISHED_STATUSES:
+            self.terminal_statuses.set(execution_id, status)
+
+    def fetch_execution_statuses(self, checks):
+        """ Fetches the status of the execution of every rule's in-window enforcement with
+        paginated executions queries projected to the id and status. The executions API
+        can't filter by id so the query covers every cron execution started since the
+        oldest enforcement and stops once all the executions are found, or after
+        execution_status_max_pages pages per page of executions looked up.
+        """
+        enforced = {}
+        for _, previous_cron, next_cron, enforcements, _ in checks:
+            enforcement = self.find_enforcement(enforcements, previous_cron, next_cron)
+            if (enforcement is not None and hasattr(enforcement, 'execution_id') and
+                    enforcement.execution_id not in self.execution_statuses and
+                    enforcement.execution_id not in self.terminal_statuses):
+                enforced[enforcement.execution_id] = parse_timestamp(enforcement.enforced_at)
+        enforced_times = [t for t in enforced.values() if t is not None]
+        if not enforced_times:
+            return
+
+        since = datetime.datetime.fromtimestamp(min(enforced_times) - EXECUTION_START_SLACK,
+                                                UTC)
+        missing = set(enforced)
+        max_pages = self.execution_status_max_pages * -(-len(missing) //
+                                                        self.enforcement_page_size)
+        for page_number in range(max_pages):
+            self.count_api_call('liveactions.query')
+            page = self.st2_client.liveactions.query(
+                timestamp_gt=since.strftime(ENFORCED_AT_FORMAT),
+                trigger_type=CRON_TIMER_TRIGGER_TYPE,
+                include_attributes='id,status',
+                limit=self.enforcement_page_size,
+                offset=page_number * self.enforcement_page_size)
+            for execution in page:
+                if execution.id in missing:
+                    self.set_execution_status(execution.id, execution.status)
+                    missing.discard(execution.id)
+
+            if not missing or len(page) < self.enforcement_page_size:
+                break
+
+        if missing:
+            self._logger.debug("{0} executions not found in bulk, fetching them one by "
+                               "one".format(len(missing)))
+
+    def get_enforcement_detail(self, enforcement_id):
+        """ Returns a rule enforcement with its failure reason, fetched at most once per
+        poll
+        """
+        if enforcement_id not in self.enforcement_details:
+            self.count_api_call('ruleenforcements.get_by_id')
+            self.enforcement_details[enforcement_id] = \
+                self.st2_client.ruleenforcements.get_by_id(enforcement_id)
+        return self.enforcement_details[enforcement_id]
+
+    def is_check_due(self, rule_ref, key):
+        """ Checks whether the rule needs checking this poll. Rules are due when they are
+        new, when their trigger parameters changed or when their scheduled check time has
+        passed, in which case poll already took them off the scheduler.
+        """
+        if self.scheduled_keys.get(rule_ref) != key:
+            return True
+        return rule_ref not in self.scheduler
+
+    def schedule_next_check(self, rule_ref, next_cron, now):
+        """ Schedules the next check of a rule a grace period after its next run. Rules
+        with an execution still in progress are checked again on the next poll.
+        """
+        if rule_ref in self.in_progress_rules:
+            due = now + (self.max_poll_interval or 0)
+        else:
+            due = next_cron.timestamp() + self.check_grace_period
+        self.scheduler.schedule(rule_ref, due)
+        self.scheduled_keys[rule_ref] = self.schedules.get_key(rule_ref)
+
+    def adapt_poll_interval(self, now):
+        """ Polls again when the next rule is due, between min_poll_interval and
+        max_poll_interval seconds from now
+        """
+        if not self.max_poll_interval:
+            return
+        interval = self.max_poll_interval
+        next_due = self.scheduler.next_due()
+        if next_due is not None:
+            interval = min(interval, max(self.min_poll_interval, next_due - now))
+        self.set_poll_interval(int(interval))
+
+    def get_enforcements_start(self, rule_ref, previous_cron, next_cron):
+        """ Returns the time after which enforcements of the rule still need to be fetched.
+        check_enforcements looks back one cron period before the previous run, anything
+        up to the rule's watermark has already been fetched by an earlier poll.
+        """
+        since = previous_cron - (next_cron - previous_cron)
+        watermark = self.watermarks.get(rule_ref)
+        if watermark:
+            watermark_at = parse_timestamp(watermark['enforced_at'])
+            if watermark_at is not None and watermark_at > since.timestamp():
+                since = datetime.datetime.fromtimestamp(watermark_at, UTC)
+        return since
+
+    def get_rule_enforcements(self, rule_ref, previous_cron, next_cron):
+        """ Fetches the enforcements of one rule that are newer than its watermark
+        and inside the cron window
+        """
+        since = self.get_enforcements_start(rule_ref, previous_cron, next_cron)
+        self.count_api_call('ruleenforcements.query')
+        return self.st2_client.ruleenforcements.query(
+            rule_ref=rule_ref,
+            enforced_at_gt=since.strftime(ENFORCED_AT_FORMAT),
+            enforced_at_lt=next_cron.strftime(ENFORCED_AT_FORMAT))
+
+    def merge_watermark(self, rule_ref, new_enforcements, previous_cron, next_cron):
+        """ Adds the rule's last processed enforcement to the newly fetched ones when it
+        is still inside the cron window, then moves the watermark to the newest one.
+        """
+        enforcements = list(new_enforcements)
+        watermark = self.watermarks.get(rule_ref)
+        if watermark:
+            low = (previous_cron - (next_cron - previous_cron)).timestamp()
+            watermark_at = parse_timestamp(watermark['enforced_at'])
+            known_ids = set(str(e.id) for e in enforcements)
+            if (watermark_at is not None and watermark_at >= low and
+                    watermark['id'] not in known_ids):
+                enforcements.append(CachedEnforcement(watermark))
+
+        if enforcements:
+            newest = self.get_enforcement_index(enforcements).latest() or enforcements[0]
+            self.watermarks[rule_ref] = CachedEnforcement.serialize(newest)
+        else:
+            self.watermarks.pop(rule_ref, None)
+
+        return enforcements
+
+    def has_enforcement_history(self, rule_ref):
+        """ Checks whether the rule has ever been enforced """
+        self.count_api_call('ruleenforcements.query')
+        return len(self.st2_client.ruleenforcements.query(rule_ref=rule_ref, limit=1)) > 0
+
+    def get_bulk_enforcements(self, windows, now):
+        """ Fetches the enforcements of every rule enforced since the last poll with
+        one paginated query. Only rules whose enforcements were fetched up to the last
+        poll are served from it. The others, e.g. on the first poll or rules that were
+        not due, get their own query for the older part of their window.
+        :returns: {rule ref: enforcements} of the rules served by the bulk query
+        """
+        last_poll = self.enforcements_polled_at
+        self.enforcements_polled_at = now
+        if last_poll is None:
+            return {}
+
+        since = last_poll - BULK_ENFORCEMENT_OVERLAP
+        served = []
+        for rule, previous_cron, next_cron in windows:
+            start = self.get_enforcements_start(rule.ref, previous_cron, next_cron)
+            covered = self.enforcements_covered.get(rule.ref)
+            if start.timestamp() >= since or (covered is not None and covered >= last_poll):
+                served.append(rule.ref)
+        if not served:
+            return {}
+
+        grouped = self.get_enforcements_since(datetime.datetime.fromtimestamp(since, UTC))
+        return dict((rule_ref, grouped.get(rule_ref, [])) for rule_ref in served)
+
+    def get_enforcements_since(self, since):
+        """ Fetches every rule enforcement since the given datetime with one paginated
+        query and groups them by rule ref. The API returns the newest enforcements first
+        and that order is kept within each group.
+        """
+        grouped = {}
+        offset = 0
+        while True:
+            self.count_api_call('ruleenforcements.query')
+            page = self.st2_client.ruleenforcements.query(
+                enforced_at_gt=since.strftime(ENFORCED_AT_FORMAT),
+                limit=self.enforcement_page_size,
+                offset=offset)
+            for enforcement in page:
+                grouped.setdefault(enforcement.rule['ref'], []).append(enforcement)
+
+            if len(page) < self.enforcement_page_size:
+                break
+            offset += self.enforcement_page_size
+
+        return grouped
+
+    def get_enforcement_index(self, enforcements):
+        """ Returns the sorted index of a rule's enforcements, built once per poll """
+        cached = self.enforcement_indexes.get(id(enforcements))
+        # The list is kept with its index so its id can't be reused by another list
+        if cached is None or cached[0] is not enforcements:
+            cached = (enforcements, EnforcementIndex(enforcements))
+            self.enforcement_indexes[id(enforcements)] = cached
+        return cached[1]
+
+    def find_enforcement(self, enforcements, previous_cron, next_cron):
+        """ Returns the newest enforcement enforced between one cron period before the
+        previous run and the next run, or None
+        """
+        # Creating a buffer of one run time
+        cron_delta = next_cron - previous_cron
+        cron_low_buffer = previous_cron - cron_delta
+
+        return self.get_enforcement_index(enforcements).latest_between(
+            cron_low_buffer.timestamp(), next_cron.timestamp())
 
     def check_enforcements(self, enforcements, previous_cron, next_cron):
         """ Checks all the enforments to find if the cron was executed and to
         get the status of the execution if one can be found
         """
-        for enforcement in enforcements:
-            # Parse the enforcement enforced time to be in datetime format for comparison
-            # We need to drop the microseconds from the datetime format for the comparison
-            # to be accurate
-            enforced_at = parse(enforcement.enforced_at).replace(microsecond=0)
-
-            # Creating a buffer of one run time
-            cron_delta = next_cron - previous_cron
-            cron_low_buffer = previous_cron - cron_delta
-
-            if cron_low_buffer <= enforced_at <= next_cron:
-                # If the rule logic fails then no execution_id exists in the rule enforcement
-                if hasattr(enforcement, 'execution_id'):
-                    st2_execution = self.st2_client.liveactions.get_by_id(enforcement.execution_id)
-                    if st2_execution.status in PROGRESS_STATUSES:
-                        self._logger.info("Currently running execution. Will check next run")
-                        return False
-                    elif st2_execution.status in ERRORED_STATUSES:
+        enforcement = self.find_enforcement(enforcements, previous_cron, next_cron)
+        if enforcement is not None:
+            # If the rule logic fails then no execution_id exists in the rule enforcement
+            if hasattr(enforcement, 'execution_id'):
+                st2_execution_status = self.get_execution_status(enforcement.execution_id)
+                if st2_execution_status in UNFINISHED_STATUSES:
+                    self._logger.info("Currently running execution. Will check next run")
+                    self.in_progress_rules.add(enforcement.rule['ref'])
+                    return False
+                elif st2_execution_status in ERRORED_STATUSES:
+                    self.dispatch_trigger(st2_rule_name=enforcement.rule['ref'],
+                                          st2_server=self.st2_fqdn,
+                                          st2_execution_id=enforcement.execution_id,
+                                          st2_comments="Cronjob execution failed",
+                                          st2_enforcement_id=enforcement.id,
+                                          st2_execution_status=st2_execution_status)
+                    return False
+                else:
+                    if enforcement.rule['ref'] in self.kv_enforcements:
                         self.dispatch_trigger(st2_rule_name=enforcement.rule['ref'],
                                               st2_server=self.st2_fqdn,
                                               st2_execution_id=enforcement.execution_id,
-                                              st2_comments="Cronjob execution failed",
-                                              st2_enforcement_id=enforcement.id)
-                        return False
-                    else:
-                        if enforcement.rule['ref'] in self.kv_enforcements:
-                            self.dispatch_trigger(st2_rule_name=enforcement.rule['ref'],
-                                                  st2_server=self.st2_fqdn,
-                                                  st2_execution_id=enforcement.execution_id,
-                                                  st2_comments="Cronjob ran successfully",
-                                                  st2_enforcement_id=enforcement.id,
-                                                  st2_state="success")
-                        return True
-                else:
-                    rule_enforcement = self.st2_client.ruleenforcements.get_by_id(enforcement.id)
-                    # When rule failures have jinja expressions in it those have to be escaped so
-                    # mistral does not attempt to render the jinja expression as a template.
-                    rule_fail_reason = rule_enforcement.failure_reason
-                    # W605 = invalid escape sequence flake8 error that we want to ignore
-                    escape_beggining_bracket = \
-                        rule_fail_reason.replace('{{', '\{\{')  # noqa: W605
-                    escape_ending_bracket = \
-                        escape_beggining_bracket.replace('}}', '\}\}')  # noqa: W605
+                                              st2_comments="Cronjob ran successfully",
+                                              st2_enforcement_id=enforcement.id,
+                                              st2_state="success")
+                    return True
+            else:
+                rule_enforcement = self.get_enforcement_detail(enforcement.id)
+                # When rule failures have jinja expressions in it those have to be escaped so
+                # mistral does not attempt to render the jinja expression as a template.
+                rule_fail_reason = rule_enforcement.failure_reason
+                # W605 = invalid escape sequence flake8 error that we want to ignore
+                escape_beggining_bracket = \
+                    rule_fail_reason.replace('{{', '\{\{')  # noqa: W605
+                escape_ending_bracket = \
+                    escape_beggining_bracket.replace('}}', '\}\}')  # noqa: W605
 
-                    self.dispatch_trigger(st2_rule_name=enforcement.rule['ref'],
-                                          st2_server=self.st2_fqdn,
-                                          st2_comments=escape_ending_bracket,
-                                          st2_enforcement_id=enforcement.id)
-                    return False
+                self.dispatch_trigger(st2_rule_name=enforcement.rule['ref'],
+                                      st2_server=self.st2_fqdn,
+                                      st2_comments=escape_ending_bracket,
+                                      st2_enforcement_id=enforcement.id,
+                                      st2_error_message=rule_fail_reason)
+                return False
 
         # If a enforcement could not be found within the time this run to say that the
         # Job is not running. This solves the condition where the st2 config was changed
@@ -202,7 +1195,9 @@ class CronSensor(PollingSensor):
                          st2_execution_id="",
                          st2_comments="",
                          st2_enforcement_id=None,
-                         st2_state="error"):
+                         st2_state="error",
+                         st2_execution_status=None,
+                         st2_error_message=None):
         previous_state = self._get_previous_state(st2_rule_name)
 
         trigger_payload = {
@@ -215,26 +1210,28 @@ class CronSensor(PollingSensor):
 
         enhanced_trigger_payload = trigger_payload.copy()
         enhanced_trigger_payload['st2_previous_state'] = previous_state
+        enhanced_trigger_payload['st2_error_category'] = ""
 
         if st2_state == "success":
-            self._sensor_service.dispatch(trigger=self.trigger_ref, payload=trigger_payload)
-            self._sensor_service.dispatch(trigger=self.enhanced_trigger_ref,
-                                          payload=enhanced_trigger_payload)
+            self._dispatch_rule_event(trigger_payload, enhanced_trigger_payload)
+            self.metrics.inc_counter('rules.dispatched')
+            self._set_rule_state(st2_rule_name, st2_enforcement_id, st2_state)
             return True
 
         if self.check_before_dispatch(st2_rule_name, st2_enforcement_id):
             self._logger.info("Sending trigger with payload: {0}".format(trigger_payload))
             self._logger.info("Sending enhanced trigger with previous state: {0}".format(
                 previous_state))
+            # Only classified when dispatched, it can take a request for the execution
+            enhanced_trigger_payload['st2_error_category'] = self._classify_error(
+                st2_execution_id, st2_execution_status, st2_error_message)
 
-            self._sensor_service.dispatch(trigger=self.trigger_ref, payload=trigger_payload)
-            self._sensor_service.dispatch(trigger=self.enhanced_trigger_ref,
-                                          payload=enhanced_trigger_payload)
+            self._dispatch_rule_event(trigger_payload, enhanced_trigger_payload)
+            self.metrics.inc_counter('rules.dispatched')
 
-            if st2_enforcement_id:
-                self.kv_enforcements[st2_rule_name] = st2_enforcement_id
-            else:
-                self.kv_enforcements[st2_rule_name] = "error without enforcement id"
+            self._set_rule_state(st2_rule_name,
+                                 st2_enforcement_id or ERROR_WITHOUT_ENFORCEMENT_ID,
+                                 st2_state)
 
         else:
             self._logger.info("Already dispatched trigger. Waiting till another enforcement before"
@@ -242,15 +1239,44 @@ class CronSensor(PollingSensor):
 
         return True
 
+    def _dispatch_rule_event(self, trigger_payload, enhanced_trigger_payload):
+        """ Dispatches the per-rule triggers, or queues the event for the digest """
+        if self.trigger_mode == TRIGGER_MODE_DIGEST:
+            event = enhanced_trigger_payload.copy()
+            del event['st2_server']
+            self.digest_events.append(event)
+            return
+
+        self._sensor_service.dispatch(trigger=self.trigger_ref, payload=trigger_payload)
+        self._sensor_service.dispatch(trigger=self.enhanced_trigger_ref,
+                                      payload=enhanced_trigger_payload)
+        self.metrics.inc_counter('triggers.emitted', 2)
+
+    def dispatch_digest(self):
+        """ Dispatches the events queued during the poll as digest triggers of at most
+        digest_max_events events each
+        """
+        events, self.digest_events = self.digest_events, []
+        for start in range(0, len(events), self.digest_max_events):
+            batch = events[start:start + self.digest_max_events]
+            self._logger.info("Sending digest trigger with {0} events".format(len(batch)))
+            self._sensor_service.dispatch(trigger=self.digest_trigger_ref, payload={
+                'st2_server': self.st2_fqdn,
+                'st2_event_count': len(batch),
+                'st2_events': batch
+            })
+            self.metrics.inc_counter('triggers.emitted')
+
     def check_before_dispatch(self, st2_rule_name, st2_enforcement_id):
         """ Checks the key value object to see if it already exists
         If it does then we return false saying that it does not need to
         Sent to servicenow again.
         """
         if st2_rule_name in self.kv_enforcements:
-            if st2_enforcement_id and st2_enforcement_id == self.kv_enforcements[st2_rule_name]:
+            enforcement_id = self.kv_enforcements[st2_rule_name].get('enforcement_id')
+            if st2_enforcement_id and st2_enforcement_id == enforcement_id:
                 return False
-            elif self.kv_enforcements[st2_rule_name] == "error without enforcement id":
+            elif enforcement_id == ERROR_WITHOUT_ENFORCEMENT_ID:
                 return False
 
         return True
@@ -258,43 +1284,37 @@ class CronSensor(PollingSensor):
     def delete_from_kv(self, rule_name):
         if rule_name in self.kv_enforcements:
             del self.kv_enforcements[rule_name]
+            self.state_updated.pop(rule_name, None)
+            self._mark_dirty(rule_name)
 
         return self.kv_enforcements
 
     def get_cron_rules(self):
         """ Gets all the enabled rules that are of type 'core.st2.CronTimer'
         """
+        self.count_api_call('rules.query')
         enabled_rules = self.st2_client.rules.query(enabled=True)
 
         cron_rules = []
         for rule in enabled_rules:
-            if rule.trigger['type'] == "core.st2.CronTimer":
+            if rule.trigger['type'] == CRON_TIMER_TRIGGER_TYPE:
                 cron_rules.append(rule)
 
         return cron_rules
 
+    def load_cron_rules(self, now):
+        """ Returns the cron rules from the in-memory catalogue. The catalogue is
+        downloaded again every rule_refresh_interval seconds, every poll when 0.
+        """
+        if (self.cron_rules is None or
+                now - self.cron_rules_loaded_at >= self.rule_refresh_interval):
+            self.cron_rules = dict((rule.ref, rule) for rule in self.get_cron_rules())
+            self.cron_rules_loaded_at = now
+        return list(self.cron_rules.values())
+
     def convert_to_crontab(self, st2_cron):
-        """ Converts Stackstorm cron information to standard crontab
-        If day of the week is an integer covert it to the correct
-        integer as stackstorm starts the week on monday where
-        cron tab starts on Sunday
-        https://docs.stackstorm.com/rules.html#core-st2-crontimer
-        """
-        day_of_week = st2_cron.get('day_of_week', '*')
-        if isinstance(day_of_week, int):
-            day_of_week = STACKSTORM_TO_CRONTAB_DAYS[day_of_week]
-
-        cron_tab = [
-            str(st2_cron.get('second', '*')),
-            str(st2_cron.get('minute', '*')),
-            str(st2_cron.get('hour', '*')),
-            str(st2_cron.get('day', '*')),
-            str(st2_cron.get('month', '*')),
-            str(day_of_week),
-            str(st2_cron.get('year', '*'))
-        ]
-
-        return " ".join(cron_tab)
+        """ Converts Stackstorm cron information to standard crontab """
+        return convert_to_crontab(st2_cron)
 
     def _migrate_kv_format(self, kv_data):
         """ Migrates old key-value format to new enhanced format
@@ -314,14 +1334,40 @@ class CronSensor(PollingSensor):
                 }
         return migrated_data
 
+    def _classify_error(self, st2_execution_id="", st2_execution_status=None,
+                        st2_error_message=None):
+        """ Returns the category of an error event. Timed out executions are timeouts,
+        other failed executions are classified by the error in their result and rule
+        failures by the enforcement's failure reason. Missed runs are unknown.
+        """
+        if st2_execution_status == LIVEACTION_STATUS_TIMED_OUT:
+            return TIMEOUT_CATEGORY
+        if st2_error_message is None and st2_execution_status in ERRORED_STATUSES:
+            st2_error_message = self.get_execution_error(st2_execution_id)
+        return self.classifier.classify(st2_error_message or "")
+
     def _get_previous_state(self, rule_name):
         """ Gets the previous state for a rule """
-        if rule_name in self._migrated_kv:
-            return self._migrated_kv[rule_name].get('previous_state', 'unknown')
+        if rule_name in self.kv_enforcements:
+            return self.kv_enforcements[rule_name].get('previous_state', 'unknown')
         return 'unknown'
 
+    def _set_rule_state(self, rule_name, enforcement_id, state):
+        """ Records the last enforcement and state dispatched for a rule """
+        rule_state = {'enforcement_id': enforcement_id, 'previous_state': state}
+        if self.kv_enforcements.get(rule_name) != rule_state:
+            self.kv_enforcements[rule_name] = rule_state
+            self.state_updates += 1
+            self.state_updated[rule_name] = self.state_updates
+            self._mark_dirty(rule_name)
+
     def cleanup(self):
-        pass
+        if self.cluster_executor is not None:
+            self.cluster_executor.shutdown(wait=False)
+
+    # The sensor container only calls the trigger hooks for the sensor's own trigger
+    # types, never for CronTimer triggers, so rule changes are only picked up by the
+    # periodic download of the cron rules
 
     def add_trigger(self, trigger):
         pass
@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import datetime
+import os
+import sys
+import threading
+import time
+
+# The stream sensor shares the CronSensor checks, which live next to this file
+SENSORS_PATH = os.path.abspath(os.path.dirname(__file__))
+if SENSORS_PATH not in sys.path:
+    sys.path.append(SENSORS_PATH)
+
+from cron_sensor import CachedEnforcement  # noqa: E402
+from cron_sensor import CronSensor  # noqa: E402
+from cron_sensor import TRIGGER_MODE_DIGEST  # noqa: E402
+from cron_sensor import UTC  # noqa: E402
+from lib.sse import DEFAULT_TIMEOUT  # noqa: E402
+from lib.sse import open_stream  # noqa: E402
+from lib.statuses import UNFINISHED_STATUSES  # noqa: E402
+
+__all__ = [
+    'CronStreamSensor'
+]
+
+# Stream event sent by st2 every time an execution changes
+EXECUTION_UPDATE_EVENT = "st2.execution__update"
+
+# Stream event sent by st2 for every rule enforcement, the only event of an enforcement
+# that failed before starting an execution
+ENFORCEMENT_CREATE_EVENT = "st2.ruleenforcement__create"
+
+STREAM_EVENTS = [EXECUTION_UPDATE_EVENT, ENFORCEMENT_CREATE_EVENT]
+
+# Seconds to wait before connecting again after the stream failed or closed
+DEFAULT_STREAM_RECONNECT_DELAY = 10
+
+
+class CronStreamSensor(CronSensor):
+    """ Checks the cron rules as their executions finish instead of on every poll. The
+    sensor subscribes to the execution updates and rule enforcements of the st2 stream
+    and checks a rule as soon as its execution reaches a final status or its
+    enforcement fails. The poll only runs every poll_interval to find the rules that
+    did not run, which no stream event reports.
+    """
+
+    def __init__(self, sensor_service, config=None, poll_interval=None):
+        super(CronStreamSensor, self).__init__(sensor_service=sensor_service,
+                                               config=config,
+                                               poll_interval=poll_interval)
+        self.stream_url = self._get_option('stream_url')
+        self.stream_verify_ssl = self._get_option('stream_verify_ssl', True)
+        self.stream_timeout = self._get_option('stream_timeout', DEFAULT_TIMEOUT)
+        self.stream_reconnect_delay = self._get_option('stream_reconnect_delay',
+                                                       DEFAULT_STREAM_RECONNECT_DELAY)
+        # The stream is the local cluster's, the clusters option only applies to CronSensor
+        self.cluster_configs = []
+        # Events and polls both update the rule states so they take turns
+        self.lock = threading.RLock()
+        self.state_loaded = False
+        self.listener = None
+        self._stopped = threading.Event()
+
+    def setup(self):
+        super(CronStreamSensor, self).setup()
+        if not self.stream_url:
+            self.stream_url = "https://{}/stream/v1/stream".format(self.st2_fqdn)
+
+        self.listener = threading.Thread(target=self.listen, name="cron-stream")
+        self.listener.daemon = True
+        self.listener.start()
+
+    def cleanup(self):
+        self._stopped.set()
+
+    def get_stream_headers(self):
+        """ Authenticates to the stream with the token or api key of the st2 client, or
+        the ones the sensor container passes in the environment
+        """
+        headers = {}
+        token = getattr(self.st2_client, 'token', None) or os.environ.get('ST2_AUTH_TOKEN')
+        api_key = getattr(self.st2_client, 'api_key', None) or os.environ.get('ST2_API_KEY')
+        if token:
+            headers['X-Auth-Token'] = token
+        elif api_key:
+            headers['St2-Api-Key'] = api_key
+        return headers
+
+    def listen(self):
+        """ Reads the stream until cleanup, connecting again whenever it fails """
+        while not self._stopped.is_set():
+            try:
+                self.listen_once()
+            except Exception as e:  # pylint: disable=broad-except
+                self._logger.warning("Cron event stream failed: {0}".format(e))
+            self._stopped.wait(self.stream_reconnect_delay)
+
+    def listen_once(self):
+        """ Handles the events of one stream connection until the server closes it
+        :returns: the number of events handled
+        """
+        url = "{0}?events={1}".format(self.stream_url, ','.join(STREAM_EVENTS))
+        self._logger.info("Listening for cron executions on {0}".format(url))
+        handled = 0
+        for event in open_stream(url, headers=self.get_stream_headers(),
+                                 timeout=self.stream_timeout,
+                                 verify_ssl=self.stream_verify_ssl):
+            if self._stopped.is_set():
+                break
+            if event.event not in STREAM_EVENTS:
+                continue
+            try:
+                data = event.json()
+            except ValueError:
+                self._logger.warning("Ignoring malformed stream event: {0}".format(event.data))
+                continue
+            if event.event == EXECUTION_UPDATE_EVENT and self.handle_execution(data):
+                self.metrics.inc_counter('stream.executions')
+                handled += 1
+            elif event.event == ENFORCEMENT_CREATE_EVENT and self.handle_enforcement(data):
+                self.metrics.inc_counter('stream.enforcements')
+                handled += 1
+        return handled
+
+    def poll(self):
+        with self.lock:
+            super(CronStreamSensor, self).poll()
+            self.state_loaded = True
+
+    def get_event_window(self, rule_ref, utc_date_time):
+        """ Returns the cron window of the rule of a stream event, or None when it is not
+        a cron rule checked by this node
+        """
+        self.load_cron_rules(time.time())
+        rule = self.cron_rules.get(rule_ref)
+        if rule is None or not self._owns_event_rule(rule_ref):
+            return None
+        schedule = self.schedules.get(rule.ref, rule.trigger['parameters'])
+        return schedule.window(utc_date_time)
+
+    def _owns_event_rule(self, rule_ref):
+        return not (self.partitioning and self.hash_ring is not None and
+                    self.hash_ring.get_node(rule_ref) != self.node_id)
+
+    def start_event_check(self):
+        """ Loads the state on the first event and resets the caches of the last check """
+        if not self.state_loaded:
+            self.kv_enforcements = self.load_state()
+            self.state_loaded = True
+
+        self.execution_statuses = {}
+        self.execution_errors = {}
+        self.enforcement_details = {}
+        self.enforcement_indexes = {}
+
+    def finish_event_check(self, rule_ref, enforcements, previous_cron_dt, next_cron_dt):
+        if self.check_enforcements(enforcements, previous_cron_dt, next_cron_dt):
+            self.delete_from_kv(rule_ref)
+
+        if self.trigger_mode == TRIGGER_MODE_DIGEST:
+            self.dispatch_digest()
+        self.save_state()
+
+    def handle_execution(self, execution):
+        """ Checks the cron rule of a finished execution the same way a poll would
+        :returns: True if the execution belonged to a cron rule and was checked
+        """
+        rule_ref = (execution.get('rule') or {}).get('ref')
+        status = execution.get('status')
+        if not rule_ref or not status or status in UNFINISHED_STATUSES:
+            return False
+
+        with self.lock:
+            window = self.get_event_window(rule_ref, datetime.datetime.now(UTC))
+            if window is None:
+                return False
+            previous_cron_dt, next_cron_dt = window
+
+            self.count_api_call('ruleenforcements.query')
+            enforcements = self.st2_client.ruleenforcements.query(execution=execution['id'])
+            if self.find_enforcement(enforcements, previous_cron_dt, next_cron_dt) is None:
+                # Late events of older runs would otherwise be reported as missed runs
+                return False
+
+            self.start_event_check()
+            # The event already has the final status, no need to ask the API for it
+            self.set_execution_status(execution['id'], status)
+            if 'result' in execution:
+                self.execution_errors[execution['id']] = self._get_result_error(
+                    execution['result'])
+
+            self._logger.info("Checking execution {0} of rule: {1}".format(
+                execution['id'], rule_ref))
+            self.finish_event_check(rule_ref, enforcements, previous_cron_dt, next_cron_dt)
+        return True
+
+    def handle_enforcement(self, enforcement):
+        """ Checks the cron rule of an enforcement that failed without starting an
+        execution, which sends no execution update
+        :returns: True if the enforcement belonged to a cron rule and was checked
+        """
+        rule_ref = (enforcement.get('rule') or {}).get('ref')
+        if (not rule_ref or enforcement.get('execution_id') or
+                not enforcement.get('failure_reason') or not enforcement.get('enforced_at')):
+            return False
+
+        with self.lock:
+            window = self.get_event_window(rule_ref, datetime.datetime.now(UTC))
+            if window is None:
+                return False
+            previous_cron_dt, next_cron_dt = window
+
+            enforcements = [CachedEnforcement({'id': enforcement['id'],
+                                               'enforced_at': enforcement['enforced_at'],
+                                               'rule_ref': rule_ref})]
+            if self.find_enforcement(enforcements, previous_cron_dt, next_cron_dt) is None:
+                return False
+
+            self.start_event_check()
+            # The event already has the failure reason, no need to ask the API for it
+            enforcements[0].failure_reason = enforcement['failure_reason']
+            self.enforcement_details[enforcement['id']] = enforcements[0]
+
+            self._logger.info("Checking failed enforcement {0} of rule: {1}".format(
+                enforcement['id'], rule_ref))
+            self.finish_event_check(rule_ref, enforcements, previous_cron_dt, next_cron_dt)
+        return True
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from st2reactor.sensor.base import Sensor
+import os
+import socket
+import sys
+
+# The worker runs the pack's actions so we need the actions directory on the path
+ACTIONS_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'actions'))
+if ACTIONS_PATH not in sys.path:
+    sys.path.append(ACTIONS_PATH)
+
+from analyze_execution_timing import AnalyzeExecutionTiming  # noqa: E402
+from build_execution_tree import BuildExecutionTree  # noqa: E402
+from cron_sla_report import CronSlaReport  # noqa: E402
+from execution_find_error_results import ExecutionFindErrorResults  # noqa: E402
+from get_formatted_error import GetFormattedError  # noqa: E402
+from query_error_index import QueryErrorIndex  # noqa: E402
+from lib.worker import ErrorWorkerServer  # noqa: E402
+from lib.worker import get_worker_config  # noqa: E402
+
+__all__ = [
+    'ErrorWorkerSensor'
+]
+
+WORKER_ACTIONS = {
+    'analyze_execution_timing': AnalyzeExecutionTiming,
+    'build_execution_tree': BuildExecutionTree,
+    'cron_sla_report': CronSlaReport,
+    'execution_find_error_results': ExecutionFindErrorResults,
+    'get_formatted_error': GetFormattedError,
+    'query_error_index': QueryErrorIndex,
+}
+
+
+class ErrorWorkerSensor(Sensor):
+    """ Hosts the long-lived error worker inside the sensor container. The actions
+    forward their work to this process over a unix socket so they don't need to
+    import the st2 client and connect to the API on every invocation.
+    """
+
+    def __init__(self, sensor_service, config=None):
+        super(ErrorWorkerSensor, self).__init__(sensor_service=sensor_service,
+                                                config=config)
+        self._logger = self._sensor_service.get_logger(__name__)
+        self.server = None
+        self._serving = False
+
+    def setup(self):
+        worker_config = get_worker_config(self._config)
+        self.server = ErrorWorkerServer(worker_config['socket_path'],
+                                        WORKER_ACTIONS,
+                                        self._config,
+                                        st2_client_factory=self.create_st2_client)
+
+    def create_st2_client(self):
+        from st2client.client import Client
+
+        st2_url = "https://{}/".format(socket.getfqdn())
+        return Client(base_url=st2_url)
+
+    def run(self):
+        self._logger.info("Error worker listening on {0}".format(self.server.socket_path))
+        self._serving = True
+        self.server.serve_forever()
+
+    def cleanup(self):
+        if self.server:
+            # shutdown() blocks until serve_forever() returns so only call it once serving
+            if self._serving:
+                self.server.shutdown()
+                self._serving = False
+            self.server.server_close()
+
+    def add_trigger(self, trigger):
+        pass
+
+    def update_trigger(self, trigger):
+        pass
+
+    def remove_trigger(self, trigger):
+        pass
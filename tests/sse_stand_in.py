@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import json
+import threading
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:  # pragma: no cover (python 2)
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer  # pylint: disable=import-error
+
+__all__ = [
+    'SSEStandIn'
+]
+
+
+class _StreamHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.requests.append({'path': self.path, 'headers': dict(self.headers)})
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.end_headers()
+        self.wfile.write(self.server.body)
+        self.wfile.flush()
+
+    def log_message(self, *args):
+        pass
+
+
+class SSEStandIn(object):
+    """ Local stand in for the st2 stream API. Every connection receives the queued
+    events and is then closed.
+    """
+
+    def __init__(self):
+        self.server = HTTPServer(('127.0.0.1', 0), _StreamHandler)
+        self.server.requests = []
+        self.server.body = b''
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:{0}/stream".format(self.server.server_address[1])
+
+    @property
+    def requests(self):
+        return self.server.requests
+
+    def send(self, event, data):
+        if not isinstance(data, str):
+            data = json.dumps(data)
+        lines = ["event: {0}".format(event)]
+        lines.extend("data: {0}".format(line) for line in data.split('\n'))
+        self.server.body += ('\n'.join(lines) + '\n\n').encode('utf-8')
+
+    def send_raw(self, text):
+        self.server.body += text.encode('utf-8')
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
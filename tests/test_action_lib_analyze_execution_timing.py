@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from errors_base_action_test_case import ErrorsBaseActionTestCase
+
+from analyze_execution_timing import AnalyzeExecutionTiming
+from lib.base_action import BaseAction
+from st2common.runners.base_action import Action
+import mock
+
+__all__ = [
+    'TestAnalyzeExecutionTiming'
+]
+
+
+def mock_execution(execution_id, task_name, start, end, children=None, status='succeeded'):
+    """ start and end are seconds after 01:00:00 """
+    attributes = {
+        'id': execution_id,
+        'status': status,
+        'action': {'ref': 'test.' + task_name},
+        'context': {'orquesta': {'task_name': task_name}},
+        'start_timestamp': '2018-10-26T01:{0:02d}:{1:02d}.000000Z'.format(*divmod(start, 60)),
+        'end_timestamp': '2018-10-26T01:{0:02d}:{1:02d}.000000Z'.format(*divmod(end, 60))
+    }
+    if children is not None:
+        attributes['children'] = children
+    execution = mock.Mock(spec=list(attributes.keys()))
+    execution.configure_mock(**attributes)
+    return execution
+
+
+class TestAnalyzeExecutionTiming(ErrorsBaseActionTestCase):
+    __test__ = True
+    action_cls = AnalyzeExecutionTiming
+
+    def setUp(self):
+        super(TestAnalyzeExecutionTiming, self).setUp()
+        # root (0-100)
+        #   prepare (0-10)
+        #   build (10-90) subworkflow
+        #     vm_create (10-70)
+        #     dns (10-20)  runs in parallel with vm_create
+        #     vm_check (70-90)
+        #   notify (90-100)
+        self.executions = {
+            'prepare': mock_execution('prepare', 'prepare', 0, 10),
+            'build': mock_execution('build', 'build', 10, 90,
+                                    children=['vm_create', 'dns', 'vm_check']),
+            'vm_create': mock_execution('vm_create', 'vm_create', 10, 70),
+            'dns': mock_execution('dns', 'dns', 10, 20),
+            'vm_check': mock_execution('vm_check', 'vm_check', 70, 90),
+            'notify': mock_execution('notify', 'notify', 90, 100),
+        }
+        self.root = mock_execution('root', 'root', 0, 100,
+                                   children=['prepare', 'build', 'notify'])
+
+        mock_client = mock.Mock()
+        mock_client.executions.get_by_id.side_effect = lambda i: self.executions[i]
+        self.mock_client = mock_client
+
+    def test_init(self):
+        action = self.get_action_instance({})
+        self.assertIsInstance(action, AnalyzeExecutionTiming)
+        self.assertIsInstance(action, BaseAction)
+        self.assertIsInstance(action, Action)
+
+    def test_build_timing_tree(self):
+        action = self.get_action_instance({})
+        action.st2_client = self.mock_client
+
+        root = action.build_timing_tree(self.root, 'test.root', 0, 0)
+        self.assertEqual(root['total_time'], 100)
+        self.assertEqual(root['self_time'], 0)
+
+        build = root['children'][1]
+        self.assertEqual(build['name'], 'build')
+        self.assertEqual(build['depth'], 1)
+        self.assertEqual(build['total_time'], 80)
+        # vm_create and dns overlap so only 80 seconds are covered by children
+        self.assertEqual(build['self_time'], 0)
+
+    def test_build_timing_tree_running(self):
+        action = self.get_action_instance({})
+        execution = mock_execution('running', 'running', 0, 0, status='running')
+        execution.end_timestamp = None
+
+        node = action.build_timing_tree(execution, 'running', 0, 1540515630.0)
+        self.assertEqual(node['total_time'], 30)
+
+    def test_covered_time(self):
+        action = self.get_action_instance({})
+        nodes = [{'start': 0, 'end': 10}, {'start': 5, 'end': 15}, {'start': 20, 'end': 25}]
+        self.assertEqual(action.covered_time(nodes), 20)
+        self.assertEqual(action.covered_time([]), 0)
+
+    @mock.patch("lib.base_action.BaseAction.st2_client_initialize")
+    def test_run(self, mock_st2_client_initialize):
+        action = self.get_action_instance({})
+        action.st2_client = self.mock_client
+        mock_st2_client_initialize.return_value = self.root
+
+        result = action.run(st2_exe_id='root', top_n=2)
+
+        self.assertEqual(result['total_time'], 100)
+        self.assertEqual([t['name'] for t in result['critical_path']],
+                         ['prepare', 'build', 'vm_create', 'vm_check', 'notify'])
+        self.assertEqual([t['name'] for t in result['slowest_tasks']],
+                         ['vm_create', 'vm_check'])
+        self.assertEqual([t['name'] for t in result['slowest_workflows']], ['build'])
+        self.assertEqual(len(result['tasks']), 7)
+        self.assertEqual(result['tasks'][0]['start_timestamp'], '2018-10-26T01:00:00Z')
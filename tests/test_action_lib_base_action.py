@@ -15,8 +15,12 @@
 from errors_base_action_test_case import ErrorsBaseActionTestCase
 
 from lib.base_action import BaseAction
+from lib.worker import WorkerUnavailable
 from st2common.runners.base_action import Action
 import mock
+import os
+import subprocess
+import sys
 
 __all__ = [
     'TestBaseAction'
@@ -32,7 +36,13 @@ class TestBaseAction(ErrorsBaseActionTestCase):
         self.assertIsInstance(action, BaseAction)
         self.assertIsInstance(action, Action)
 
-    @mock.patch("lib.base_action.Client")
+    def test_import_is_lazy(self):
+        code = "import sys, lib.base_action; print('st2client' in sys.modules)"
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        output = subprocess.check_output([sys.executable, '-c', code], env=env)
+        self.assertEqual(output.strip(), b'False')
+
+    @mock.patch("st2client.client.Client")
     def test_st2_client_initialize(self, mock_client):
         action = self.get_action_instance({})
 
@@ -466,3 +476,84 @@ class TestBaseAction(ErrorsBaseActionTestCase):
         }
         result = action.get_error_message(test_error_result)
         self.assertEqual(result, expected_result)
+
+    @mock.patch("lib.base_action.BaseAction.run_local")
+    def test_run_with_worker_disabled(self, mock_run_local):
+        action = self.get_action_instance({})
+        mock_run_local.return_value = "local"
+
+        result = action.run_with_worker('get_formatted_error', st2_exe_id='1234')
+        self.assertEqual(result, "local")
+        mock_run_local.assert_called_with(st2_exe_id='1234')
+
+    @mock.patch("lib.base_action.forward")
+    @mock.patch("lib.base_action.BaseAction.run_local")
+    def test_run_with_worker(self, mock_run_local, mock_forward):
+        action = self.get_action_instance({'worker': {'enabled': True,
+                                                      'socket_path': '/tmp/test.sock'}})
+        mock_forward.return_value = "forwarded"
+
+        result = action.run_with_worker('get_formatted_error', st2_exe_id='1234')
+        self.assertEqual(result, "forwarded")
+        mock_forward.assert_called_with('/tmp/test.sock', 'get_formatted_error',
+                                        {'st2_exe_id': '1234'}, timeout=300)
+        mock_run_local.assert_not_called()
+
+    @mock.patch("lib.base_action.forward")
+    @mock.patch("lib.base_action.BaseAction.run_local")
+    def test_run_with_worker_fallback(self, mock_run_local, mock_forward):
+        action = self.get_action_instance({'worker': {'enabled': True}})
+        mock_forward.side_effect = WorkerUnavailable("down")
+        mock_run_local.return_value = "local"
+
+        result = action.run_with_worker('get_formatted_error', st2_exe_id='1234')
+        self.assertEqual(result, "local")
+
+    def test_collect_error_records(self):
+        action = self.get_action_instance({})
+        mock_context = {
+            'orquesta': {
+                'task_name': 'vsphere_check'
+            }
+        }
+        test_execution = mock.Mock(id='1234',
+                                   context=mock_context,
+                                   action={'ref': 'vsphere.vm_check'},
+                                   end_timestamp='2018-10-26T01:00:00.012345Z',
+                                   result={'stderr': 'test_error'})
+        action.child_error = [test_execution]
+
+        result = action.collect_error_records()
+        self.assertEqual(len(result), 1)
+        self.assertEqual(result[0]['task_name'], 'vsphere_check')
+        self.assertEqual(result[0]['action_ref'], 'vsphere.vm_check')
+        self.assertEqual(result[0]['execution_id'], '1234')
+        self.assertAlmostEqual(result[0]['timestamp'], 1540515600.012345)
+        self.assertEqual(result[0]['message'], 'test_error')
+
+    def test_collect_error_records_parent_custom_error(self):
+        action = self.get_action_instance({})
+        action.parent_error = mock.Mock(id='1234', context={}, action={'ref': 'test.wf'},
+                                        end_timestamp=None, result={})
+        action.errors_as_string = 'custom error'
+
+        result = action.collect_error_records()
+        self.assertEqual(result[0]['message'], 'custom error')
+        self.assertEqual(result[0]['task_name'], None)
+
+    def test_index_errors_disabled(self):
+        action = self.get_action_instance({})
+        action.child_error = [mock.Mock()]
+        self.assertEqual(action.index_errors(), 0)
+
+    @mock.patch("lib.error_index.ErrorIndex")
+    @mock.patch("lib.base_action.BaseAction.collect_error_records")
+    def test_index_errors(self, mock_collect_error_records, mock_error_index):
+        action = self.get_action_instance({'error_index': {'enabled': True,
+                                                           'path': '/tmp/test.sqlite'}})
+        mock_collect_error_records.return_value = [{'execution_id': '1234'}]
+        mock_error_index.return_value.add.return_value = 1
+
+        self.assertEqual(action.index_errors(), 1)
+        mock_error_index.assert_called_with('/tmp/test.sqlite', 7)
+        mock_error_index.return_value.add.assert_called_with([{'execution_id': '1234'}])
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from errors_base_action_test_case import ErrorsBaseActionTestCase
+
+from crontab import CronTab
+from lib import cron_schedule
+from lib.base_action import BaseAction
+import datetime
+import mock
+
+__all__ = [
+    'TestCronSchedule'
+]
+
+UTC = datetime.timezone.utc
+
+
+class TestCronSchedule(ErrorsBaseActionTestCase):
+    __test__ = True
+    action_cls = BaseAction
+
+    def test_convert_to_crontab(self):
+        test_dict = {
+            'day_of_week': 3,
+            'second': 0,
+            'minute': 30,
+            'hour': 1,
+        }
+
+        result_value = cron_schedule.convert_to_crontab(test_dict)
+        self.assertEqual(result_value, '0 30 1 * * 4 *')
+
+    def test_schedule_key(self):
+        first = cron_schedule.schedule_key({'hour': 1, 'minute': 0})
+        second = cron_schedule.schedule_key({'minute': 0, 'hour': 1})
+        third = cron_schedule.schedule_key({'minute': 0, 'hour': 2})
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, third)
+
+    def test_window(self):
+        schedule = cron_schedule.CronSchedule({'hour': 1, 'minute': 0, 'second': 0})
+        now = datetime.datetime(2018, 10, 26, 1, 30, tzinfo=UTC)
+
+        previous, next_run = schedule.window(now)
+        self.assertEqual(previous, datetime.datetime(2018, 10, 26, 1, 0, tzinfo=UTC))
+        self.assertEqual(next_run, datetime.datetime(2018, 10, 27, 1, 0, tzinfo=UTC))
+
+    def test_window_cached(self):
+        schedule = cron_schedule.CronSchedule({'hour': 1, 'minute': 0, 'second': 0})
+        schedule.window(datetime.datetime(2018, 10, 26, 1, 30, tzinfo=UTC))
+
+        with mock.patch.object(schedule, 'crontab') as mock_crontab:
+            previous, _ = schedule.window(datetime.datetime(2018, 10, 26, 12, 0, tzinfo=UTC))
+            self.assertEqual(previous, datetime.datetime(2018, 10, 26, 1, 0, tzinfo=UTC))
+            mock_crontab.previous.assert_not_called()
+            mock_crontab.next.assert_not_called()
+
+    def test_window_matches_crontab(self):
+        # Advancing the window poll by poll gives the same result as computing it
+        # from scratch every time
+        parameters = [
+            {'minute': '*/7', 'second': 0},
+            {'hour': 1, 'minute': 0, 'second': 0},
+            {'day_of_week': 3, 'hour': 12, 'minute': 15, 'second': 0},
+            {'second': '*/45'},
+        ]
+        for st2_cron in parameters:
+            schedule = cron_schedule.CronSchedule(st2_cron)
+            crontab = CronTab(cron_schedule.convert_to_crontab(st2_cron))
+            now = datetime.datetime(2018, 10, 26, 0, 0, 1, tzinfo=UTC)
+            for _ in range(500):
+                expected = (
+                    datetime.datetime.fromtimestamp(crontab.previous(now=now, delta=False), UTC),
+                    datetime.datetime.fromtimestamp(crontab.next(now=now, delta=False), UTC)
+                )
+                self.assertEqual(schedule.window(now), expected, (st2_cron, now))
+                now += datetime.timedelta(seconds=300)
+
+    def test_window_at_run_time(self):
+        schedule = cron_schedule.CronSchedule({'hour': 1, 'minute': 0, 'second': 0})
+        now = datetime.datetime(2018, 10, 26, 1, 0, tzinfo=UTC)
+
+        previous, next_run = schedule.window(now)
+        self.assertEqual(previous, now)
+        self.assertEqual(next_run, datetime.datetime(2018, 10, 27, 1, 0, tzinfo=UTC))
+        # The cached window is reused once the poll time moves past the run
+        self.assertEqual(schedule.window(now + datetime.timedelta(hours=1))[0], now)
+
+    def test_window_covers_every_run(self):
+        # Polls landing exactly on run times, fresh or advanced from the cached window,
+        # never skip a run
+        st2_cron = {'minute': '*/7', 'second': 0}
+        crontab = CronTab(cron_schedule.convert_to_crontab(st2_cron))
+        schedule = cron_schedule.CronSchedule(st2_cron)
+        start = datetime.datetime(2018, 10, 26, 0, 0, tzinfo=UTC)
+        checked = set()
+        for minute in range(600):
+            now = start + datetime.timedelta(minutes=minute)
+            previous, next_run = schedule.window(now)
+            self.assertTrue(previous <= now < next_run, now)
+            self.assertEqual(
+                (previous, next_run),
+                cron_schedule.CronSchedule(st2_cron).window(now), now)
+            checked.add(previous.timestamp())
+
+        run = crontab.next(now=start, delta=False)
+        runs = 0
+        while run < (start + datetime.timedelta(minutes=599)).timestamp():
+            self.assertIn(run, checked)
+            runs += 1
+            run = crontab.next(now=datetime.datetime.fromtimestamp(run, UTC), delta=False)
+        self.assertEqual(runs, 89)
+
+    def test_schedule_cache_invalidated(self):
+        cache = cron_schedule.ScheduleCache()
+        first = cache.get('test_rule', {'hour': 1})
+        self.assertIs(cache.get('test_rule', {'hour': 1}), first)
+        self.assertIsNot(cache.get('test_rule', {'hour': 2}), first)
+
+    def test_schedule_cache_prune(self):
+        cache = cron_schedule.ScheduleCache()
+        cache.get('rule_a', {'hour': 1})
+        cache.get('rule_b', {'hour': 1})
+
+        cache.prune(['rule_b'])
+        self.assertEqual(list(cache.schedules), ['rule_b'])
+        self.assertEqual(len(cache), 1)
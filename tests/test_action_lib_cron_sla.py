@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from errors_base_action_test_case import ErrorsBaseActionTestCase
+
+from crontab import CronTab
+from lib import cron_sla
+from lib.cron_schedule import convert_to_crontab
+from lib.cron_sla import CronSLA
+from lib.cron_sla import OUTCOME_FAILED
+from lib.cron_sla import OUTCOME_RUNNING
+from lib.cron_sla import OUTCOME_SUCCEEDED
+from lib.base_action import BaseAction
+import datetime
+import mock
+import unittest
+
+__all__ = [
+    'TestCronSLA'
+]
+
+
+UTC = datetime.timezone.utc
+START = datetime.datetime(2018, 10, 26, 1, 30, tzinfo=UTC).timestamp()
+
+
+def iterate_runs(st2_cron, start, end):
+    """ Run times the way CronSensor computes them, one CronTab.next() at a time """
+    crontab = CronTab(convert_to_crontab(st2_cron))
+    runs = []
+    now = datetime.datetime.fromtimestamp(start, UTC)
+    while True:
+        run = crontab.next(now=now, delta=False)
+        if run >= end:
+            return runs
+        runs.append(run)
+        now = datetime.datetime.fromtimestamp(run, UTC)
+
+
+class TestCronSLA(ErrorsBaseActionTestCase):
+    __test__ = True
+    action_cls = BaseAction
+
+    def test_expected_matches_crontab(self):
+        end = START + 40 * 86400
+        for st2_cron in [{'minute': 0, 'second': 0},
+                         {'hour': 1, 'minute': 0, 'second': 0},
+                         {'day_of_week': 0, 'hour': 1, 'minute': 0, 'second': 0},
+                         {'day': 'L', 'hour': 23, 'minute': 59, 'second': 59},
+                         {'day': 31, 'hour': 0, 'minute': 0, 'second': 0},
+                         {'minute': '*/7', 'second': 30},
+                         {'month': 2, 'hour': 0, 'minute': 0, 'second': 0}]:
+            sla = CronSLA(st2_cron, START, end)
+            self.assertEqual(sla.expected, len(iterate_runs(st2_cron, START, end)), st2_cron)
+
+    def test_period_bounds(self):
+        st2_cron = {'minute': 0, 'second': 0}
+        one_am = datetime.datetime(2018, 10, 26, 1, 0, tzinfo=UTC).timestamp()
+        # Runs at the start are included, runs at the end are not
+        self.assertEqual(CronSLA(st2_cron, one_am, one_am + 3600).expected, 1)
+        self.assertEqual(CronSLA(st2_cron, one_am + 0.5, one_am + 3600.5).expected, 1)
+        self.assertEqual(CronSLA(st2_cron, one_am + 1, one_am + 3600).expected, 0)
+
+    def test_slot_of(self):
+        sla = CronSLA({'hour': '1,13', 'minute': 0, 'second': 0}, START, START + 86400)
+        one_am = datetime.datetime(2018, 10, 26, 1, 0, tzinfo=UTC).timestamp()
+        self.assertEqual(sla.slot_of(one_am - 1), sla.slot_of(one_am) - 1)
+        self.assertEqual(sla.slot_of(one_am + 5.5), sla.slot_of(one_am))
+        self.assertEqual(sla.slot_of(one_am + 12 * 3600), sla.slot_of(one_am) + 1)
+        # Before the first run of the first day
+        self.assertEqual(sla.slot_of(one_am - 2 * 86400), -1)
+
+    @unittest.skipIf(cron_sla.numpy is None, "numpy is not installed")
+    def test_slots_of_matches_slot_of(self):
+        sla = CronSLA({'day_of_week': '0,2,4', 'hour': '1,13', 'minute': '*/20',
+                       'second': 0}, START, START + 10 * 86400)
+        epochs = [START - 86400 + i * 1234.5 for i in range(800)]
+        self.assertEqual(sla.slots_of(epochs).tolist(), [sla.slot_of(e) for e in epochs])
+
+    def test_summarize(self):
+        # Hourly runs from 02:00 to 05:00
+        sla = CronSLA({'minute': 0, 'second': 0}, START, START + 3 * 3600)
+        two_am = START + 1800
+        enforced_at = [two_am + 2,
+                       # Retried run, the newest enforcement decides
+                       two_am + 3600 + 1, two_am + 3600 + 30,
+                       # Run before the period
+                       START - 60]
+        outcomes = [OUTCOME_SUCCEEDED, OUTCOME_SUCCEEDED, OUTCOME_FAILED, OUTCOME_SUCCEEDED]
+        expected = {'expected': 3, 'ran': 2, 'missed': 1, 'succeeded': 1, 'failed': 1}
+        self.assertEqual(sla.summarize(enforced_at, outcomes), expected)
+        self.assertEqual(sla.summarize(list(reversed(enforced_at)),
+                                       list(reversed(outcomes))), expected)
+
+    def test_summarize_without_numpy(self):
+        sla = CronSLA({'minute': '*/5', 'second': 0}, START, START + 86400)
+        enforced_at = [START + 300 * i + 1 for i in range(0, 288, 2)]
+        outcomes = [(OUTCOME_SUCCEEDED, OUTCOME_FAILED, OUTCOME_RUNNING)[i % 3]
+                    for i in range(len(enforced_at))]
+        with_numpy = sla.summarize(enforced_at, outcomes)
+        with mock.patch.object(cron_sla, 'numpy', None):
+            self.assertEqual(sla.summarize(enforced_at, outcomes), with_numpy)
+        self.assertEqual(with_numpy, {'expected': 288, 'ran': 144, 'missed': 144,
+                                      'succeeded': 48, 'failed': 48})
+
+    def test_summarize_no_enforcements(self):
+        sla = CronSLA({'hour': 1, 'minute': 0, 'second': 0}, START, START + 7 * 86400)
+        self.assertEqual(sla.summarize([], []), {'expected': 7, 'ran': 0, 'missed': 7,
+                                                 'succeeded': 0, 'failed': 0})
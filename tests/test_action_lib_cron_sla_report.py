@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from errors_base_action_test_case import ErrorsBaseActionTestCase
+
+from cron_sla_report import CronSlaReport
+from lib.base_action import BaseAction
+from st2common.runners.base_action import Action
+import mock
+
+__all__ = [
+    'TestCronSlaReport'
+]
+
+HOURLY = {'type': 'core.st2.CronTimer', 'parameters': {'minute': 0, 'second': 0}}
+DAILY = {'type': 'core.st2.CronTimer', 'parameters': {'hour': 1, 'minute': 0, 'second': 0}}
+
+
+def mock_enforcement(rule_ref, enforced_at, execution_id=None):
+    attributes = {'rule': {'ref': rule_ref}, 'enforced_at': enforced_at}
+    if execution_id:
+        attributes['execution_id'] = execution_id
+    enforcement = mock.Mock(spec=list(attributes.keys()))
+    enforcement.configure_mock(**attributes)
+    return enforcement
+
+
+class TestCronSlaReport(ErrorsBaseActionTestCase):
+    __test__ = True
+    action_cls = CronSlaReport
+
+    def test_init(self):
+        action = self.get_action_instance({})
+        self.assertIsInstance(action, CronSlaReport)
+        self.assertIsInstance(action, BaseAction)
+        self.assertIsInstance(action, Action)
+
+    def get_client(self, enforcements, executions, page_size=2):
+        client = mock.MagicMock()
+        client.rules.query.return_value = [
+            mock.Mock(ref='test.hourly', trigger=HOURLY),
+            mock.Mock(ref='test.daily', trigger=DAILY),
+            mock.Mock(ref='test.webhook', trigger={'type': 'core.st2.webhook'}),
+        ]
+
+        def pages(items):
+            def query(limit, offset, **filters):
+                return items[offset:offset + limit]
+            return query
+
+        client.ruleenforcements.query.side_effect = pages(enforcements)
+        client.liveactions.query.side_effect = pages(executions)
+        return client
+
+    def test_run_local(self):
+        action = self.get_action_instance({})
+        enforcements = [
+            mock_enforcement('test.hourly', '2018-10-26T03:00:01.000000Z', 'e3'),
+            mock_enforcement('test.hourly', '2018-10-26T02:00:00.500000Z', 'e2'),
+            # Rule failed to run its action
+            mock_enforcement('test.hourly', '2018-10-26T00:00:01.000000Z'),
+            mock_enforcement('test.daily', '2018-10-26T01:00:02.000000Z', 'd1'),
+        ]
+        executions = [mock.Mock(id='e3', status='running'),
+                      mock.Mock(id='e2', status='failed'),
+                      mock.Mock(id='other', status='succeeded'),
+                      mock.Mock(id='d1', status='succeeded')]
+        action.st2_client = self.get_client(enforcements, executions)
+
+        # 23:00 to 03:00 plus the grace period
+        result = action.run_local(hours=4, until='2018-10-26T03:01:00Z', grace_period=60)
+
+        self.assertEqual(result['since'], '2018-10-25T23:00:00Z')
+        self.assertEqual(result['until'], '2018-10-26T03:00:00Z')
+        self.assertEqual(result['rules'], [
+            {'rule_ref': 'test.daily', 'expected': 1, 'ran': 1, 'missed': 0,
+             'succeeded': 1, 'failed': 0},
+            {'rule_ref': 'test.hourly', 'expected': 4, 'ran': 2, 'missed': 2,
+             'succeeded': 0, 'failed': 2},
+        ])
+        self.assertEqual(result['totals'], {'expected': 5, 'ran': 3, 'missed': 2,
+                                            'succeeded': 1, 'failed': 2})
+        action.st2_client.ruleenforcements.query.assert_any_call(
+            limit=100, offset=0, enforced_at_gt='2018-10-25T23:00:00.000000Z',
+            enforced_at_lt='2018-10-26T03:01:00.000000Z')
+        # Only the executions started by cron rules
+        action.st2_client.liveactions.query.assert_any_call(
+            limit=100, offset=0, timestamp_gt='2018-10-25T22:59:00.000000Z',
+            timestamp_lt='2018-10-26T03:01:00.000000Z', trigger_type='core.st2.CronTimer',
+            include_attributes='id,status')
+
+    def test_run_local_rule_refs(self):
+        action = self.get_action_instance({})
+        action.st2_client = self.get_client([], [])
+        result = action.run_local(hours=24, until='2018-10-27T00:00:00Z', grace_period=0,
+                                  rule_refs=['test.daily'])
+        self.assertEqual(result['rules'], [
+            {'rule_ref': 'test.daily', 'expected': 1, 'ran': 0, 'missed': 1,
+             'succeeded': 0, 'failed': 0}])
+        # No executions to look up
+        self.assertFalse(action.st2_client.liveactions.query.called)
+
+    def test_get_execution_statuses_stops_when_found(self):
+        action = self.get_action_instance({})
+        executions = [mock.Mock(id='e{0}'.format(i), status='succeeded') for i in range(10)]
+        action.st2_client = self.get_client([], executions)
+        statuses = action.get_execution_statuses(['e0', 'e2'], 0, 3600, page_size=2)
+        self.assertEqual(statuses, {'e0': 'succeeded', 'e2': 'succeeded'})
+        self.assertEqual(action.st2_client.liveactions.query.call_count, 2)
+
+    def test_run_local_invalid_until(self):
+        action = self.get_action_instance({})
+        action.st2_client = self.get_client([], [])
+        with self.assertRaises(ValueError):
+            action.run_local(until='yesterday')
+
+    @mock.patch('cron_sla_report.CronSlaReport.run_with_worker')
+    def test_run(self, mock_run_with_worker):
+        action = self.get_action_instance({})
+        action.run(hours=24)
+        mock_run_with_worker.assert_called_with('cron_sla_report', hours=24)
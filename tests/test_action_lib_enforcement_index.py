@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from errors_base_action_test_case import ErrorsBaseActionTestCase
+
+from lib.enforcement_index import EnforcementIndex
+from lib.base_action import BaseAction
+import mock
+
+__all__ = [
+    'TestEnforcementIndex'
+]
+
+
+def enforcement(enforcement_id, enforced_at):
+    return mock.Mock(id=enforcement_id, enforced_at=enforced_at)
+
+
+class TestEnforcementIndex(ErrorsBaseActionTestCase):
+    __test__ = True
+    action_cls = BaseAction
+
+    def test_empty(self):
+        index = EnforcementIndex([])
+        self.assertEqual(len(index), 0)
+        self.assertIsNone(index.latest())
+        self.assertIsNone(index.latest_between(0, 2000000000))
+
+    def test_sorted_regardless_of_api_order(self):
+        enforcements = [enforcement('b', '2018-10-26T02:00:00.000Z'),
+                        enforcement('c', '2018-10-26T03:00:00.000Z'),
+                        enforcement('a', '2018-10-26T01:00:00.000Z')]
+        index = EnforcementIndex(enforcements)
+        self.assertEqual([e.id for e in index.enforcements], ['a', 'b', 'c'])
+        self.assertEqual(index.latest().id, 'c')
+        self.assertEqual(EnforcementIndex(list(reversed(enforcements))).latest().id, 'c')
+
+    def test_latest_between(self):
+        index = EnforcementIndex([enforcement('a', '2018-10-26T01:00:00.000Z'),
+                                  enforcement('b', '2018-10-26T02:00:00.500Z')])
+        one_am = 1540515600
+        self.assertEqual(index.latest_between(one_am, one_am + 7200).id, 'b')
+        # Fractions of a second are ignored, like the windows
+        self.assertEqual(index.latest_between(one_am, one_am + 3600).id, 'b')
+        self.assertEqual(index.latest_between(one_am, one_am + 3599).id, 'a')
+        self.assertEqual(index.latest_between(one_am, one_am).id, 'a')
+        self.assertIsNone(index.latest_between(one_am + 1, one_am + 3599))
+        self.assertIsNone(index.latest_between(0, one_am - 1))
+
+    def test_ties_keep_api_order(self):
+        index = EnforcementIndex([enforcement('first', '2018-10-26T01:00:00.000Z'),
+                                  enforcement('second', '2018-10-26T01:00:00.000Z')])
+        self.assertEqual(index.latest().id, 'first')
+
+    def test_malformed_timestamps_skipped(self):
+        index = EnforcementIndex([enforcement('a', 'bad'),
+                                  enforcement('b', '2018-10-26T01:00:00.000Z')])
+        self.assertEqual(len(index), 1)
+        self.assertEqual(index.latest().id, 'b')
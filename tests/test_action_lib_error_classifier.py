@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from errors_base_action_test_case import ErrorsBaseActionTestCase
+
+from lib import error_classifier
+from lib.base_action import BaseAction
+import re
+
+__all__ = [
+    'TestErrorClassifier'
+]
+
+
+class TestErrorClassifier(ErrorsBaseActionTestCase):
+    __test__ = True
+    action_cls = BaseAction
+
+    def test_classify_defaults(self):
+        classifier = error_classifier.ErrorClassifier()
+        test_messages = {
+            'Execution timed out after 600 seconds': 'timeout',
+            'HTTP 401 Client Error: Unauthorized': 'auth_failure',
+            'ssh: connect to host 10.0.0.1 port 22: No route to host': 'host_unreachable',
+            'Connection refused': 'network',
+            "UndefinedError: 'dict object' has no attribute 'vm'": 'jinja_yaql',
+            'Quota exceeded for instances': 'quota',
+            'VM with the name=test.example.com already exists': 'unknown',
+            '': 'unknown'
+        }
+
+        for message, category in test_messages.items():
+            self.assertEqual(classifier.classify(message), category, message)
+
+    def test_classify_leftmost_match(self):
+        classifier = error_classifier.ErrorClassifier([('a', ['second']), ('b', ['first'])])
+        self.assertEqual(classifier.classify('first then second'), 'b')
+
+    def test_classify_patterns_with_groups(self):
+        classifier = error_classifier.ErrorClassifier([('a', [r'(foo|bar)baz']),
+                                                       ('b', [r'(x(y)z)'])])
+        self.assertEqual(classifier.classify('barbaz'), 'a')
+        self.assertEqual(classifier.classify('xyz'), 'b')
+        self.assertEqual(classifier.classify('foo'), 'unknown')
+
+    def test_classify_literals_share_trie(self):
+        classifier = error_classifier.ErrorClassifier([('a', ['vm exists', 'vm missing']),
+                                                       ('b', ['VM Exists', 'vmware'])])
+        self.assertEqual(classifier.literals, {'vm exists': 'a',
+                                               'vm missing': 'a',
+                                               'vmware': 'b'})
+        self.assertEqual(classifier.classify('The VM EXISTS already'), 'a')
+        self.assertEqual(classifier.classify('vmware tools not running'), 'b')
+
+    def test_trie_pattern(self):
+        pattern = error_classifier._trie_pattern(['timed out', 'timeout', 'time'])
+        for literal in ['timed out', 'timeout', 'time']:
+            self.assertTrue(re.match('(?:{0})$'.format(pattern), literal), literal)
+        self.assertFalse(re.match('(?:{0})$'.format(pattern), 'timed'))
+
+    def test_classify_no_categories(self):
+        classifier = error_classifier.ErrorClassifier([])
+        self.assertEqual(classifier.classify('timeout'), 'unknown')
+
+    def test_classify_same_position_first_category(self):
+        # A literal of a later category doesn't win over a regex of an earlier one
+        classifier = error_classifier.ErrorClassifier([('a', [r'conn\w+']),
+                                                       ('b', ['connection'])])
+        self.assertEqual(classifier.classify('connection refused'), 'a')
+        classifier = error_classifier.ErrorClassifier([('a', ['connection']),
+                                                       ('b', [r'conn\w+'])])
+        self.assertEqual(classifier.classify('connection refused'), 'a')
+
+    def test_invalid_pattern(self):
+        with self.assertRaisesRegex(ValueError, "'\\(unclosed' of error category a"):
+            error_classifier.ErrorClassifier([('a', ['(unclosed'])])
+
+    def test_get_classifier_config(self):
+        config = {
+            'error_classification': {
+                'categories': {
+                    'timeout': ['took too long'],
+                    'vsphere': ['already exists in vsphere']
+                }
+            }
+        }
+
+        categories = error_classifier.get_classifier_config(config)
+        self.assertEqual(categories[0], ('timeout', ['took too long']))
+        self.assertEqual(categories[-1], ('vsphere', ['already exists in vsphere']))
+        self.assertEqual(len(categories), len(error_classifier.DEFAULT_CATEGORIES) + 1)
+
+    def test_get_classifier_config_replace_defaults(self):
+        config = {'error_classification': {'replace_defaults': True,
+                                           'categories': {'vsphere': ['vsphere']}}}
+
+        categories = error_classifier.get_classifier_config(config)
+        self.assertEqual(categories, [('vsphere', ['vsphere'])])
+
+    def test_get_classifier_cached(self):
+        first = error_classifier.get_classifier({})
+        second = error_classifier.get_classifier({})
+        self.assertIs(first, second)
+
+    def test_classify_error(self):
+        action = self.get_action_instance({})
+        self.assertEqual(action.classify_error('Connection reset by peer'), 'network')
+        self.assertEqual(action.classify_error({'error': 'timeout'}), 'timeout')
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from errors_base_action_test_case import ErrorsBaseActionTestCase
+
+from lib import error_index
+from lib.base_action import BaseAction
+import os
+import shutil
+import tempfile
+import time
+
+__all__ = [
+    'TestErrorIndex'
+]
+
+NOW = 1540515600.0  # 2018-10-26T01:00:00Z
+
+
+class TestErrorIndex(ErrorsBaseActionTestCase):
+    __test__ = True
+    action_cls = BaseAction
+
+    def setUp(self):
+        super(TestErrorIndex, self).setUp()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.index = error_index.ErrorIndex(os.path.join(self.tmp_dir, 'index.sqlite'),
+                                            retention_days=36500)
+
+    def tearDown(self):
+        super(TestErrorIndex, self).tearDown()
+        self.index.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def record(self, execution_id, message, task_name='vsphere_check', timestamp=NOW):
+        return {
+            'fingerprint': error_index.fingerprint(message),
+            'task_name': task_name,
+            'action_ref': 'vsphere.vm_check',
+            'execution_id': execution_id,
+            'timestamp': timestamp,
+            'message': message
+        }
+
+    def test_get_index_config_defaults(self):
+        expected = {
+            'enabled': False,
+            'path': error_index.DEFAULT_INDEX_PATH,
+            'retention_days': error_index.DEFAULT_RETENTION_DAYS
+        }
+        self.assertEqual(error_index.get_index_config({}), expected)
+
+    def test_fingerprint_ignores_ids_and_numbers(self):
+        first = error_index.fingerprint("VM 5fb5746e295becef56bf2195 timed out after 30s")
+        second = error_index.fingerprint("VM 5fbc1d8db05eda3452d85013 timed out  after 60s")
+        third = error_index.fingerprint("VM already exists")
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, third)
+
+    def test_parse_timestamp(self):
+        self.assertAlmostEqual(error_index.parse_timestamp('2018-10-26T01:00:00.012345Z'),
+                               NOW + 0.012345)
+        self.assertAlmostEqual(error_index.parse_timestamp(None), time.time(), delta=5)
+        self.assertEqual(error_index.format_timestamp(NOW), '2018-10-26T01:00:00Z')
+
+    def test_add_ignores_duplicates(self):
+        record = self.record('1', 'VM already exists')
+        self.assertEqual(self.index.add([record]), 1)
+        self.assertEqual(self.index.add([record]), 0)
+
+    def test_find_by_fingerprint(self):
+        self.index.add([self.record('1', 'timeout after 30s'),
+                        self.record('2', 'timeout after 60s', timestamp=NOW + 10),
+                        self.record('3', 'VM already exists')])
+
+        result = self.index.find_by_fingerprint(error_index.fingerprint('timeout after 1s'))
+        self.assertEqual([r['execution_id'] for r in result], ['2', '1'])
+
+    def test_find_by_task(self):
+        self.index.add([self.record('1', 'error one', task_name='task_a'),
+                        self.record('2', 'error two', task_name='task_b')])
+
+        result = self.index.find_by_task('task_b')
+        self.assertEqual(len(result), 1)
+        self.assertEqual(result[0]['execution_id'], '2')
+        self.assertEqual(result[0]['timestamp'], '2018-10-26T01:00:00Z')
+
+    def test_search(self):
+        self.index.add([self.record('1', 'Hostname=test is already in use in menandmice'),
+                        self.record('2', 'VM still exists in puppet')])
+
+        result = self.index.search('menandmice')
+        self.assertEqual([r['execution_id'] for r in result], ['1'])
+
+    def test_search_like_fallback(self):
+        self.index.fts = False
+        self.index.add([self.record('1', 'disk 100% full'),
+                        self.record('2', 'disk 100 full')])
+
+        result = self.index.search('100%')
+        self.assertEqual([r['execution_id'] for r in result], ['1'])
+
+    def test_since(self):
+        self.index.add([self.record('1', 'error', timestamp=NOW - 100),
+                        self.record('2', 'error', timestamp=NOW)])
+
+        result = self.index.find_by_task('vsphere_check', since=NOW - 10)
+        self.assertEqual([r['execution_id'] for r in result], ['2'])
+
+    def test_evict(self):
+        self.index.add([self.record('1', 'old error', timestamp=NOW - 8 * 86400),
+                        self.record('2', 'new error', timestamp=NOW)])
+        self.index.retention_days = 7
+
+        self.assertEqual(self.index.evict(now=NOW), 1)
+        self.assertEqual(self.index.search('old'), [])
+        self.assertEqual(len(self.index.search('new')), 1)
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from errors_base_action_test_case import ErrorsBaseActionTestCase
+
+from lib.base_action import BaseAction
+from lib.error_message import DEFAULT_ERROR_MESSAGE
+from lib.error_message import get_error_message
+
+__all__ = [
+    'TestErrorMessage'
+]
+
+
+class TestErrorMessage(ErrorsBaseActionTestCase):
+    __test__ = True
+    action_cls = BaseAction
+
+    def test_get_error_message_order(self):
+        test_results = [
+            ({'output': {'error': 'output'}, 'error': 'error'}, 'output'),
+            ({'errors': [{'message': 'errors'}], 'error': 'error'}, 'errors'),
+            ({'error': 'error', 'stderr': 'stderr'}, 'error'),
+            ({'result': {'stderr': 'result'}, 'stderr': 'stderr'}, 'result'),
+            ({'result': 'None', 'stderr': 'stderr'}, 'stderr'),
+        ]
+        for result, expected in test_results:
+            self.assertEqual(get_error_message(result), expected, result)
+
+    def test_get_error_message_default(self):
+        self.assertEqual(get_error_message({}), DEFAULT_ERROR_MESSAGE)
+        self.assertEqual(get_error_message({'output': {'error': None}}, default=""), "")
+        self.assertEqual(get_error_message(None, default=""), "")
+        self.assertEqual(get_error_message("not a result", default=""), "")
+
+    def test_get_error_message_malformed_errors(self):
+        self.assertEqual(get_error_message({'errors': []}), "")
+        self.assertEqual(get_error_message({'errors': ['plain']}), "plain")
+        self.assertEqual(get_error_message({'errors': [{}]}), "")
@@ -49,7 +49,8 @@ class TestExecutionFindErrorResults(ErrorsBaseActionTestCase):
         expected_result = {
             'st2_execution_id': 'test1',
             'st2_execution_status': 'failed',
-            'st2_execution_comments': 'test_error'
+            'st2_execution_comments': 'test_error',
+            'st2_execution_error_category': 'unknown'
         }
 
         test_task_list = [
@@ -88,7 +89,8 @@ class TestExecutionFindErrorResults(ErrorsBaseActionTestCase):
         expected_result = {
             'st2_execution_id': 'test1',
             'st2_execution_status': 'unknown',
-            'st2_execution_comments': 'Could not find execution_id in database'
+            'st2_execution_comments': 'Could not find execution_id in database',
+            'st2_execution_error_category': ''
         }
 
         test_task_list = [
@@ -125,7 +127,8 @@ class TestExecutionFindErrorResults(ErrorsBaseActionTestCase):
         expected_result = {
             'st2_execution_id': 'test1',
             'st2_execution_status': 'unknown',
-            'st2_execution_comments': 'Could not find execution_id in database'
+            'st2_execution_comments': 'Could not find execution_id in database',
+            'st2_execution_error_category': ''
         }
 
         test_task_list = [
@@ -165,7 +168,8 @@ class TestExecutionFindErrorResults(ErrorsBaseActionTestCase):
         expected_result = {
             'st2_execution_id': 'test1',
             'st2_execution_status': 'failed',
-            'st2_execution_comments': 'test_error'
+            'st2_execution_comments': 'test_error',
+            'st2_execution_error_category': 'unknown'
         }
 
         test_task_list = [
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from errors_base_action_test_case import ErrorsBaseActionTestCase
+
+from lib.hash_ring import HashRing
+from lib.base_action import BaseAction
+
+__all__ = [
+    'TestHashRing'
+]
+
+
+class TestHashRing(ErrorsBaseActionTestCase):
+    __test__ = True
+    action_cls = BaseAction
+
+    def test_get_node_empty(self):
+        self.assertIsNone(HashRing([]).get_node('test_rule'))
+
+    def test_get_node_stable(self):
+        first = HashRing(['node_b', 'node_a'])
+        second = HashRing(['node_a', 'node_b'])
+        for i in range(100):
+            key = 'rule_{0}'.format(i)
+            self.assertEqual(first.get_node(key), second.get_node(key))
+
+    def test_spread(self):
+        ring = HashRing(['node_a', 'node_b', 'node_c'])
+        counts = {}
+        for i in range(3000):
+            node = ring.get_node('rule_{0}'.format(i))
+            counts[node] = counts.get(node, 0) + 1
+
+        self.assertEqual(sorted(counts), ['node_a', 'node_b', 'node_c'])
+        self.assertTrue(all(count > 600 for count in counts.values()), counts)
+
+    def test_node_leaves(self):
+        before = HashRing(['node_a', 'node_b', 'node_c'])
+        after = HashRing(['node_a', 'node_b'])
+        for i in range(1000):
+            key = 'rule_{0}'.format(i)
+            # Only the keys of the node that left move
+            if before.get_node(key) != 'node_c':
+                self.assertEqual(before.get_node(key), after.get_node(key))
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from errors_base_action_test_case import ErrorsBaseActionTestCase
+
+from lib.metrics import Metrics
+from lib.metrics import StatsdDriver
+from lib.metrics import get_metrics_driver
+from lib.base_action import BaseAction
+import mock
+import socket
+
+__all__ = [
+    'TestMetrics'
+]
+
+
+class TestMetrics(ErrorsBaseActionTestCase):
+    __test__ = True
+    action_cls = BaseAction
+
+    def test_driver(self):
+        driver = mock.Mock()
+        metrics = Metrics('errors.test', driver=driver)
+        metrics.inc_counter('polls')
+        metrics.inc_counter('polls', 2)
+        metrics.set_gauge('state.rules', 5)
+
+        driver.inc_counter.assert_has_calls([mock.call('errors.test.polls', 1),
+                                             mock.call('errors.test.polls', 2)])
+        driver.set_gauge.assert_called_with('errors.test.state.rules', 5)
+        self.assertEqual(metrics.counters, {'polls': 3})
+        self.assertEqual(metrics.gauges, {'state.rules': 5})
+
+    @mock.patch('lib.metrics.get_st2_metrics_driver')
+    def test_without_driver(self, mock_get_driver):
+        mock_get_driver.return_value = None
+        metrics = Metrics('errors.test')
+        metrics.inc_counter('polls')
+        metrics.set_gauge('state.rules', 5)
+        self.assertEqual(metrics.counters, {'polls': 1})
+        # The driver is only looked up once
+        self.assertEqual(mock_get_driver.call_count, 1)
+
+    def test_st2_driver_unavailable(self):
+        # st2common isn't importable outside of StackStorm
+        self.assertIsNone(Metrics('errors.test').driver)
+
+    def test_timings(self):
+        driver = mock.Mock()
+        metrics = Metrics('errors.test', driver=driver)
+        metrics.time('poll.duration', 0.5)
+        metrics.time('poll.duration', 1.5)
+        driver.time.assert_called_with('errors.test.poll.duration', 1.5)
+        self.assertEqual(metrics.timings, {
+            'poll.duration': {'count': 2, 'total': 2.0, 'max': 1.5}})
+
+    def test_total(self):
+        metrics = Metrics('errors.test', driver=mock.Mock())
+        metrics.inc_counter('api.rules.query')
+        metrics.inc_counter('api.ruleenforcements.query', 3)
+        metrics.inc_counter('polls')
+        self.assertEqual(metrics.total('api.'), 4)
+
+    def test_get_metrics_driver_statsd(self):
+        driver = get_metrics_driver({'metrics': {'statsd_host': 'localhost',
+                                                 'statsd_port': 9125}})
+        self.assertIsInstance(driver, StatsdDriver)
+        self.assertEqual(driver.address, ('localhost', 9125))
+        self.assertIsNone(get_metrics_driver({}))
+
+    def test_statsd_driver(self):
+        server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        server.bind(('127.0.0.1', 0))
+        server.settimeout(5)
+        try:
+            metrics = Metrics('errors.test',
+                              driver=StatsdDriver('127.0.0.1', server.getsockname()[1]))
+            metrics.inc_counter('polls', 2)
+            metrics.set_gauge('state.rules', 5)
+            metrics.time('poll.duration', 0.25)
+            lines = [server.recv(1024).decode('utf-8') for _ in range(3)]
+        finally:
+            server.close()
+
+        self.assertEqual(lines, ['errors.test.polls:2|c',
+                                 'errors.test.state.rules:5|g',
+                                 'errors.test.poll.duration:250.000|ms'])
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from errors_base_action_test_case import ErrorsBaseActionTestCase
+
+from query_error_index import QueryErrorIndex
+from lib.base_action import BaseAction
+from lib import error_index
+from st2common.runners.base_action import Action
+import mock
+import os
+import shutil
+import tempfile
+
+__all__ = [
+    'TestQueryErrorIndex'
+]
+
+
+class TestQueryErrorIndex(ErrorsBaseActionTestCase):
+    __test__ = True
+    action_cls = QueryErrorIndex
+
+    def setUp(self):
+        super(TestQueryErrorIndex, self).setUp()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.config = {'error_index': {'path': os.path.join(self.tmp_dir, 'index.sqlite'),
+                                       'retention_days': 36500}}
+        index = error_index.ErrorIndex(self.config['error_index']['path'], 36500)
+        records = [('1', 'task_a', 'VM already exists'),
+                   ('2', 'task_b', 'VM already exists'),
+                   ('3', 'task_a', 'timeout after 30s')]
+        index.add([{'fingerprint': error_index.fingerprint(message),
+                    'task_name': task_name,
+                    'action_ref': 'test.action',
+                    'execution_id': execution_id,
+                    'timestamp': 1540515600.0,
+                    'message': message} for execution_id, task_name, message in records])
+        index.close()
+
+    def tearDown(self):
+        super(TestQueryErrorIndex, self).tearDown()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_init(self):
+        action = self.get_action_instance({})
+        self.assertIsInstance(action, QueryErrorIndex)
+        self.assertIsInstance(action, BaseAction)
+        self.assertIsInstance(action, Action)
+
+    @mock.patch("lib.base_action.forward")
+    def test_run_with_worker(self, mock_forward):
+        mock_forward.return_value = []
+        config = dict(self.config, worker={'enabled': True, 'socket_path': '/tmp/test.sock'})
+        action = self.get_action_instance(config)
+
+        self.assertEqual(action.run(task_name='task_a', limit=100), [])
+        mock_forward.assert_called_with('/tmp/test.sock', 'query_error_index',
+                                        {'task_name': 'task_a', 'limit': 100},
+                                        timeout=300)
+
+    def test_run_same_error_as_execution(self):
+        action = self.get_action_instance(self.config)
+        result = action.run(st2_exe_id='1', limit=100)
+        self.assertEqual([r['execution_id'] for r in result], ['2'])
+
+    def test_run_fingerprint(self):
+        action = self.get_action_instance(self.config)
+        result = action.run(fingerprint=error_index.fingerprint('timeout after 5s'), limit=100)
+        self.assertEqual([r['execution_id'] for r in result], ['3'])
+
+    def test_run_task_name(self):
+        action = self.get_action_instance(self.config)
+        result = action.run(task_name='task_a', limit=100)
+        self.assertEqual(sorted(r['execution_id'] for r in result), ['1', '3'])
+
+    def test_run_text(self):
+        action = self.get_action_instance(self.config)
+        result = action.run(text='timeout', limit=100)
+        self.assertEqual([r['execution_id'] for r in result], ['3'])
+
+    def test_run_since_days(self):
+        action = self.get_action_instance(self.config)
+        result = action.run(task_name='task_a', since_days=1, limit=100)
+        self.assertEqual(result, [])
+
+    def test_run_no_lookup(self):
+        action = self.get_action_instance(self.config)
+        with self.assertRaises(ValueError):
+            action.run(limit=100)
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from errors_base_action_test_case import ErrorsBaseActionTestCase
+
+from lib.rule_scheduler import RuleScheduler
+from lib.base_action import BaseAction
+
+__all__ = [
+    'TestRuleScheduler'
+]
+
+
+class TestRuleScheduler(ErrorsBaseActionTestCase):
+    __test__ = True
+    action_cls = BaseAction
+
+    def test_pop_due(self):
+        scheduler = RuleScheduler()
+        scheduler.schedule('rule_c', 300)
+        scheduler.schedule('rule_a', 100)
+        scheduler.schedule('rule_b', 200)
+
+        self.assertEqual(scheduler.pop_due(50), [])
+        self.assertEqual(scheduler.pop_due(200), ['rule_a', 'rule_b'])
+        self.assertNotIn('rule_a', scheduler)
+        self.assertIn('rule_c', scheduler)
+        self.assertEqual(scheduler.next_due(), 300)
+
+    def test_reschedule(self):
+        scheduler = RuleScheduler()
+        scheduler.schedule('rule_a', 100)
+        scheduler.schedule('rule_a', 500)
+
+        self.assertEqual(scheduler.pop_due(200), [])
+        self.assertEqual(scheduler.next_due(), 500)
+        self.assertEqual(len(scheduler), 1)
+        self.assertEqual(scheduler.pop_due(500), ['rule_a'])
+        self.assertIsNone(scheduler.next_due())
+
+    def test_remove(self):
+        scheduler = RuleScheduler()
+        scheduler.schedule('rule_a', 100)
+        scheduler.remove('rule_a')
+
+        self.assertEqual(scheduler.pop_due(200), [])
+        self.assertEqual(len(scheduler), 0)
+
+    def test_prune(self):
+        scheduler = RuleScheduler()
+        for due in range(10):
+            scheduler.schedule('rule_a', due)
+        scheduler.schedule('rule_b', 100)
+
+        scheduler.prune(['rule_a'])
+        self.assertEqual(len(scheduler), 1)
+        # Stale heap entries are dropped
+        self.assertEqual(scheduler.heap, [(9, 9, 'rule_a')])
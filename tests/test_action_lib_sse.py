@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from errors_base_action_test_case import ErrorsBaseActionTestCase
+
+from lib.sse import iter_sse_events
+from lib.sse import open_stream
+from sse_stand_in import SSEStandIn
+from lib.base_action import BaseAction
+
+__all__ = [
+    'TestSSE'
+]
+
+
+class TestSSE(ErrorsBaseActionTestCase):
+    __test__ = True
+    action_cls = BaseAction
+
+    def test_iter_sse_events(self):
+        lines = [
+            ": keep alive\n",
+            "event: st2.execution__update\n",
+            "id: 1\n",
+            "data: {\"id\": \"a\",\n",
+            "data:\"status\": \"failed\"}\n",
+            "\n",
+            "data: second\r\n",
+            "\r\n",
+            "data: unterminated\n",
+        ]
+        events = list(iter_sse_events(lines))
+        self.assertEqual([e.event for e in events],
+                         ['st2.execution__update', 'message', 'message'])
+        self.assertEqual(events[0].id, '1')
+        self.assertEqual(events[0].json(), {'id': 'a', 'status': 'failed'})
+        self.assertEqual(events[1].data, 'second')
+        self.assertEqual(events[2].data, 'unterminated')
+
+    def test_iter_sse_events_without_data(self):
+        lines = ["event: st2.announcement__chatops\n", "\n", ": comment\n", "\n"]
+        self.assertEqual(list(iter_sse_events(lines)), [])
+
+    def test_open_stream(self):
+        with SSEStandIn() as stand_in:
+            stand_in.send_raw(": hello\n\n")
+            stand_in.send('st2.execution__update', {'id': 'test_execution'})
+            events = list(open_stream(stand_in.url, headers={'X-Auth-Token': 'token'}))
+
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0].json(), {'id': 'test_execution'})
+        self.assertEqual(stand_in.requests[0]['headers']['X-Auth-Token'], 'token')
+        self.assertEqual(stand_in.requests[0]['headers']['Accept'], 'text/event-stream')
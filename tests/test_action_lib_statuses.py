@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from errors_base_action_test_case import ErrorsBaseActionTestCase
+
+from lib import statuses
+from lib.base_action import BaseAction
+
+__all__ = [
+    'TestStatuses'
+]
+
+
+class TestStatuses(ErrorsBaseActionTestCase):
+    __test__ = True
+    action_cls = BaseAction
+
+    def test_status_tables_match_st2client(self):
+        import st2client.commands.action as st2_action
+
+        names = [name for name in dir(statuses) if name.startswith('LIVEACTION_STATUS_')]
+        self.assertEqual(len(names), 12)
+        for name in names:
+            self.assertEqual(getattr(statuses, name), getattr(st2_action, name))
+
+    def test_status_tables_partition(self):
+        tables = [statuses.QUEUED_STATUSES, statuses.RUNNING_STATUSES,
+                  statuses.COMPLETED_STATUSES, statuses.ERRORED_STATUSES]
+        everything = sum(tables, [])
+        self.assertEqual(len(everything), len(set(everything)))
+        self.assertEqual(sorted(everything),
+                         sorted(getattr(statuses, name) for name in dir(statuses)
+                                if name.startswith('LIVEACTION_STATUS_')))
+        self.assertEqual(statuses.UNFINISHED_STATUSES,
+                         statuses.QUEUED_STATUSES + statuses.RUNNING_STATUSES)
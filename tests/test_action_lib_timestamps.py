@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from errors_base_action_test_case import ErrorsBaseActionTestCase
+
+from lib.timestamps import format_timestamp
+from lib.timestamps import parse_timestamp
+from lib.base_action import BaseAction
+
+__all__ = [
+    'TestTimestamps'
+]
+
+
+class TestTimestamps(ErrorsBaseActionTestCase):
+    __test__ = True
+    action_cls = BaseAction
+
+    def test_parse_timestamp(self):
+        self.assertEqual(parse_timestamp('2018-10-26T01:00:00Z'), 1540515600.0)
+        self.assertEqual(parse_timestamp('2018-10-26 01:00:00'), 1540515600.0)
+        self.assertAlmostEqual(parse_timestamp('2018-10-26T01:00:00.012345Z'),
+                               1540515600.012345)
+        self.assertAlmostEqual(parse_timestamp('2018-10-26T01:00:00.5Z'), 1540515600.5)
+
+    def test_parse_timestamp_offset(self):
+        self.assertEqual(parse_timestamp('2018-10-26T03:00:00+02:00'), 1540515600.0)
+        self.assertEqual(parse_timestamp('2018-10-25T19:30:00.000000-05:30'), 1540515600.0)
+        self.assertEqual(parse_timestamp('2018-10-26T01:00:00+00:00'), 1540515600.0)
+
+    def test_parse_timestamp_matches_format(self):
+        for epoch in [0, 951782400, 1540515600, 4102444799]:
+            self.assertEqual(parse_timestamp(format_timestamp(epoch)), epoch)
+
+    def test_parse_timestamp_malformed(self):
+        for timestamp in [None, '', 'bad', '2018-10-26', '2018/10/26T01:00:00Z',
+                          '2018-13-26T01:00:00Z', '2018-02-30T01:00:00Z',
+                          '2018-10-26T24:00:00Z', '2018-10-26T01:0a:00Z']:
+            self.assertIsNone(parse_timestamp(timestamp), timestamp)
+        self.assertEqual(parse_timestamp('bad', default=5), 5)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from errors_base_action_test_case import ErrorsBaseActionTestCase
+
+from get_formatted_error import GetFormattedError
+from lib import worker
+import mock
+import os
+import shutil
+import socket
+import tempfile
+import threading
+
+__all__ = [
+    'TestWorker'
+]
+
+
+class TestWorker(ErrorsBaseActionTestCase):
+    __test__ = True
+    action_cls = GetFormattedError
+
+    def setUp(self):
+        super(TestWorker, self).setUp()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.tmp_dir, 'worker.sock')
+
+    def tearDown(self):
+        super(TestWorker, self).tearDown()
+        shutil.rmtree(self.tmp_dir)
+
+    def start_server(self, st2_client_factory=None):
+        server = worker.ErrorWorkerServer(self.socket_path,
+                                          {'get_formatted_error': GetFormattedError},
+                                          {},
+                                          st2_client_factory=st2_client_factory)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def test_get_worker_config_defaults(self):
+        expected = {
+            'enabled': False,
+            'socket_path': worker.DEFAULT_SOCKET_PATH,
+            'timeout': worker.DEFAULT_TIMEOUT
+        }
+        self.assertEqual(worker.get_worker_config({}), expected)
+        self.assertEqual(worker.get_worker_config(None), expected)
+
+    def test_get_worker_config(self):
+        config = {'worker': {'enabled': True, 'socket_path': '/tmp/test.sock'}}
+        result = worker.get_worker_config(config)
+        self.assertEqual(result['enabled'], True)
+        self.assertEqual(result['socket_path'], '/tmp/test.sock')
+
+    def test_forward_no_socket(self):
+        with self.assertRaises(worker.WorkerUnavailable):
+            worker.forward(self.socket_path, 'get_formatted_error', {})
+
+    @mock.patch("get_formatted_error.GetFormattedError.run_local")
+    def test_forward(self, mock_run_local):
+        mock_run_local.return_value = "test_error"
+        mock_client = mock.Mock()
+        self.start_server(st2_client_factory=lambda: mock_client)
+
+        parameters = {'st2_exe_id': '1234', 'html_tags': False, 'ignored_error_tasks': []}
+        result = worker.forward(self.socket_path, 'get_formatted_error', parameters)
+
+        self.assertEqual(result, "test_error")
+        mock_run_local.assert_called_with(**parameters)
+
+    @mock.patch("get_formatted_error.GetFormattedError.run_local")
+    def test_forward_action_error(self, mock_run_local):
+        mock_run_local.side_effect = AttributeError("no errors")
+        self.start_server()
+
+        with self.assertRaises(worker.WorkerError):
+            worker.forward(self.socket_path, 'get_formatted_error', {})
+
+    def test_forward_no_answer(self):
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(self.socket_path)
+        listener.listen(1)
+        self.addCleanup(listener.close)
+
+        # The connection is accepted by the backlog but nothing ever answers
+        with self.assertRaises(worker.WorkerError):
+            worker.forward(self.socket_path, 'get_formatted_error', {}, timeout=0.2)
+
+    @mock.patch("lib.base_action.forward")
+    @mock.patch("get_formatted_error.GetFormattedError.run_local")
+    def test_run_with_worker_no_answer(self, mock_run_local, mock_forward):
+        mock_forward.side_effect = worker.WorkerError("No response from worker")
+        action = self.get_action_instance({'worker': {'enabled': True}})
+
+        # The worker may still be running the action, so it isn't run again
+        with self.assertRaises(worker.WorkerError):
+            action.run(st2_exe_id='1234')
+        mock_run_local.assert_not_called()
+
+    @mock.patch("lib.base_action.forward")
+    @mock.patch("get_formatted_error.GetFormattedError.run_local")
+    def test_run_with_worker_unavailable(self, mock_run_local, mock_forward):
+        mock_forward.side_effect = worker.WorkerUnavailable("Could not connect to worker")
+        mock_run_local.return_value = "test_error"
+        action = self.get_action_instance({'worker': {'enabled': True}})
+
+        self.assertEqual(action.run(st2_exe_id='1234'), "test_error")
+        mock_run_local.assert_called_with(st2_exe_id='1234')
+
+    def test_forward_unknown_action(self):
+        self.start_server()
+
+        with self.assertRaises(worker.WorkerError):
+            worker.forward(self.socket_path, 'not_an_action', {})
+
+    def test_get_st2_client_cached(self):
+        mock_factory = mock.Mock(return_value="client")
+        server = worker.ErrorWorkerServer(self.socket_path, {}, {},
+                                          st2_client_factory=mock_factory)
+        self.addCleanup(server.server_close)
+
+        self.assertEqual(server.get_st2_client(), "client")
+        self.assertEqual(server.get_st2_client(), "client")
+        self.assertEqual(mock_factory.call_count, 1)
@@ -14,10 +14,16 @@
 # limitations under the License.
 from st2tests.base import BaseSensorTestCase
 
+from cron_sensor import CachedEnforcement
 from cron_sensor import CronSensor
 from st2reactor.sensor.base import PollingSensor
 import mock
 import datetime
+import json
+import os
+import subprocess
+import sys
+import threading
 import pytz
 import yaml
 from freezegun import freeze_time
@@ -36,14 +42,163 @@ class CronSensorTestCase(BaseSensorTestCase):
         self.assertIsInstance(sensor, CronSensor)
         self.assertIsInstance(sensor, PollingSensor)
 
-    @mock.patch('cron_sensor.Client')
-    @mock.patch('cron_sensor.socket')
-    def test_setup(self, mock_socket, mock_client):
+    def test_init_invalid_error_pattern(self):
+        config = {'error_classification': {'categories': {'broken': ['(unclosed']}}}
+        with self.assertRaisesRegex(ValueError, "error category broken"):
+            self.get_sensor_instance(config)
+
+    def test_import_is_lazy(self):
+        code = "import sys, cron_sensor; print('st2client' in sys.modules)"
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        output = subprocess.check_output([sys.executable, '-c', code], env=env)
+        self.assertEqual(output.strip(), b'False')
+
+    @mock.patch('st2client.client.Client')
+    @mock.patch('socket.getfqdn')
+    def test_setup(self, mock_getfqdn, mock_client):
         config = yaml.safe_load(self.get_fixture_content('config_good.yaml'))
         sensor = self.get_sensor_instance(config)
-        mock_socket.getfqdn.return_value = "st2_test"
+        mock_getfqdn.return_value = "st2_test"
         mock_client.return_value = "Client"
         sensor.setup()
+        self.assertEqual(sensor.st2_fqdn, "st2_test")
+        self.assertEqual(sensor.st2_client, "Client")
+        mock_client.assert_called_with(base_url="https://st2_test/")
+
+    def get_cluster_config(self, **options):
+        options.setdefault('datastore_key', 'cron_errors')
+        options.setdefault('clusters', [
+            {'name': 'st2-east.example.com', 'api_key': 'east_key'},
+            {'name': 'st2 west', 'url': 'https://st2-west.example.com/',
+             'cacert': '/etc/ssl/west.pem'}])
+        return {'error_cron_event': options}
+
+    @mock.patch('st2client.client.Client')
+    @mock.patch('socket.getfqdn')
+    def test_setup_clusters(self, mock_getfqdn, mock_client):
+        mock_getfqdn.return_value = "st2_test"
+        sensor = self.get_sensor_instance(self.get_cluster_config(state_shards=4))
+        sensor.setup()
+
+        self.assertIsNone(sensor.st2_client)
+        east, west = sensor.clusters
+        self.assertEqual(east.st2_fqdn, 'st2-east.example.com')
+        self.assertEqual(east.kv_sensor_name, 'cron_errors_st2-east_example_com')
+        self.assertEqual(east.metrics.prefix, 'errors.cron_sensor.cluster.st2-east_example_com')
+        self.assertEqual(west.kv_sensor_name, 'cron_errors_st2_west')
+        self.assertEqual(west.state_shards, 4)
+        self.assertEqual(west.cluster_configs, [])
+        self.assertEqual(west.node_id, 'st2_test')
+        self.assertEqual(mock_client.call_args_list, [
+            mock.call(base_url='https://st2-east.example.com/'),
+            mock.call(base_url='https://st2-west.example.com/', cacert='/etc/ssl/west.pem')])
+
+    @mock.patch.dict(os.environ, {'ST2_AUTH_TOKEN': 'sensor_token'})
+    @mock.patch('requests.get')
+    @mock.patch('socket.getfqdn')
+    def test_setup_clusters_credentials(self, mock_getfqdn, mock_get):
+        mock_getfqdn.return_value = "st2_test"
+        mock_get.return_value = mock.Mock(status_code=404)
+        sensor = self.get_sensor_instance(self.get_cluster_config(clusters=[
+            {'name': 'st2-east', 'api_key': 'east_key'},
+            {'name': 'st2-west', 'api_key': 'west_key'}]))
+        sensor.setup()
+
+        for cluster in sensor.clusters:
+            cluster.st2_client.rules.query(enabled=True)
+            cluster.st2_client.executions.get_by_id('test_execution')
+        headers = [(call[0][0].split('/')[2], call[1]['headers'])
+                   for call in mock_get.call_args_list]
+        # Each cluster only sends its own api key, not the sensor's token
+        self.assertEqual(headers, [
+            ('st2-east', {'St2-Api-Key': 'east_key'}),
+            ('st2-east', {'St2-Api-Key': 'east_key'}),
+            ('st2-west', {'St2-Api-Key': 'west_key'}),
+            ('st2-west', {'St2-Api-Key': 'west_key'})])
+        self.assertEqual(os.environ['ST2_AUTH_TOKEN'], 'sensor_token')
+        self.assertNotIn('ST2_API_KEY', os.environ)
+
+    def get_cluster_sensor(self, *polls):
+        sensor = self.get_sensor_instance(self.get_cluster_config(cluster_poll_timeout=5))
+        sensor.metrics.__init__('errors.cron_sensor', driver=mock.Mock())
+        sensor.clusters = [mock.Mock(st2_fqdn='cluster_{0}'.format(i), poll=poll)
+                           for i, poll in enumerate(polls)]
+        return sensor
+
+    def test_poll_clusters(self):
+        polled = []
+        sensor = self.get_cluster_sensor(lambda: polled.append(0),
+                                         mock.Mock(side_effect=ValueError("unreachable")),
+                                         lambda: polled.append(2))
+        sensor.poll()
+        self.assertEqual(sorted(polled), [0, 2])
+        # A failing cluster doesn't stop the others
+        self.assertEqual(sensor.metrics.counters, {'clusters.failed': 1})
+        sensor.cleanup()
+
+    def test_poll_clusters_schedule_checks(self):
+        sensor = self.get_sensor_instance(self.get_cluster_config(schedule_checks=True),
+                                          poll_interval=300)
+        sensor.metrics.__init__('errors.cron_sensor', driver=mock.Mock())
+        sensor.clusters = [mock.Mock(st2_fqdn='cluster_{0}'.format(i),
+                                     **{'get_poll_interval.return_value': interval})
+                           for i, interval in enumerate([120, 45])]
+        sensor.poll()
+        # Polls again when the first cluster is due
+        self.assertEqual(sensor.get_poll_interval(), 45)
+        sensor.cleanup()
+
+    def test_poll_clusters_slow(self):
+        release = threading.Event()
+        polled = []
+        sensor = self.get_cluster_sensor(mock.Mock(side_effect=release.wait),
+                                         lambda: polled.append(1))
+        sensor.cluster_poll_timeout = 0.1
+        try:
+            sensor.poll()
+            sensor.poll()
+            # The hung cluster is skipped while the other is polled every time
+            self.assertEqual(polled, [1, 1])
+            self.assertEqual(sensor.metrics.counters, {'clusters.skipped': 1})
+        finally:
+            release.set()
+        sensor.cluster_polls['cluster_0'].result(timeout=5)
+        sensor.poll()
+        self.assertEqual(sensor.clusters[0].poll.call_count, 2)
+        sensor.cleanup()
+
+    @freeze_time("2018-10-26 01:30")
+    @mock.patch('st2client.client.Client')
+    @mock.patch('socket.getfqdn')
+    def test_poll_clusters_isolated_state(self, mock_getfqdn, mock_client):
+        mock_getfqdn.return_value = "st2_test"
+        trigger_attributes = {
+            'type': "core.st2.CronTimer",
+            'parameters': {'hour': 1, 'minute': 0, 'second': 0}
+        }
+        east_client = mock.MagicMock()
+        east_client.rules.query.return_value = [
+            mock.Mock(ref='test_rule', trigger=trigger_attributes)]
+        east_client.ruleenforcements.query.return_value = []
+        west_client = mock.MagicMock()
+        west_client.rules.query.return_value = []
+        mock_client.side_effect = [east_client, west_client]
+
+        sensor = self.get_sensor_instance(self.get_cluster_config())
+        sensor.setup()
+        sensor.poll()
+        sensor.cleanup()
+
+        self.assertTriggerDispatched(trigger='errors.error_cron_event', payload={
+            'st2_rule_name': 'test_rule',
+            'st2_server': 'st2-east.example.com',
+            'st2_execution_id': '',
+            'st2_comments': "Cron job is not running and no enforcements can be found",
+            'st2_state': 'open'})
+        state = json.loads(self.sensor_service.get_value('cron_errors_st2-east_example_com'))
+        self.assertEqual(list(state['rules']), ['test_rule'])
+        self.assertIsNone(self.sensor_service.get_value('cron_errors_st2_west'))
+        self.assertIsNone(self.sensor_service.get_value('cron_errors'))
 
     @freeze_time("2018-10-26 01:00")
     def test_poll(self):
@@ -111,7 +266,751 @@ class CronSensorTestCase(BaseSensorTestCase):
         sensor.poll()
         self.assertTriggerDispatched(trigger='errors.error_cron_event',
                                      payload=trigger_payload)
-        self.assertEqual(sensor.kv_enforcements, {'test_rule': 'error without enforcement id'})
+        self.assertEqual(sensor.kv_enforcements, {
+            'test_rule': {'enforcement_id': 'error without enforcement id',
+                          'previous_state': 'open'}})
+
+    @freeze_time("2018-10-26 01:30")
+    def test_poll_bulk(self):
+        sensor = self.get_sensor_instance({'error_cron_event': {'datastore_key': 'test_key',
+                                                                'bulk_enforcements': True}})
+        sensor.st2_fqdn = 'st2_test'
+        sensor.kv_sensor_name = 'test_sensor'
+
+        trigger_attributes = {
+            'type': "core.st2.CronTimer",
+            'parameters': {
+                'day_of_week': '*',
+                'hour': 1,
+                'minute': 0,
+                'second': 0,
+                'timezone': 'UTC'
+            }
+        }
+
+        mock_rule = mock.Mock(ref='test_rule', trigger=trigger_attributes)
+        mock_rule_2 = mock.Mock(ref='test_rule_2', trigger=trigger_attributes)
+        mock_enforcement = mock.Mock(enforced_at='2018-10-26T01:00:00.01Z',
+                                     execution_id='test_execution',
+                                     rule={'ref': 'test_rule'})
+
+        mock_st2_client = mock.MagicMock()
+        mock_st2_client.rules.query.return_value = [mock_rule, mock_rule_2]
+        mock_st2_client.ruleenforcements.query.side_effect = lambda rule_ref=None, **kwargs: [
+            e for e in [mock_enforcement] if rule_ref in (None, e.rule['ref'])]
+        mock_st2_client.liveactions.get_by_id.return_value = mock.Mock(status='succeeded')
+        sensor.st2_client = mock_st2_client
+
+        trigger_payload = {
+            'st2_rule_name': 'test_rule_2',
+            'st2_server': 'st2_test',
+            'st2_execution_id': '',
+            'st2_comments': 'Cron job did not run',
+            'st2_state': 'open'
+        }
+
+        sensor.poll()
+        # Nothing was fetched before, each rule gets its own query over its window
+        self.assertEqual(mock_st2_client.ruleenforcements.query.call_args_list, [
+            mock.call(rule_ref=rule_ref, enforced_at_gt='2018-10-25T01:00:00.000000Z',
+                      enforced_at_lt='2018-10-27T01:00:00.000000Z')
+            for rule_ref in ['test_rule', 'test_rule_2']])
+        self.assertTriggerDispatched(trigger='errors.error_cron_event',
+                                     payload=trigger_payload)
+        self.assertEqual(sensor.kv_enforcements, {
+            'test_rule_2': {'enforcement_id': 'error without enforcement id',
+                            'previous_state': 'open'}})
+
+        # Then one query for both rules starting at the last poll
+        mock_st2_client.ruleenforcements.query.reset_mock()
+        with freeze_time("2018-10-26 01:35"):
+            sensor.poll()
+        mock_st2_client.ruleenforcements.query.assert_called_once_with(
+            enforced_at_gt='2018-10-26T01:29:00.000000Z', limit=100, offset=0)
+
+        # A rule that wasn't covered by the last poll gets its own query again
+        mock_rule_3 = mock.Mock(ref='test_rule_3', trigger=trigger_attributes)
+        mock_st2_client.rules.query.return_value = [mock_rule, mock_rule_2, mock_rule_3]
+        sensor.cron_rules = None
+        mock_st2_client.ruleenforcements.query.reset_mock()
+        with freeze_time("2018-10-26 01:40"):
+            sensor.poll()
+        self.assertEqual(mock_st2_client.ruleenforcements.query.call_args_list, [
+            mock.call(enforced_at_gt='2018-10-26T01:34:00.000000Z', limit=100, offset=0),
+            mock.call(rule_ref='test_rule_3', enforced_at_gt='2018-10-25T01:00:00.000000Z',
+                      enforced_at_lt='2018-10-27T01:00:00.000000Z')])
+
+    def test_get_enforcements_since(self):
+        sensor = self.get_sensor_instance({'error_cron_event': {'enforcement_page_size': 2}})
+
+        enforcements = [mock.Mock(rule={'ref': ref}) for ref in ['rule_a', 'rule_b', 'rule_a']]
+        mock_st2_client = mock.MagicMock()
+        mock_st2_client.ruleenforcements.query.side_effect = [enforcements[:2],
+                                                              enforcements[2:]]
+        sensor.st2_client = mock_st2_client
+
+        since = datetime.datetime(2018, 10, 26, 1, 0).replace(tzinfo=pytz.UTC)
+        result = sensor.get_enforcements_since(since)
+
+        self.assertEqual(result, {'rule_a': [enforcements[0], enforcements[2]],
+                                  'rule_b': [enforcements[1]]})
+        mock_st2_client.ruleenforcements.query.assert_called_with(
+            enforced_at_gt='2018-10-26T01:00:00.000000Z', limit=2, offset=2)
+
+    @freeze_time("2018-10-26 01:30")
+    def test_poll_watermarks(self):
+        sensor = self.get_sensor_instance()
+        sensor.st2_fqdn = 'st2_test'
+        sensor.kv_sensor_name = 'test_sensor'
+
+        trigger_attributes = {
+            'type': "core.st2.CronTimer",
+            'parameters': {
+                'hour': 1,
+                'minute': 0,
+                'second': 0
+            }
+        }
+
+        mock_rule = mock.Mock(ref='test_rule', trigger=trigger_attributes)
+        mock_enforcement = mock.Mock(id='test_id',
+                                     enforced_at='2018-10-26T01:00:00.010000Z',
+                                     execution_id='test_execution',
+                                     rule={'ref': 'test_rule'})
+
+        mock_st2_client = mock.MagicMock()
+        mock_st2_client.rules.query.return_value = [mock_rule]
+        mock_st2_client.ruleenforcements.query.return_value = [mock_enforcement]
+        mock_st2_client.liveactions.get_by_id.return_value = mock.Mock(status='running')
+        sensor.st2_client = mock_st2_client
+
+        sensor.poll()
+        mock_st2_client.ruleenforcements.query.assert_called_with(
+            rule_ref='test_rule',
+            enforced_at_gt='2018-10-25T01:00:00.000000Z',
+            enforced_at_lt='2018-10-27T01:00:00.000000Z')
+        watermarks = json.loads(self.sensor_service.get_value('test_sensor_watermarks'))
+        self.assertEqual(watermarks, {'test_rule': {'id': 'test_id',
+                                                    'enforced_at': '2018-10-26T01:00:00.010000Z',
+                                                    'execution_id': 'test_execution',
+                                                    'rule_ref': 'test_rule'}})
+
+        # The next poll only asks for enforcements newer than the watermark and still
+        # checks the running execution of the last enforcement
+        mock_st2_client.ruleenforcements.query.return_value = []
+        mock_st2_client.liveactions.get_by_id.return_value = mock.Mock(status='failed')
+        sensor.poll()
+        mock_st2_client.ruleenforcements.query.assert_called_with(
+            rule_ref='test_rule',
+            enforced_at_gt='2018-10-26T01:00:00.010000Z',
+            enforced_at_lt='2018-10-27T01:00:00.000000Z')
+        mock_st2_client.liveactions.get_by_id.assert_called_with('test_execution')
+        self.assertEqual(sensor.kv_enforcements, {
+            'test_rule': {'enforcement_id': 'test_id', 'previous_state': 'error'}})
+
+    def test_merge_watermark_outside_window(self):
+        sensor = self.get_sensor_instance()
+        sensor.watermarks = {'test_rule': {'id': 'old_id',
+                                           'enforced_at': '2018-10-20T01:00:00.000000Z',
+                                           'rule_ref': 'test_rule'}}
+
+        result = sensor.merge_watermark('test_rule', [],
+                                        datetime.datetime(2018, 10, 26, 1, 0, tzinfo=pytz.UTC),
+                                        datetime.datetime(2018, 10, 27, 1, 0, tzinfo=pytz.UTC))
+        self.assertEqual(result, [])
+        self.assertEqual(sensor.watermarks, {})
+
+    def test_merge_watermark_newest_regardless_of_order(self):
+        sensor = self.get_sensor_instance()
+        older = CachedEnforcement({'id': 'older', 'rule_ref': 'test_rule',
+                                   'enforced_at': '2018-10-25T01:00:00.000000Z'})
+        newer = CachedEnforcement({'id': 'newer', 'rule_ref': 'test_rule',
+                                   'enforced_at': '2018-10-26T01:00:00.000000Z'})
+
+        sensor.merge_watermark('test_rule', [older, newer],
+                               datetime.datetime(2018, 10, 26, 1, 0, tzinfo=pytz.UTC),
+                               datetime.datetime(2018, 10, 27, 1, 0, tzinfo=pytz.UTC))
+        self.assertEqual(sensor.watermarks['test_rule']['id'], 'newer')
+
+    def test_find_enforcement_newest_in_window(self):
+        sensor = self.get_sensor_instance()
+        previous_cron = datetime.datetime(2018, 10, 26, 1, 0, tzinfo=pytz.UTC)
+        next_cron = datetime.datetime(2018, 10, 27, 1, 0, tzinfo=pytz.UTC)
+        enforcements = [
+            mock.Mock(id='before', enforced_at='2018-10-25T00:59:59.900000Z'),
+            mock.Mock(id='previous', enforced_at='2018-10-25T01:00:00.100000Z'),
+            mock.Mock(id='after', enforced_at='2018-10-27T01:00:01.000000Z'),
+            mock.Mock(id='current', enforced_at='2018-10-26T01:00:00.100000Z'),
+        ]
+
+        for order in [enforcements, list(reversed(enforcements))]:
+            enforcement = sensor.find_enforcement(order, previous_cron, next_cron)
+            self.assertEqual(enforcement.id, 'current')
+        self.assertEqual(sensor.find_enforcement(enforcements[:2], previous_cron,
+                                                 next_cron).id, 'previous')
+        self.assertIsNone(sensor.find_enforcement([enforcements[0], enforcements[2]],
+                                                  previous_cron, next_cron))
+
+    def get_compaction_sensor(self, **options):
+        options.setdefault('datastore_key', 'test_sensor')
+        sensor = self.get_sensor_instance({'error_cron_event': options})
+        sensor.kv_sensor_name = 'test_sensor'
+        sensor.metrics.__init__('errors.cron_sensor', driver=mock.Mock())
+        sensor.cron_rules = {'test_rule': mock.Mock(ref='test_rule')}
+        sensor.kv_enforcements = {
+            'test_rule': {'enforcement_id': 'a', 'previous_state': 'error'},
+            'deleted_rule': {'enforcement_id': 'b', 'previous_state': 'error'}}
+        sensor.watermarks = {'test_rule': {'id': 'a'}, 'deleted_rule': {'id': 'b'}}
+        return sensor
+
+    def test_compact_state(self):
+        sensor = self.get_compaction_sensor()
+        self.assertEqual(sensor.compact_state(), (1, 0))
+        self.assertEqual(list(sensor.kv_enforcements), ['test_rule'])
+        self.assertEqual(list(sensor.watermarks), ['test_rule'])
+        self.assertTrue(sensor.state_dirty)
+        self.assertEqual(sensor.metrics.counters, {'state.compacted': 1})
+
+        sensor.save_state()
+        state = json.loads(self.sensor_service.get_value('test_sensor'))
+        self.assertEqual(list(state['rules']), ['test_rule'])
+
+    def test_compact_state_disabled(self):
+        sensor = self.get_compaction_sensor(state_compaction=False)
+        self.assertEqual(sensor.compact_state(), (0, 0))
+        self.assertEqual(len(sensor.kv_enforcements), 2)
+
+    def test_compact_state_before_rules_loaded(self):
+        sensor = self.get_compaction_sensor()
+        sensor.cron_rules = None
+        self.assertEqual(sensor.compact_state(), (0, 0))
+
+    def test_compact_state_max_rules(self):
+        sensor = self.get_compaction_sensor(state_max_rules=2)
+        sensor.cron_rules = dict((r, mock.Mock(ref=r)) for r in ['a', 'b', 'c', 'd'])
+        sensor.kv_enforcements = {}
+        for rule_ref in ['c', 'a', 'd', 'b']:
+            sensor._set_rule_state(rule_ref, 'id', 'error')
+
+        self.assertEqual(sensor.compact_state(), (0, 2))
+        # The rules updated least recently are dropped first
+        self.assertEqual(sorted(sensor.kv_enforcements), ['b', 'd'])
+        self.assertEqual(sensor.metrics.counters, {'state.evicted': 2})
+
+    def test_compact_state_partitioned(self):
+        sensor = self.get_compaction_sensor(state_max_rules=2, partitioning=True,
+                                            partition_node='node_a',
+                                            partition_members=['node_a', 'node_b'])
+        rule_refs = ['rule_{0}'.format(i) for i in range(20)]
+        sensor.cron_rules = dict((r, mock.Mock(ref=r)) for r in rule_refs)
+        owned = sensor.get_owned_rules(list(sensor.cron_rules.values()), 0)
+        owned_refs = [rule.ref for rule in owned]
+        self.assertTrue(2 < len(owned_refs) < len(rule_refs))
+
+        # The rules of the other node were loaded from its shards, not updated here
+        sensor.kv_enforcements = {
+            'deleted_rule': {'enforcement_id': 'b', 'previous_state': 'error'}}
+        for rule_ref in rule_refs:
+            sensor.kv_enforcements[rule_ref] = {'enforcement_id': 'old',
+                                                'previous_state': 'error'}
+        for rule_ref in owned_refs:
+            sensor._set_rule_state(rule_ref, 'id', 'error')
+
+        removed, evicted = sensor.compact_state()
+        self.assertEqual(evicted, len(owned_refs) - 2)
+        self.assertEqual(sorted(r for r in sensor.kv_enforcements if r in owned_refs),
+                         sorted(owned_refs[-2:]))
+        # The other node's rules are left to it
+        self.assertTrue(all(r in sensor.kv_enforcements
+                            for r in rule_refs if r not in owned_refs))
+        self.assertEqual(removed, 1 if sensor._owns_rule('deleted_rule') else 0)
+
+    def test_compact_state_sharded(self):
+        sensor = self.get_compaction_sensor(state_shards='per_rule')
+        for rule_ref in sensor.kv_enforcements:
+            sensor._mark_dirty(rule_ref)
+        sensor.save_state()
+        sensor.kv_enforcements = sensor.load_state()
+        self.assertIsNotNone(self.sensor_service.get_value('test_sensor_shard_deleted_rule'))
+
+        sensor.compact_state()
+        sensor.save_state()
+        self.assertIsNone(self.sensor_service.get_value('test_sensor_shard_deleted_rule'))
+        self.assertIsNotNone(self.sensor_service.get_value('test_sensor_shard_test_rule'))
+
+    @freeze_time("2018-10-26 01:30")
+    def test_poll_state_metrics(self):
+        sensor = self.get_compaction_sensor()
+        sensor.st2_fqdn = 'st2_test'
+        sensor.cron_rules = None
+        self.sensor_service.set_value('test_sensor', json.dumps({
+            'version': 2, 'rules': sensor.kv_enforcements}))
+        trigger_attributes = {
+            'type': "core.st2.CronTimer",
+            'parameters': {'hour': 1, 'minute': 0, 'second': 0}
+        }
+        sensor.st2_client = mock.MagicMock()
+        sensor.st2_client.rules.query.return_value = [
+            mock.Mock(ref='test_rule', trigger=trigger_attributes)]
+        sensor.st2_client.ruleenforcements.query.side_effect = [[], [mock.Mock()]]
+
+        sensor.poll()
+        self.assertEqual(list(sensor.kv_enforcements), ['test_rule'])
+        self.assertEqual(sensor.metrics.gauges, {
+            'state.rules': 1,
+            'state.bytes': len(self.sensor_service.get_value('test_sensor'))})
+        sensor.metrics.driver.set_gauge.assert_any_call('errors.cron_sensor.state.rules', 1)
+
+    @freeze_time("2018-10-26 01:00")
+    def test_poll_instrumentation(self):
+        sensor = self.get_compaction_sensor()
+        sensor.st2_fqdn = 'st2_test'
+        sensor.cron_rules = None
+        sensor.kv_enforcements = {}
+        trigger_attributes = {
+            'type': "core.st2.CronTimer",
+            'parameters': {'hour': 1, 'minute': 0, 'second': 0}
+        }
+        mock_enforcement = mock.Mock(id='test_enforcement',
+                                     enforced_at='2018-10-26T01:00:00.01Z',
+                                     execution_id='test_execution',
+                                     rule={'ref': 'test_rule'})
+        sensor.st2_client = mock.MagicMock()
+        sensor.st2_client.rules.query.return_value = [
+            mock.Mock(ref='test_rule', trigger=trigger_attributes)]
+        sensor.st2_client.ruleenforcements.query.return_value = [mock_enforcement]
+        sensor.st2_client.liveactions.get_by_id.return_value = mock.Mock(status='failed')
+
+        sensor.poll()
+        counters = sensor.metrics.counters
+        self.assertEqual(counters['polls'], 1)
+        self.assertEqual(counters['rules.checked'], 1)
+        self.assertEqual(counters['rules.dispatched'], 1)
+        self.assertEqual(counters['triggers.emitted'], 2)
+        self.assertEqual(counters['api.rules.query'], 1)
+        self.assertEqual(counters['api.ruleenforcements.query'], 1)
+        self.assertEqual(counters['api.liveactions.get_by_id'], 1)
+        self.assertNotIn('rules.deferred', counters)
+        self.assertEqual(sensor.metrics.timings['poll.duration']['count'], 1)
+        self.assertEqual(sensor.metrics.timings['rule.check_duration']['count'], 1)
+        self.assertEqual(list(sensor.rule_durations), ['test_rule'])
+        sensor.metrics.driver.time.assert_any_call('errors.cron_sensor.poll.duration',
+                                                   mock.ANY)
+
+        # A second poll with nothing new to report only counts the check
+        sensor.poll()
+        self.assertEqual(sensor.metrics.counters['polls'], 2)
+        self.assertEqual(sensor.metrics.counters['rules.dispatched'], 1)
+
+    def test_cached_enforcement_without_execution(self):
+        enforcement = CachedEnforcement({'id': 'test_id',
+                                         'enforced_at': '2018-10-26T01:00:00.000000Z',
+                                         'rule_ref': 'test_rule'})
+        self.assertFalse(hasattr(enforcement, 'execution_id'))
+        self.assertEqual(enforcement.rule, {'ref': 'test_rule'})
+
+    @freeze_time("2018-10-26 01:30")
+    def test_poll_not_run_with_history(self):
+        sensor = self.get_sensor_instance()
+        sensor.st2_fqdn = 'st2_test'
+        sensor.kv_sensor_name = 'test_sensor'
+
+        trigger_attributes = {
+            'type': "core.st2.CronTimer",
+            'parameters': {'hour': 1, 'minute': 0, 'second': 0}
+        }
+        mock_rule = mock.Mock(ref='test_rule', trigger=trigger_attributes)
+
+        mock_st2_client = mock.MagicMock()
+        mock_st2_client.rules.query.return_value = [mock_rule]
+        # Nothing in the window but the rule ran before
+        mock_st2_client.ruleenforcements.query.side_effect = [[], [mock.Mock()]]
+        sensor.st2_client = mock_st2_client
+
+        trigger_payload = {
+            'st2_rule_name': 'test_rule',
+            'st2_server': 'st2_test',
+            'st2_execution_id': '',
+            'st2_comments': 'Cron job did not run',
+            'st2_state': 'open'
+        }
+
+        sensor.poll()
+        mock_st2_client.ruleenforcements.query.assert_called_with(rule_ref='test_rule',
+                                                                  limit=1)
+        self.assertTriggerDispatched(trigger='errors.error_cron_event',
+                                     payload=trigger_payload)
+
+    def test_poll_schedule_checks(self):
+        sensor = self.get_sensor_instance({'error_cron_event': {'datastore_key': 'test_key',
+                                                                'schedule_checks': True}},
+                                          poll_interval=300)
+        sensor.st2_fqdn = 'st2_test'
+        sensor.kv_sensor_name = 'test_sensor'
+
+        trigger_attributes = {
+            'type': "core.st2.CronTimer",
+            'parameters': {'hour': 1, 'minute': 0, 'second': 0}
+        }
+        mock_rule = mock.Mock(ref='test_rule', trigger=trigger_attributes)
+        mock_enforcement = mock.Mock(id='test_id',
+                                     enforced_at='2018-10-26T01:00:00.010000Z',
+                                     execution_id='test_execution',
+                                     rule={'ref': 'test_rule'})
+
+        mock_st2_client = mock.MagicMock()
+        mock_st2_client.rules.query.return_value = [mock_rule]
+        mock_st2_client.ruleenforcements.query.return_value = [mock_enforcement]
+        mock_st2_client.liveactions.get_by_id.return_value = mock.Mock(status='running')
+        sensor.st2_client = mock_st2_client
+
+        # A running execution is checked again on the next poll
+        with freeze_time("2018-10-26 01:30"):
+            sensor.poll()
+        self.assertEqual(sensor.get_poll_interval(), 300)
+        self.assertEqual(mock_st2_client.ruleenforcements.query.call_count, 1)
+
+        mock_st2_client.liveactions.get_by_id.return_value = mock.Mock(status='succeeded')
+        with freeze_time("2018-10-26 01:35"):
+            sensor.poll()
+        self.assertEqual(mock_st2_client.ruleenforcements.query.call_count, 2)
+
+        # Once it succeeded the rule isn't checked until a grace period after its next run
+        with freeze_time("2018-10-26 12:00"):
+            sensor.poll()
+        self.assertEqual(mock_st2_client.ruleenforcements.query.call_count, 2)
+
+        with freeze_time("2018-10-27 00:59"):
+            sensor.poll()
+        self.assertEqual(sensor.get_poll_interval(), 120)
+
+        with freeze_time("2018-10-27 01:01"):
+            sensor.poll()
+        self.assertEqual(mock_st2_client.ruleenforcements.query.call_count, 3)
+
+    def test_poll_schedule_checks_parameters_changed(self):
+        sensor = self.get_sensor_instance({'error_cron_event': {'datastore_key': 'test_key',
+                                                                'schedule_checks': True,
+                                                                'rule_refresh_interval': 0}},
+                                          poll_interval=300)
+        sensor.st2_fqdn = 'st2_test'
+        sensor.kv_sensor_name = 'test_sensor'
+
+        mock_rule = mock.Mock(ref='test_rule', trigger={
+            'type': "core.st2.CronTimer",
+            'parameters': {'hour': 1, 'minute': 0, 'second': 0}
+        })
+        mock_st2_client = mock.MagicMock()
+        mock_st2_client.rules.query.return_value = [mock_rule]
+        mock_st2_client.ruleenforcements.query.return_value = []
+        sensor.st2_client = mock_st2_client
+
+        with freeze_time("2018-10-26 01:30"):
+            sensor.poll()
+            self.assertEqual(sensor.scheduler.due_times,
+                             {'test_rule': (datetime.datetime(2018, 10, 27, 1, 1, tzinfo=pytz.UTC)
+                                            .timestamp())})
+
+            mock_rule.trigger['parameters'] = {'hour': 2, 'minute': 0, 'second': 0}
+            sensor.poll()
+            self.assertEqual(sensor.scheduler.due_times,
+                             {'test_rule': (datetime.datetime(2018, 10, 26, 2, 1, tzinfo=pytz.UTC)
+                                            .timestamp())})
+
+            # Removed rules are dropped from the scheduler
+            mock_st2_client.rules.query.return_value = []
+            sensor.poll()
+            self.assertEqual(len(sensor.scheduler), 0)
+            self.assertEqual(sensor.scheduled_keys, {})
+
+    @freeze_time("2018-10-26 01:30")
+    def test_poll_concurrent(self):
+        sensor = self.get_sensor_instance({'error_cron_event': {'datastore_key': 'test_key',
+                                                                'check_concurrency': 3}})
+        sensor.st2_fqdn = 'st2_test'
+        sensor.kv_sensor_name = 'test_sensor'
+
+        trigger_attributes = {
+            'type': "core.st2.CronTimer",
+            'parameters': {'hour': 1, 'minute': 0, 'second': 0}
+        }
+        rule_refs = ['test_rule_1', 'test_rule_2', 'test_rule_3']
+        mock_rules = [mock.Mock(ref=ref, trigger=trigger_attributes) for ref in rule_refs]
+
+        def query(rule_ref, **kwargs):
+            return [mock.Mock(id=rule_ref + '_enforcement',
+                              enforced_at='2018-10-26T01:00:00.010000Z',
+                              execution_id=rule_ref + '_execution',
+                              rule={'ref': rule_ref})]
+
+        # Each lookup waits until all three are in flight, so this only passes when
+        # the rules are checked concurrently
+        barrier = threading.Barrier(3, timeout=5)
+
+        def get_by_id(execution_id):
+            barrier.wait()
+            return mock.Mock(status='failed')
+
+        mock_st2_client = mock.MagicMock()
+        mock_st2_client.rules.query.return_value = mock_rules
+        mock_st2_client.ruleenforcements.query.side_effect = query
+        mock_st2_client.liveactions.get_by_id.side_effect = get_by_id
+        sensor.st2_client = mock_st2_client
+
+        sensor.poll()
+        # Triggers are dispatched in rule order
+        dispatched = [t['payload']['st2_rule_name'] for t in self.get_dispatched_triggers()
+                      if t['trigger'] == 'errors.error_cron_event']
+        self.assertEqual(dispatched, rule_refs)
+        self.assertEqual(sensor.kv_enforcements, dict(
+            (ref, {'enforcement_id': ref + '_enforcement', 'previous_state': 'error'})
+            for ref in rule_refs))
+
+    @freeze_time("2018-10-26 01:30")
+    def test_poll_bulk_execution_statuses(self):
+        sensor = self.get_sensor_instance({'error_cron_event': {
+            'datastore_key': 'test_key',
+            'bulk_execution_statuses': True,
+            'enforcement_page_size': 2}})
+        sensor.st2_fqdn = 'st2_test'
+        sensor.kv_sensor_name = 'test_sensor'
+
+        trigger_attributes = {
+            'type': "core.st2.CronTimer",
+            'parameters': {'hour': 1, 'minute': 0, 'second': 0}
+        }
+        rule_refs = ['test_rule_1', 'test_rule_2']
+        mock_rules = [mock.Mock(ref=ref, trigger=trigger_attributes) for ref in rule_refs]
+
+        def query(rule_ref, **kwargs):
+            return [mock.Mock(id=rule_ref + '_enforcement',
+                              enforced_at='2018-10-26T01:00:00.010000Z',
+                              execution_id=rule_ref + '_execution',
+                              rule={'ref': rule_ref})]
+
+        mock_st2_client = mock.MagicMock()
+        mock_st2_client.rules.query.return_value = mock_rules
+        mock_st2_client.ruleenforcements.query.side_effect = query
+        # The second execution isn't in the bulk results and is fetched on its own
+        mock_st2_client.liveactions.query.return_value = [
+            mock.Mock(id='test_rule_1_execution', status='failed')]
+        mock_st2_client.liveactions.get_by_id.return_value = mock.Mock(status='succeeded')
+        sensor.st2_client = mock_st2_client
+
+        sensor.poll()
+        mock_st2_client.liveactions.query.assert_called_once_with(
+            timestamp_gt='2018-10-26T00:59:00.010000Z',
+            trigger_type='core.st2.CronTimer',
+            include_attributes='id,status',
+            limit=2,
+            offset=0)
+        # The failed execution is only fetched in full to classify its error
+        self.assertCountEqual(mock_st2_client.liveactions.get_by_id.call_args_list,
+                              [mock.call('test_rule_2_execution'),
+                               mock.call('test_rule_1_execution')])
+        self.assertEqual(sensor.execution_statuses, {'test_rule_1_execution': 'failed',
+                                                     'test_rule_2_execution': 'succeeded'})
+        self.assertEqual(sensor.kv_enforcements, {'test_rule_1': {
+            'enforcement_id': 'test_rule_1_enforcement', 'previous_state': 'error'}})
+
+    def test_fetch_execution_statuses_max_pages(self):
+        sensor = self.get_sensor_instance({'error_cron_event': {
+            'bulk_execution_statuses': True,
+            'enforcement_page_size': 2,
+            'execution_status_max_pages': 1}})
+        previous_cron = datetime.datetime(2018, 10, 26, 1, 0, tzinfo=pytz.UTC)
+        next_cron = datetime.datetime(2018, 10, 27, 1, 0, tzinfo=pytz.UTC)
+        checks = []
+        for i in range(3):
+            enforcement = mock.Mock(id='enforcement_{0}'.format(i),
+                                    enforced_at='2018-10-26T01:00:00.010000Z',
+                                    execution_id='execution_{0}'.format(i))
+            checks.append((mock.Mock(ref='rule_{0}'.format(i)), previous_cron, next_cron,
+                           [enforcement], True))
+
+        sensor.st2_client = mock.MagicMock()
+        sensor.st2_client.liveactions.query.return_value = [
+            mock.Mock(id='other', status='succeeded')] * 2
+        sensor.fetch_execution_statuses(checks)
+        # Three executions are two pages worth, so up to two pages are read
+        self.assertEqual(sensor.st2_client.liveactions.query.call_count, 2)
+        self.assertEqual(sensor.execution_statuses, {})
+
+    @freeze_time("2018-10-26 01:30")
+    def test_poll_terminal_status_cache(self):
+        sensor = self.get_sensor_instance()
+        sensor.st2_fqdn = 'st2_test'
+        sensor.kv_sensor_name = 'test_sensor'
+
+        mock_rule = mock.Mock(ref='test_rule', trigger={
+            'type': "core.st2.CronTimer",
+            'parameters': {'hour': 1, 'minute': 0, 'second': 0}
+        })
+        mock_enforcement = mock.Mock(id='test_id',
+                                     enforced_at='2018-10-26T01:00:00.010000Z',
+                                     execution_id='test_execution',
+                                     rule={'ref': 'test_rule'})
+
+        mock_st2_client = mock.MagicMock()
+        mock_st2_client.rules.query.return_value = [mock_rule]
+        mock_st2_client.ruleenforcements.query.return_value = [mock_enforcement]
+        mock_st2_client.liveactions.get_by_id.return_value = mock.Mock(status='running')
+        sensor.st2_client = mock_st2_client
+
+        # Running executions are fetched again on every poll
+        sensor.poll()
+        mock_st2_client.liveactions.get_by_id.return_value = mock.Mock(status='succeeded')
+        sensor.poll()
+        self.assertEqual(mock_st2_client.liveactions.get_by_id.call_count, 2)
+
+        # Finished executions are only fetched once
+        sensor.poll()
+        self.assertEqual(mock_st2_client.liveactions.get_by_id.call_count, 2)
+        self.assertEqual(sensor.terminal_statuses.get('test_execution'), 'succeeded')
+
+    @freeze_time("2018-10-26 01:30")
+    def test_poll_partitioned(self):
+        trigger_attributes = {
+            'type': "core.st2.CronTimer",
+            'parameters': {'hour': 1, 'minute': 0, 'second': 0}
+        }
+        rule_refs = ['test_rule_{0}'.format(i) for i in range(20)]
+        mock_st2_client = mock.MagicMock()
+        mock_st2_client.rules.query.return_value = [
+            mock.Mock(ref=ref, trigger=trigger_attributes) for ref in rule_refs]
+        mock_st2_client.ruleenforcements.query.return_value = []
+
+        sensors = []
+        for node in ['node_a', 'node_b']:
+            sensor = self.get_sensor_instance({'error_cron_event': {
+                'partitioning': True,
+                'partition_node': node,
+                'partition_members': ['node_a', 'node_b']}})
+            sensor.st2_fqdn = 'st2_test'
+            sensor.kv_sensor_name = 'test_sensor'
+            sensor.st2_client = mock_st2_client
+            sensors.append(sensor)
+
+        for sensor in sensors:
+            sensor.poll()
+
+        # Every rule is checked and dispatched by exactly one node
+        dispatched = [t['payload']['st2_rule_name'] for t in self.get_dispatched_triggers()
+                      if t['trigger'] == 'errors.error_cron_event']
+        self.assertEqual(sorted(dispatched), sorted(rule_refs))
+        self.assertTrue(0 < len(sensors[0].schedules) < len(rule_refs))
+        self.assertEqual(len(sensors[0].schedules) + len(sensors[1].schedules),
+                         len(rule_refs))
+
+        # The state of each rule has its own key
+        self.assertEqual(self.get_datastore_names('test_sensor_shard_'),
+                         sorted('test_sensor_shard_' + ref for ref in rule_refs))
+
+        # Neither node dispatches again on the next poll
+        for sensor in sensors:
+            sensor.poll()
+        self.assertEqual(len(self.get_dispatched_triggers()), 2 * len(rule_refs))
+
+    def test_get_partition_members_datastore(self):
+        sensor = self.get_sensor_instance({'error_cron_event': {'partitioning': True,
+                                                                'partition_node': 'node_a',
+                                                                'partition_member_ttl': 900}})
+        sensor.kv_sensor_name = 'test_sensor'
+        self.sensor_service.set_value('test_sensor_member_node_b', '1500')
+        self.sensor_service.set_value('test_sensor_member_node_c', '100')
+
+        # The heartbeat expires on its own, the mock datastore doesn't support ttl
+        with mock.patch.object(self.sensor_service, 'set_value') as mock_set_value:
+            self.assertEqual(sensor.get_partition_members(2000), ['node_a', 'node_b'])
+        mock_set_value.assert_called_once_with(name='test_sensor_member_node_a',
+                                               value='2000', ttl=900)
+
+    @freeze_time("2018-10-26 01:30")
+    def test_poll_digest(self):
+        sensor = self.get_sensor_instance({'error_cron_event': {'trigger_mode': 'digest',
+                                                                'digest_max_events': 2}})
+        sensor.st2_fqdn = 'st2_test'
+        sensor.kv_sensor_name = 'test_sensor'
+
+        trigger_attributes = {
+            'type': "core.st2.CronTimer",
+            'parameters': {'hour': 1, 'minute': 0, 'second': 0}
+        }
+        rule_refs = ['test_rule_1', 'test_rule_2', 'test_rule_3']
+        mock_st2_client = mock.MagicMock()
+        mock_st2_client.rules.query.return_value = [
+            mock.Mock(ref=ref, trigger=trigger_attributes) for ref in rule_refs]
+        mock_st2_client.ruleenforcements.query.return_value = []
+        sensor.st2_client = mock_st2_client
+
+        sensor.poll()
+        triggers = self.get_dispatched_triggers()
+        self.assertEqual([t['trigger'] for t in triggers],
+                         ['errors.error_cron_event_digest', 'errors.error_cron_event_digest'])
+        self.assertEqual(triggers[0]['payload']['st2_server'], 'st2_test')
+        self.assertEqual([t['payload']['st2_event_count'] for t in triggers], [2, 1])
+        self.assertEqual(triggers[1]['payload']['st2_events'], [{
+            'st2_rule_name': 'test_rule_3',
+            'st2_execution_id': '',
+            'st2_comments': 'Cron job is not running and no enforcements can be found',
+            'st2_state': 'open',
+            'st2_previous_state': 'unknown',
+            'st2_error_category': 'unknown'
+        }])
+        self.assertEqual(sorted(sensor.kv_enforcements), rule_refs)
+
+        # Rules already in error aren't sent again
+        sensor.poll()
+        self.assertEqual(len(self.get_dispatched_triggers()), 2)
+
+    @freeze_time("2018-10-26 01:30")
+    def test_poll_time_budget(self):
+        sensor = self.get_sensor_instance({'error_cron_event': {'poll_time_budget': 15}})
+        sensor.st2_fqdn = 'st2_test'
+        sensor.kv_sensor_name = 'test_sensor'
+
+        trigger_attributes = {
+            'type': "core.st2.CronTimer",
+            'parameters': {'hour': 1, 'minute': 0, 'second': 0}
+        }
+        rule_refs = ['test_rule_{0}'.format(i) for i in range(1, 6)]
+        clock = [0]
+        fetched = []
+
+        # Every enforcements query takes 10 seconds
+        def query(rule_ref, **kwargs):
+            clock[0] += 10
+            fetched.append(rule_ref)
+            return [mock.Mock(id=rule_ref + '_enforcement',
+                              enforced_at='2018-10-26T01:00:00.010000Z',
+                              execution_id=rule_ref + '_execution',
+                              rule={'ref': rule_ref})]
+
+        mock_st2_client = mock.MagicMock()
+        mock_st2_client.rules.query.return_value = [
+            mock.Mock(ref=ref, trigger=trigger_attributes) for ref in reversed(rule_refs)]
+        mock_st2_client.ruleenforcements.query.side_effect = query
+        mock_st2_client.liveactions.get_by_id.return_value = mock.Mock(status='succeeded')
+        sensor.st2_client = mock_st2_client
+
+        with mock.patch('time.monotonic', lambda: clock[0]):
+            sensor.poll()
+            self.assertEqual(fetched, ['test_rule_1', 'test_rule_2'])
+            self.assertEqual(sensor.deferred_rules, 3)
+            self.assertEqual(self.sensor_service.get_value('test_sensor_cursor'), 'test_rule_2')
+
+            sensor.poll()
+            sensor.poll()
+            self.assertEqual(fetched, ['test_rule_1', 'test_rule_2', 'test_rule_3',
+                                       'test_rule_4', 'test_rule_5', 'test_rule_1'])
+
+            # The cursor survives a restart
+            restarted = self.get_sensor_instance({'error_cron_event': {'poll_time_budget': 15}})
+            restarted.st2_fqdn = 'st2_test'
+            restarted.kv_sensor_name = 'test_sensor'
+            restarted.st2_client = mock_st2_client
+            restarted.poll()
+            self.assertEqual(fetched[6:], ['test_rule_2', 'test_rule_3'])
 
     def test_check_enforcements_date_error(self):
         sensor = self.get_sensor_instance()
@@ -141,7 +1040,9 @@ class CronSensorTestCase(BaseSensorTestCase):
         self.assertEqual(result_value, False)
         self.assertTriggerDispatched(trigger='errors.error_cron_event',
                                      payload=trigger_payload)
-        self.assertEqual(sensor.kv_enforcements, {'test_rule': 'error without enforcement id'})
+        self.assertEqual(sensor.kv_enforcements, {
+            'test_rule': {'enforcement_id': 'error without enforcement id',
+                          'previous_state': 'open'}})
 
     def test_check_enforcements_error(self):
         sensor = self.get_sensor_instance()
@@ -176,12 +1077,53 @@ class CronSensorTestCase(BaseSensorTestCase):
         self.assertEqual(result_value, False)
         self.assertTriggerDispatched(trigger='errors.error_cron_event',
                                      payload=trigger_payload)
-        self.assertEqual(sensor.kv_enforcements, {'test_rule': 'test_id'})
+        self.assertEqual(sensor.kv_enforcements, {
+            'test_rule': {'enforcement_id': 'test_id', 'previous_state': 'error'}})
+
+    def get_error_category(self, execution=None, failure_reason=None):
+        sensor = self.get_sensor_instance()
+        sensor.st2_fqdn = 'st2_test'
+        sensor.kv_enforcements = {}
+        mock_enforcement = mock.Mock(id='test_id',
+                                     enforced_at='2018-10-26T01:00:00.01Z',
+                                     execution_id='test_execution',
+                                     rule={'ref': 'test_rule'})
+        if execution is None:
+            del mock_enforcement.execution_id
+        sensor.st2_client = mock.MagicMock()
+        sensor.st2_client.liveactions.get_by_id.return_value = execution
+        sensor.st2_client.ruleenforcements.get_by_id.return_value = mock.Mock(
+            failure_reason=failure_reason)
+
+        sensor.check_enforcements(
+            [mock_enforcement],
+            datetime.datetime(2018, 10, 26, 1, 0).replace(tzinfo=pytz.UTC),
+            datetime.datetime(2018, 10, 27, 1, 0).replace(tzinfo=pytz.UTC))
+        enhanced = [t['payload'] for t in self.sensor_service.dispatched_triggers
+                    if t['trigger'] == 'errors.error_cron_event_enhanced']
+        return enhanced[-1]['st2_error_category']
+
+    def test_check_enforcements_error_category_timeout(self):
+        execution = mock.Mock(status='timeout', result={'error': 'something happened'})
+        self.assertEqual(self.get_error_category(execution), 'timeout')
+
+    def test_check_enforcements_error_category_from_result(self):
+        execution = mock.Mock(status='failed',
+                              result={'stderr': 'Permission denied (publickey)'})
+        self.assertEqual(self.get_error_category(execution), 'auth_failure')
+
+        execution = mock.Mock(status='failed', result={'output': {'error': 'Quota exceeded'}})
+        self.assertEqual(self.get_error_category(execution), 'quota')
+
+    def test_check_enforcements_error_category_failure_reason(self):
+        self.assertEqual(self.get_error_category(
+            failure_reason="Unable to render expression {{ foo }}"), 'jinja_yaql')
 
     def test_check_enforcements_error_no_dispatch(self):
         sensor = self.get_sensor_instance()
         sensor.st2_fqdn = 'st2_test'
-        sensor.kv_enforcements = {'test_rule': 'test_id'}
+        sensor.kv_enforcements = {
+            'test_rule': {'enforcement_id': 'test_id', 'previous_state': 'error'}}
 
         mock_enforcement = mock.Mock(id='test_id',
                                      enforced_at='2018-10-26T01:00:00.01Z',
@@ -201,12 +1143,14 @@ class CronSensorTestCase(BaseSensorTestCase):
 
         result_value = sensor.check_enforcements(**test_dict)
         self.assertEqual(result_value, False)
-        self.assertEqual(sensor.kv_enforcements, {'test_rule': 'test_id'})
+        self.assertEqual(sensor.kv_enforcements, {
+            'test_rule': {'enforcement_id': 'test_id', 'previous_state': 'error'}})
 
     def test_check_enforcements_error_running(self):
         sensor = self.get_sensor_instance()
         sensor.st2_fqdn = 'st2_test'
-        sensor.kv_enforcements = {'test_rule': 'test_id'}
+        sensor.kv_enforcements = {
+            'test_rule': {'enforcement_id': 'test_id', 'previous_state': 'error'}}
 
         mock_enforcement = mock.Mock(id='test_id',
                                      enforced_at='2018-10-26T01:00:00.01Z',
@@ -226,12 +1170,14 @@ class CronSensorTestCase(BaseSensorTestCase):
 
         result_value = sensor.check_enforcements(**test_dict)
         self.assertEqual(result_value, False)
-        self.assertEqual(sensor.kv_enforcements, {'test_rule': 'test_id'})
+        self.assertEqual(sensor.kv_enforcements, {
+            'test_rule': {'enforcement_id': 'test_id', 'previous_state': 'error'}})
 
     def test_check_enforcements_success_dispatch(self):
         sensor = self.get_sensor_instance()
         sensor.st2_fqdn = 'st2_test'
-        sensor.kv_enforcements = {'test_rule': 'test_id'}
+        sensor.kv_enforcements = {
+            'test_rule': {'enforcement_id': 'test_id', 'previous_state': 'error'}}
 
         mock_enforcement = mock.Mock(id='test_id',
                                      enforced_at='2018-10-26T01:00:00.01Z',
@@ -259,7 +1205,8 @@ class CronSensorTestCase(BaseSensorTestCase):
 
         result_value = sensor.check_enforcements(**test_dict)
         self.assertEqual(result_value, True)
-        self.assertEqual(sensor.kv_enforcements, {'test_rule': 'test_id'})
+        self.assertEqual(sensor.kv_enforcements, {
+            'test_rule': {'enforcement_id': 'test_id', 'previous_state': 'success'}})
         self.assertTriggerDispatched(trigger='errors.error_cron_event',
                                      payload=trigger_payload)
 
@@ -297,7 +1244,8 @@ class CronSensorTestCase(BaseSensorTestCase):
         self.assertEqual(result_value, False)
         self.assertTriggerDispatched(trigger='errors.error_cron_event',
                                      payload=trigger_payload)
-        self.assertEqual(sensor.kv_enforcements, {'test_rule': 'test_id'})
+        self.assertEqual(sensor.kv_enforcements, {
+            'test_rule': {'enforcement_id': 'test_id', 'previous_state': 'error'}})
 
     def test_check_enforcements_no_execution_jinja_escaping(self):
         sensor = self.get_sensor_instance()
@@ -334,7 +1282,8 @@ class CronSensorTestCase(BaseSensorTestCase):
         self.assertEqual(result_value, False)
         self.assertTriggerDispatched(trigger='errors.error_cron_event',
                                      payload=trigger_payload)
-        self.assertEqual(sensor.kv_enforcements, {'test_rule': 'test_id'})
+        self.assertEqual(sensor.kv_enforcements, {
+            'test_rule': {'enforcement_id': 'test_id', 'previous_state': 'error'}})
 
     def test_check_enforcements_true(self):
         sensor = self.get_sensor_instance()
@@ -397,7 +1346,8 @@ class CronSensorTestCase(BaseSensorTestCase):
 
     def test_check_before_dispatch_enforcement_id(self):
         sensor = self.get_sensor_instance()
-        sensor.kv_enforcements = {'test_rule': 'test_enforcement'}
+        sensor.kv_enforcements = {'test_rule': {'enforcement_id': 'test_enforcement',
+                                                'previous_state': 'error'}}
         test_dict = {
             'st2_rule_name': 'test_rule',
             'st2_enforcement_id': 'test_enforcement'
@@ -408,7 +1358,9 @@ class CronSensorTestCase(BaseSensorTestCase):
 
     def test_check_before_dispatch_no_enforcement_id(self):
         sensor = self.get_sensor_instance()
-        sensor.kv_enforcements = {'test_rule': 'error without enforcement id'}
+        sensor.kv_enforcements = {
+            'test_rule': {'enforcement_id': 'error without enforcement id',
+                          'previous_state': 'open'}}
         test_dict = {
             'st2_rule_name': 'test_rule',
             'st2_enforcement_id': None
@@ -445,6 +1397,32 @@ class CronSensorTestCase(BaseSensorTestCase):
         result_value = sensor.get_cron_rules()
         self.assertEqual(result_value, [mock_rule1, mock_rule2])
 
+    def test_rule_refresh_interval_default(self):
+        sensor_yaml = os.path.join(os.path.dirname(__file__), '..', 'sensors',
+                                   'cron_sensor.yaml')
+        with open(sensor_yaml) as f:
+            poll_interval = yaml.safe_load(f)['poll_interval']
+        # The rules are only downloaded again after several polls
+        sensor = self.get_sensor_instance(poll_interval=poll_interval)
+        self.assertEqual(sensor.rule_refresh_interval, 3600)
+        self.assertGreater(sensor.rule_refresh_interval, poll_interval)
+
+    def test_load_cron_rules(self):
+        sensor = self.get_sensor_instance({'error_cron_event': {'rule_refresh_interval': 3600}})
+        mock_rule = mock.Mock(ref='test_rule', trigger={'type': "core.st2.CronTimer"})
+
+        mock_st2_client = mock.MagicMock()
+        mock_st2_client.rules.query.return_value = [mock_rule]
+        sensor.st2_client = mock_st2_client
+
+        self.assertEqual(sensor.load_cron_rules(1000), [mock_rule])
+        self.assertEqual(sensor.load_cron_rules(2000), [mock_rule])
+        self.assertEqual(mock_st2_client.rules.query.call_count, 1)
+
+        # The catalogue is downloaded again after the refresh interval
+        sensor.load_cron_rules(4600)
+        self.assertEqual(mock_st2_client.rules.query.call_count, 2)
+
     def test_convert_to_crontab_all(self):
         sensor = self.get_sensor_instance()
         test_dict = {
@@ -533,6 +1511,201 @@ class CronSensorTestCase(BaseSensorTestCase):
         expected = {'test_rule': {'enforcement_id': 'test_enforcement', 'previous_state': 'error'}}
         self.assertEqual(sensor.kv_enforcements, expected)
 
+    def test_load_state_legacy(self):
+        sensor = self.get_sensor_instance()
+        sensor.kv_sensor_name = 'test_sensor'
+        self.sensor_service.set_value('test_sensor', str({'test_rule': 'test_id'}))
+
+        sensor.kv_enforcements = sensor.load_state()
+        self.assertEqual(sensor.kv_enforcements,
+                         {'test_rule': {'enforcement_id': 'test_id', 'previous_state': 'unknown'}})
+
+        # Migrated state is written back as versioned JSON
+        sensor.save_state()
+        self.assertEqual(json.loads(self.sensor_service.get_value('test_sensor')), {
+            'version': 2,
+            'rules': {'test_rule': {'enforcement_id': 'test_id', 'previous_state': 'unknown'}}})
+
+    def test_save_state_unchanged(self):
+        sensor = self.get_sensor_instance()
+        sensor.kv_sensor_name = 'test_sensor'
+        state = {'version': 2,
+                 'rules': {'test_rule': {'enforcement_id': 'test_id', 'previous_state': 'error'}}}
+        self.sensor_service.set_value('test_sensor', json.dumps(state))
+
+        sensor.kv_enforcements = sensor.load_state()
+        sensor._set_rule_state('test_rule', 'test_id', 'error')
+        sensor.delete_from_kv('other_rule')
+        with mock.patch.object(self.sensor_service, 'set_value') as mock_set_value:
+            sensor.save_state()
+            mock_set_value.assert_not_called()
+
+            sensor.delete_from_kv('test_rule')
+            sensor.save_state()
+            mock_set_value.assert_called_once_with(
+                name='test_sensor', value=json.dumps({'rules': {}, 'version': 2}))
+
+    def get_datastore_names(self, prefix):
+        # The datastore prefixes the names of the sensor's local keys
+        return sorted(kv_pair.name.split(':', 1)[-1]
+                      for kv_pair in self.sensor_service.list_values(prefix=prefix))
+
+    def test_sharded_state_migrates_single_key(self):
+        sensor = self.get_sensor_instance({'error_cron_event': {'state_shards': 4}})
+        sensor.kv_sensor_name = 'test_sensor'
+        self.sensor_service.set_value('test_sensor', str({'rule_a': 'id_a', 'rule_b': 'id_b'}))
+
+        sensor.kv_enforcements = sensor.load_state()
+        sensor.save_state()
+
+        self.assertIsNone(self.sensor_service.get_value('test_sensor'))
+        reloaded = self.get_sensor_instance({'error_cron_event': {'state_shards': 4}})
+        reloaded.kv_sensor_name = 'test_sensor'
+        self.assertEqual(reloaded.load_state(), {
+            'rule_a': {'enforcement_id': 'id_a', 'previous_state': 'unknown'},
+            'rule_b': {'enforcement_id': 'id_b', 'previous_state': 'unknown'}})
+        self.assertFalse(reloaded.state_dirty)
+        self.assertIsNone(self.sensor_service.get_value('test_sensor'))
+        self.assertEqual(len(self.get_datastore_names('test_sensor_shard_')),
+                         len(reloaded.loaded_shards))
+
+    def test_sharded_state_writes_changed_shards(self):
+        sensor = self.get_sensor_instance({'error_cron_event': {'state_shards': 16}})
+        sensor.kv_sensor_name = 'test_sensor'
+        sensor.kv_enforcements = sensor.load_state()
+        sensor._set_rule_state('rule_a', 'id_a', 'error')
+        sensor._set_rule_state('rule_b', 'id_b', 'error')
+        sensor.save_state()
+
+        shard_a = 'test_sensor_shard_{0}'.format(sensor.get_shard('rule_a'))
+        shard_b = 'test_sensor_shard_{0}'.format(sensor.get_shard('rule_b'))
+        self.assertNotEqual(shard_a, shard_b)
+
+        sensor.kv_enforcements = sensor.load_state()
+        with mock.patch.object(self.sensor_service, 'set_value') as mock_set_value:
+            with mock.patch.object(self.sensor_service, 'delete_value') as mock_delete_value:
+                sensor.delete_from_kv('rule_a')
+                sensor.save_state()
+                mock_set_value.assert_not_called()
+                mock_delete_value.assert_called_once_with(name=shard_a)
+
+    def test_sharded_state_reshard(self):
+        sensor = self.get_sensor_instance({'error_cron_event': {'state_shards': 1}})
+        sensor.kv_sensor_name = 'test_sensor'
+        sensor.kv_enforcements = sensor.load_state()
+        for rule_ref in ['rule_a', 'rule_b', 'rule_c']:
+            sensor._set_rule_state(rule_ref, rule_ref + '_id', 'error')
+        sensor.save_state()
+        self.assertEqual(self.get_datastore_names('test_sensor'), ['test_sensor_shard_0'])
+
+        resharded = self.get_sensor_instance({'error_cron_event': {'state_shards': 8}})
+        resharded.kv_sensor_name = 'test_sensor'
+        resharded.kv_enforcements = resharded.load_state()
+        resharded.save_state()
+
+        expected = set('test_sensor_shard_{0}'.format(resharded.get_shard(rule_ref))
+                       for rule_ref in ['rule_a', 'rule_b', 'rule_c'])
+        self.assertEqual(set(self.get_datastore_names('test_sensor')), expected)
+        self.assertEqual(sorted(resharded.load_state()), ['rule_a', 'rule_b', 'rule_c'])
+
+    def test_sharded_state_bytes(self):
+        sensor = self.get_sensor_instance({'error_cron_event': {'state_shards': 8}})
+        sensor.kv_sensor_name = 'test_sensor'
+        sensor.kv_enforcements = sensor.load_state()
+        for rule_ref in ['rule_a', 'rule_b', 'rule_c']:
+            sensor._set_rule_state(rule_ref, rule_ref + '_id', 'error')
+        sensor.save_state()
+
+        def stored_bytes():
+            return sum(len(kv_pair.value)
+                       for kv_pair in self.sensor_service.list_values(prefix='test_sensor'))
+
+        # Shards read back and rewritten are only counted once
+        sensor.kv_enforcements = sensor.load_state()
+        sensor._set_rule_state('rule_a', 'rule_a_id', 'unknown')
+        sensor.save_state()
+        self.assertEqual(sum(sensor.state_bytes.values()), stored_bytes())
+
+        # Deleted shards are no longer counted
+        sensor.kv_enforcements = sensor.load_state()
+        sensor.delete_from_kv('rule_b')
+        sensor.save_state()
+        self.assertEqual(sum(sensor.state_bytes.values()), stored_bytes())
+        self.assertNotIn(sensor.get_shard('rule_b'), sensor.state_bytes)
+
+    def test_sharded_watermarks(self):
+        sensor = self.get_sensor_instance({'error_cron_event': {'state_shards': 16}})
+        sensor.kv_sensor_name = 'test_sensor'
+        self.sensor_service.set_value('test_sensor_watermarks',
+                                      json.dumps({'rule_a': {'id': 'a'}}))
+
+        # The single watermarks key is moved into the shards
+        sensor.watermarks = sensor.load_watermarks()
+        self.assertEqual(sensor.watermarks, {'rule_a': {'id': 'a'}})
+        sensor.watermarks['rule_b'] = {'id': 'b'}
+        sensor.save_watermarks()
+        self.assertIsNone(self.sensor_service.get_value('test_sensor_watermarks'))
+        shard_a = 'test_sensor_watermarks_shard_{0}'.format(sensor.get_shard('rule_a'))
+        shard_b = 'test_sensor_watermarks_shard_{0}'.format(sensor.get_shard('rule_b'))
+        self.assertNotEqual(shard_a, shard_b)
+        self.assertEqual(self.get_datastore_names('test_sensor_watermarks'),
+                         sorted([shard_a, shard_b]))
+
+        # Only the shards whose watermarks changed are written
+        sensor.watermarks = sensor.load_watermarks()
+        self.assertEqual(sensor.watermarks, {'rule_a': {'id': 'a'}, 'rule_b': {'id': 'b'}})
+        with mock.patch.object(self.sensor_service, 'set_value') as mock_set_value:
+            with mock.patch.object(self.sensor_service, 'delete_value') as mock_delete_value:
+                sensor.watermarks['rule_a'] = {'id': 'a2'}
+                del sensor.watermarks['rule_b']
+                sensor.save_watermarks()
+                mock_set_value.assert_called_once_with(
+                    name=shard_a, value=json.dumps({'rule_a': {'id': 'a2'}}))
+                mock_delete_value.assert_called_once_with(name=shard_b)
+
+    def test_sharded_watermarks_partitioned(self):
+        sensor = self.get_sensor_instance({'error_cron_event': {
+            'partitioning': True, 'partition_node': 'node_a',
+            'partition_members': ['node_a', 'node_b']}})
+        sensor.kv_sensor_name = 'test_sensor'
+        rule_refs = ['rule_{0}'.format(i) for i in range(20)]
+        owned = [rule.ref for rule in sensor.get_owned_rules(
+            [mock.Mock(ref=r) for r in rule_refs], 0)]
+        other = [r for r in rule_refs if r not in owned]
+        self.assertTrue(owned and other)
+        for rule_ref in rule_refs:
+            self.sensor_service.set_value('test_sensor_watermarks_shard_' + rule_ref,
+                                          json.dumps({rule_ref: {'id': 'old'}}))
+
+        # The node drops the watermarks of the other node's rules without deleting them
+        sensor.watermarks = sensor.load_watermarks()
+        sensor.watermarks = dict((r, {'id': 'new'}) for r in owned)
+        sensor.save_watermarks()
+        for rule_ref in rule_refs:
+            watermarks = json.loads(self.sensor_service.get_value(
+                'test_sensor_watermarks_shard_' + rule_ref))
+            self.assertEqual(watermarks[rule_ref]['id'], 'new' if rule_ref in owned else 'old')
+
+    @freeze_time("2018-10-26 01:30")
+    def test_poll_unchanged_no_write(self):
+        sensor = self.get_sensor_instance()
+        sensor.st2_fqdn = 'st2_test'
+        sensor.kv_sensor_name = 'test_sensor'
+
+        mock_rule = mock.Mock(ref='test_rule', trigger={
+            'type': "core.st2.CronTimer",
+            'parameters': {'hour': 1, 'minute': 0, 'second': 0}
+        })
+        mock_st2_client = mock.MagicMock()
+        mock_st2_client.rules.query.return_value = [mock_rule]
+        mock_st2_client.ruleenforcements.query.return_value = []
+        sensor.st2_client = mock_st2_client
+
+        sensor.poll()
+        with mock.patch.object(self.sensor_service, 'set_value') as mock_set_value:
+            sensor.poll()
+            mock_set_value.assert_not_called()
+
     def test_enhanced_trigger_dispatch_error(self):
         sensor = self.get_sensor_instance()
         sensor.st2_fqdn = 'st2_test'
@@ -559,6 +1732,7 @@ class CronSensorTestCase(BaseSensorTestCase):
 
         enhanced_trigger_payload = trigger_payload.copy()
         enhanced_trigger_payload['st2_previous_state'] = 'unknown'
+        enhanced_trigger_payload['st2_error_category'] = 'unknown'
 
         self.assertTriggerDispatched(trigger='errors.error_cron_event',
                                      payload=trigger_payload)
@@ -593,6 +1767,7 @@ class CronSensorTestCase(BaseSensorTestCase):
 
         enhanced_trigger_payload = trigger_payload.copy()
         enhanced_trigger_payload['st2_previous_state'] = 'error'
+        enhanced_trigger_payload['st2_error_category'] = ''
 
         self.assertTriggerDispatched(trigger='errors.error_cron_event',
                                      payload=trigger_payload)
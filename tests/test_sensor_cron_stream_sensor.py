@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from st2tests.base import BaseSensorTestCase
+
+from cron_sensor import CronSensor
+from cron_stream_sensor import CronStreamSensor
+from sse_stand_in import SSEStandIn
+import mock
+import json
+from freezegun import freeze_time
+
+__all__ = [
+    'CronStreamSensorTestCase'
+]
+
+TRIGGER_ATTRIBUTES = {
+    'type': "core.st2.CronTimer",
+    'parameters': {
+        'day_of_week': '*',
+        'hour': 1,
+        'minute': 0,
+        'second': 0,
+        'timezone': 'UTC'
+    }
+}
+
+
+class CronStreamSensorTestCase(BaseSensorTestCase):
+    __test__ = True
+    sensor_cls = CronStreamSensor
+
+    def get_stream_sensor(self, stream_url=None, **options):
+        options.setdefault('datastore_key', 'test_sensor')
+        options['stream_url'] = stream_url
+        sensor = self.get_sensor_instance({'error_cron_event': options})
+        sensor.st2_fqdn = 'st2_test'
+        sensor.kv_sensor_name = 'test_sensor'
+        mock_rule = mock.Mock(ref='test_rule', trigger=TRIGGER_ATTRIBUTES)
+        sensor.st2_client = mock.MagicMock(token='test_token')
+        sensor.st2_client.rules.query.return_value = [mock_rule]
+        sensor.st2_client.ruleenforcements.query.return_value = [
+            mock.Mock(id='test_enforcement', enforced_at='2018-10-26T01:00:00.01Z',
+                      execution_id='test_execution', rule={'ref': 'test_rule'})]
+        return sensor
+
+    def test_init(self):
+        sensor = self.get_sensor_instance()
+        self.assertIsInstance(sensor, CronStreamSensor)
+        self.assertIsInstance(sensor, CronSensor)
+        self.assertEqual(sensor.rule_refresh_interval, 3600)
+
+    @freeze_time("2018-10-26 01:05")
+    def test_listen_once_failed_execution(self):
+        with SSEStandIn() as stand_in:
+            stand_in.send_raw(": keep alive\n\n")
+            stand_in.send('st2.execution__update', {
+                'id': 'test_execution', 'status': 'failed', 'rule': {'ref': 'test_rule'},
+                'result': {'stderr': 'Connection refused by db01'}})
+            sensor = self.get_stream_sensor(stand_in.url)
+            self.assertEqual(sensor.listen_once(), 1)
+
+        self.assertEqual(stand_in.requests[0]['path'],
+                         '/stream?events=st2.execution__update,st2.ruleenforcement__create')
+        self.assertEqual(stand_in.requests[0]['headers']['X-Auth-Token'], 'test_token')
+        sensor.st2_client.ruleenforcements.query.assert_called_once_with(
+            execution='test_execution')
+        # The status comes from the event
+        self.assertFalse(sensor.st2_client.liveactions.get_by_id.called)
+        self.assertTriggerDispatched(trigger='errors.error_cron_event', payload={
+            'st2_rule_name': 'test_rule',
+            'st2_server': 'st2_test',
+            'st2_execution_id': 'test_execution',
+            'st2_comments': 'Cronjob execution failed',
+            'st2_state': 'error'
+        })
+        # The error category comes from the result in the event
+        self.assertTriggerDispatched(trigger='errors.error_cron_event_enhanced', payload={
+            'st2_rule_name': 'test_rule',
+            'st2_server': 'st2_test',
+            'st2_execution_id': 'test_execution',
+            'st2_comments': 'Cronjob execution failed',
+            'st2_state': 'error',
+            'st2_previous_state': 'unknown',
+            'st2_error_category': 'network'
+        })
+        state = json.loads(self.sensor_service.get_value('test_sensor'))
+        self.assertEqual(state['rules'], {
+            'test_rule': {'enforcement_id': 'test_enforcement', 'previous_state': 'error'}})
+
+    @freeze_time("2018-10-26 01:05")
+    def test_listen_once_failed_enforcement(self):
+        with SSEStandIn() as stand_in:
+            stand_in.send('st2.ruleenforcement__create', {
+                'id': 'test_enforcement', 'rule': {'ref': 'test_rule'},
+                'enforced_at': '2018-10-26T01:00:00.01Z',
+                'failure_reason': 'Failed to render parameter {{ host }}'})
+            sensor = self.get_stream_sensor(stand_in.url)
+            self.assertEqual(sensor.listen_once(), 1)
+
+        # The failure reason comes from the event
+        self.assertFalse(sensor.st2_client.ruleenforcements.query.called)
+        self.assertFalse(sensor.st2_client.ruleenforcements.get_by_id.called)
+        self.assertTriggerDispatched(trigger='errors.error_cron_event', payload={
+            'st2_rule_name': 'test_rule',
+            'st2_server': 'st2_test',
+            'st2_execution_id': '',
+            'st2_comments': r'Failed to render parameter \{\{ host \}\}',
+            'st2_state': 'error'
+        })
+        state = json.loads(self.sensor_service.get_value('test_sensor'))
+        self.assertEqual(state['rules'], {
+            'test_rule': {'enforcement_id': 'test_enforcement', 'previous_state': 'error'}})
+        self.assertEqual(sensor.metrics.counters['stream.enforcements'], 1)
+
+    @freeze_time("2018-10-26 01:05")
+    def test_handle_enforcement_ignored(self):
+        sensor = self.get_stream_sensor()
+        enforcement = {'id': 'test_enforcement', 'rule': {'ref': 'test_rule'},
+                       'enforced_at': '2018-10-26T01:00:00.01Z',
+                       'failure_reason': 'Failed to render parameter'}
+        # Started an execution, succeeded, not a cron rule and an older run
+        self.assertFalse(sensor.handle_enforcement(dict(enforcement,
+                                                        execution_id='test_execution')))
+        self.assertFalse(sensor.handle_enforcement(dict(enforcement, failure_reason=None)))
+        self.assertFalse(sensor.handle_enforcement(dict(enforcement,
+                                                        rule={'ref': 'other_rule'})))
+        self.assertFalse(sensor.handle_enforcement(dict(enforcement,
+                                                        enforced_at='2018-10-25T00:59:00Z')))
+        self.assertEqual(self.get_dispatched_triggers(), [])
+
+    def test_get_stream_headers_from_environment(self):
+        sensor = self.get_stream_sensor()
+        sensor.st2_client = mock.Mock(token=None, api_key=None)
+        with mock.patch.dict('os.environ', {'ST2_API_KEY': 'test_key'}, clear=True):
+            self.assertEqual(sensor.get_stream_headers(), {'St2-Api-Key': 'test_key'})
+        with mock.patch.dict('os.environ', {'ST2_AUTH_TOKEN': 'test_token',
+                                            'ST2_API_KEY': 'test_key'}, clear=True):
+            self.assertEqual(sensor.get_stream_headers(), {'X-Auth-Token': 'test_token'})
+
+    @freeze_time("2018-10-26 01:05")
+    def test_handle_execution_success_clears_error(self):
+        self.sensor_service.set_value('test_sensor', json.dumps({'version': 2, 'rules': {
+            'test_rule': {'enforcement_id': 'old', 'previous_state': 'error'}}}))
+        sensor = self.get_stream_sensor()
+
+        self.assertTrue(sensor.handle_execution({
+            'id': 'test_execution', 'status': 'succeeded', 'rule': {'ref': 'test_rule'}}))
+        self.assertTriggerDispatched(trigger='errors.error_cron_event_enhanced', payload={
+            'st2_rule_name': 'test_rule',
+            'st2_server': 'st2_test',
+            'st2_execution_id': 'test_execution',
+            'st2_comments': 'Cronjob ran successfully',
+            'st2_state': 'success',
+            'st2_previous_state': 'error',
+            'st2_error_category': ''
+        })
+        self.assertEqual(json.loads(self.sensor_service.get_value('test_sensor'))['rules'], {})
+
+    @freeze_time("2018-10-26 01:05")
+    def test_handle_execution_ignored(self):
+        sensor = self.get_stream_sensor()
+        # Running, not started by a rule and not a cron rule
+        self.assertFalse(sensor.handle_execution({
+            'id': 'test_execution', 'status': 'running', 'rule': {'ref': 'test_rule'}}))
+        self.assertFalse(sensor.handle_execution({'id': 'test_execution', 'status': 'failed'}))
+        self.assertFalse(sensor.handle_execution({
+            'id': 'test_execution', 'status': 'failed', 'rule': {'ref': 'other_rule'}}))
+        self.assertFalse(sensor.st2_client.ruleenforcements.query.called)
+        self.assertEqual(self.get_dispatched_triggers(), [])
+
+    @freeze_time("2018-10-28 01:05")
+    def test_handle_execution_of_older_run(self):
+        sensor = self.get_stream_sensor()
+        self.assertFalse(sensor.handle_execution({
+            'id': 'test_execution', 'status': 'failed', 'rule': {'ref': 'test_rule'}}))
+        self.assertEqual(self.get_dispatched_triggers(), [])
+
+    @freeze_time("2018-10-26 01:05")
+    def test_poll_reconciles_missed_runs(self):
+        sensor = self.get_stream_sensor()
+        sensor.st2_client.ruleenforcements.query.return_value = []
+        sensor.poll()
+        self.assertTrue(sensor.state_loaded)
+        self.assertTriggerDispatched(trigger='errors.error_cron_event', payload={
+            'st2_rule_name': 'test_rule',
+            'st2_server': 'st2_test',
+            'st2_execution_id': '',
+            'st2_comments': 'Cron job is not running and no enforcements can be found',
+            'st2_state': 'open'
+        })
+
+    def test_listen_reconnects(self):
+        sensor = self.get_stream_sensor(stream_reconnect_delay=0)
+        calls = []
+
+        def listen_once():
+            calls.append(1)
+            if len(calls) == 2:
+                sensor.cleanup()
+            raise IOError("connection reset")
+
+        sensor.listen_once = listen_once
+        sensor.listen()
+        self.assertEqual(len(calls), 2)
+
+    @mock.patch('cron_stream_sensor.threading.Thread')
+    @mock.patch('st2client.client.Client')
+    @mock.patch('socket.getfqdn')
+    def test_setup(self, mock_getfqdn, mock_client, mock_thread):
+        mock_getfqdn.return_value = "st2_test"
+        sensor = self.get_sensor_instance({'error_cron_event': {'datastore_key': 'test_key'}})
+        sensor.setup()
+        self.assertEqual(sensor.stream_url, "https://st2_test/stream/v1/stream")
+        mock_thread.assert_called_with(target=sensor.listen, name="cron-stream")
+        self.assertTrue(mock_thread.return_value.start.called)
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# Copyright 2019 Encore Technologies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from st2tests.base import BaseSensorTestCase
+
+from error_worker_sensor import ErrorWorkerSensor
+from error_worker_sensor import WORKER_ACTIONS
+from st2reactor.sensor.base import Sensor
+import os
+import shutil
+import tempfile
+
+__all__ = [
+    'ErrorWorkerSensorTestCase'
+]
+
+
+class ErrorWorkerSensorTestCase(BaseSensorTestCase):
+    __test__ = True
+    sensor_cls = ErrorWorkerSensor
+
+    def setUp(self):
+        super(ErrorWorkerSensorTestCase, self).setUp()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.tmp_dir, 'worker.sock')
+
+    def tearDown(self):
+        super(ErrorWorkerSensorTestCase, self).tearDown()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_init(self):
+        sensor = self.get_sensor_instance()
+        self.assertIsInstance(sensor, ErrorWorkerSensor)
+        self.assertIsInstance(sensor, Sensor)
+
+    def test_setup_and_cleanup(self):
+        sensor = self.get_sensor_instance({'worker': {'socket_path': self.socket_path}})
+        sensor.setup()
+        self.assertTrue(os.path.exists(self.socket_path))
+        self.assertEqual(sensor.server.action_classes, WORKER_ACTIONS)
+
+        sensor.cleanup()
+        self.assertFalse(os.path.exists(self.socket_path))